@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
 from pydantic import BaseModel
 
 from app.core.security import create_access_token, require_user, verify_password
 from app.db.users import get_user_by_nombre
+from app.services import warmup
 
 router = APIRouter()
 
@@ -13,7 +14,7 @@ class LoginIn(BaseModel):
 
 
 @router.post("/login")
-def login(payload: LoginIn):
+def login(payload: LoginIn, background_tasks: BackgroundTasks):
     if not payload.username or not payload.password:
         raise HTTPException(status_code=400, detail="username/password requeridos")
 
@@ -44,6 +45,12 @@ def login(payload: LoginIn):
         sub=str(user.get("id", payload.username)),
         id_sheets=id_sheets,
     )
+    # Precarga de caches del usuario después de responder
+    try:
+        id_usuario: int | None = int(user.get("id", ""))
+    except (TypeError, ValueError):
+        id_usuario = None
+    background_tasks.add_task(warmup.schedule, id_sheets, id_usuario)
     return {
         "access_token": token,
         "token_type": "bearer",
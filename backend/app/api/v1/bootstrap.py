@@ -1,16 +1,24 @@
 """
 Endpoint bootstrap: devuelve múltiples catálogos en una sola llamada.
 Reduce 5 requests del frontend a 1.
-Categorías, subcategorías, presupuestos y reglas desde SQL; comercios desde store.
+Categorías, subcategorías, presupuestos y reglas desde SQL (un solo batch); comercios desde store.
+
+Cada sección trae su versión en "versions". El frontend puede mandar ?since=sec:ver,sec:ver,...
+con las versiones que ya tiene: las secciones sin cambios se omiten y las listadas en "delta"
+traen solo las filas nuevas o modificadas (upsert por id); el resto va completo.
+Presupuestos trae solo la ventana por defecto (PRESUPUESTOS_MESES_ATRAS/ADELANTE); el frontend
+pide el mes seleccionado con /presupuestos?mesAño= y el resto del historial está en
+/presupuestos/historial.
 """
-from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 
 from app.core.security import require_user
-from app.db.catalog import _get_id_usuario, list_categorias_sql, list_subcategorias_sql
-from app.db.presupuestos import list_presupuestos_sql
-from app.db.regla_comercio import list_reglas_comercio
+from app.db.bootstrap import fetch_bootstrap, parse_since
+from app.db.catalog import _get_id_usuario
 from app.storage.store import get_all
 
 router = APIRouter()
@@ -29,11 +37,43 @@ def _regla_to_raw(r: dict) -> dict:
     }
 
 
+def _presupuesto_to_raw(r: dict) -> dict:
+    return {
+        "id": r["id"],
+        "mes_anio": r.get("mes_anio", r.get("mesAño", "")),
+        "categoria_id": r.get("categoria_id", ""),
+        "categoria_nombre": r.get("categoria_nombre", ""),
+        "subcategoria_id": r.get("subcategoria_id", ""),
+        "subcategoria_nombre": r.get("subcategoria_nombre", ""),
+        "monto": r.get("monto", str(r.get("Monto", 0))),
+    }
+
+
+_SHAPES = {
+    "categorias": lambda r: {"id": r["id"], "nombre": r["nombre"], "icon": r["icon"], "color": r["color"]},
+    "subcategorias": lambda r: {"id": r["id"], "categoria_id": r["categoria_id"], "nombre": r["nombre"]},
+    "reglas": _regla_to_raw,
+    "presupuestos": _presupuesto_to_raw,
+}
+
+
+def _since_comercios(since: Optional[str]) -> Optional[str]:
+    for part in (since or "").split(","):
+        name, _, value = part.strip().partition(":")
+        if name == "comercios":
+            return value
+    return None
+
+
 @router.get("")
-def bootstrap(user: dict = Depends(require_user)):
+def bootstrap(
+    since: Optional[str] = Query(None, description="Versiones que ya tiene el cliente: sec:ver,sec:ver,..."),
+    user: dict = Depends(require_user),
+):
     """
-    Devuelve categorias, subcategorias, reglas, presupuestos y comercios en una sola llamada.
-    Categorías, subcategorías, presupuestos y reglas desde SQL; comercios desde store.
+    Devuelve categorias, subcategorias, reglas, presupuestos y comercios en una sola llamada,
+    más "versions" (por sección) y "delta" (secciones que traen solo cambios).
+    Con since, las secciones sin cambios no aparecen en la respuesta.
     """
     sid = user.get("id_sheets")
     if not sid:
@@ -44,54 +84,17 @@ def bootstrap(user: dict = Depends(require_user)):
     except ValueError as e:
         raise HTTPException(status_code=401, detail=str(e))
 
-    # Categorías y subcategorías desde SQL (no requieren spreadsheet context)
-    def _categorias():
-        rows = list_categorias_sql(id_usuario)
-        return [{"id": r["id"], "nombre": r["nombre"], "icon": r["icon"], "color": r["color"]} for r in rows]
-
-    def _subcategorias():
-        rows = list_subcategorias_sql(id_usuario)
-        return [{"id": r["id"], "categoria_id": r["categoria_id"], "nombre": r["nombre"]} for r in rows]
-
-    def _reglas():
-        rows = list_reglas_comercio(id_usuario)
-        return [_regla_to_raw(r) for r in rows]
-
-    def _presupuestos():
-        rows = list_presupuestos_sql(id_usuario, periodo_mes=None)
-        return [
-            {
-                "id": r["id"],
-                "mes_anio": r.get("mes_anio", r.get("mesAño", "")),
-                "categoria_id": r.get("categoria_id", ""),
-                "categoria_nombre": r.get("categoria_nombre", ""),
-                "subcategoria_id": r.get("subcategoria_id", ""),
-                "subcategoria_nombre": r.get("subcategoria_nombre", ""),
-                "monto": r.get("monto", str(r.get("Monto", 0))),
-            }
-            for r in rows
-        ]
-
-    def _comercios():
-        return get_all("merchants")
-
-    with ThreadPoolExecutor(max_workers=5) as ex:
-        fut_cat = ex.submit(_categorias)
-        fut_sub = ex.submit(_subcategorias)
-        fut_reg = ex.submit(_reglas)
-        fut_pre = ex.submit(_presupuestos)
-        fut_com = ex.submit(_comercios)
-
-        categorias = fut_cat.result()
-        subcategorias = fut_sub.result()
-        reglas = fut_reg.result()
-        presupuestos = fut_pre.result()
-        comercios = fut_com.result()
+    data = fetch_bootstrap(id_usuario, parse_since(since))
+    out = {name: [shape(r) for r in data["sections"][name]]
+           for name, shape in _SHAPES.items() if name in data["sections"]}
+    versions = dict(data["versions"])
 
-    return {
-        "categorias": categorias,
-        "subcategorias": subcategorias,
-        "reglas": reglas,
-        "presupuestos": presupuestos,
-        "comercios": comercios,
-    }
+    comercios = get_all("merchants")
+    version = hashlib.sha1(json.dumps(comercios, sort_keys=True, default=str).encode()).hexdigest()[:16]
+    versions["comercios"] = version
+    if _since_comercios(since) != version:
+        out["comercios"] = comercios
+
+    out["versions"] = versions
+    out["delta"] = data["delta"]
+    return out
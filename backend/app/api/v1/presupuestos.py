@@ -3,13 +3,20 @@ Endpoints de Presupuestos desde Azure SQL (multi-tenant por Id_usuario).
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
-from typing import Literal, Optional
+from typing import List, Literal, Optional
 
 from app.core.security import require_user
 from app.db.catalog import _get_id_usuario
 from app.db.presupuestos import (
+    BULK_MAX_ITEMS,
+    alertas_presupuestos_sql,
+    consumo_presupuestos_sql,
+    copy_presupuestos_sql,
+    list_presupuestos_historial_sql,
     list_presupuestos_sql,
+    presupuestos_window,
     upsert_presupuesto_sql,
+    upsert_presupuestos_bulk_sql,
     delete_presupuesto_sql,
     get_presupuesto_by_id_sql,
     patch_presupuesto_sql,
@@ -30,6 +37,17 @@ class BudgetIn(BaseModel):
     spent: float = 0
 
 
+class BudgetBulkIn(BaseModel):
+    items: List[BudgetIn]
+
+
+class BudgetCopyIn(BaseModel):
+    """Copia los presupuestos de from_mes_anio a to_mes_anio (MM/YY o YYYY-MM)."""
+    from_mes_anio: str
+    to_mes_anio: str
+    overwrite: bool = False
+
+
 class BudgetPatch(BaseModel):
     categoryId: Optional[str] = None
     subcategoryId: Optional[str] = None
@@ -37,6 +55,17 @@ class BudgetPatch(BaseModel):
     amount: Optional[float] = None
 
 
+def _parse_mes_anio(mes: Optional[str]) -> date:
+    """mes_anio (MM/YY o YYYY-MM) a PeriodoMes; si no viene, mes actual. 400 si es inválido."""
+    if not mes:
+        today = date.today()
+        mes = f"{today.month:02d}/{today.year % 100:02d}"
+    try:
+        return parse_periodo_mes(mes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 def _to_presupuesto_raw(row: dict) -> dict:
     """Formato PresupuestoRaw para frontend."""
     return {
@@ -53,27 +82,32 @@ def _to_presupuesto_raw(row: dict) -> dict:
 @router.get("")
 def get_presupuestos(
     mes_anio: Optional[str] = Query(default=None, alias="mesAño"),
+    desde: Optional[str] = Query(default=None, description="Primer mes del rango (MM/YY o YYYY-MM)"),
+    hasta: Optional[str] = Query(default=None, description="Último mes del rango (MM/YY o YYYY-MM)"),
     categoria_id: Optional[str] = Query(default=None),
     subcategoria_id: Optional[str] = Query(default=None),
     user: dict = Depends(require_user),
 ):
     """
     Lista presupuestos del usuario.
-    mesAño (MM/YY o YYYY-MM) es el filtro principal. Si no viene, usa mes actual.
+    mesAño (MM/YY o YYYY-MM) es el filtro principal. Si no viene, usa el rango desde/hasta;
+    lo que falte del rango sale de la ventana por defecto (PRESUPUESTOS_MESES_ATRAS/ADELANTE).
+    El historial completo se pagina con /historial.
     """
     try:
         id_usuario = _get_id_usuario(user)
     except ValueError as e:
         raise HTTPException(status_code=401, detail=str(e))
 
-    periodo_mes = None
     if mes_anio:
-        try:
-            periodo_mes = parse_periodo_mes(mes_anio)
-        except ValueError as e:
-            raise HTTPException(status_code=400, detail=str(e))
-
-    rows = list_presupuestos_sql(id_usuario, periodo_mes)
+        rows = list_presupuestos_sql(id_usuario, _parse_mes_anio(mes_anio))
+    else:
+        ventana_desde, ventana_hasta = presupuestos_window()
+        rows = list_presupuestos_sql(
+            id_usuario,
+            desde=_parse_mes_anio(desde) if desde else ventana_desde,
+            hasta=_parse_mes_anio(hasta) if hasta else ventana_hasta,
+        )
 
     # Filtros opcionales
     if categoria_id:
@@ -84,6 +118,89 @@ def get_presupuestos(
     return [_to_presupuesto_raw(r) for r in rows]
 
 
+@router.get("/historial")
+def get_presupuestos_historial(
+    cursor: Optional[str] = Query(default=None, description="next_cursor de la página anterior"),
+    limit: int = Query(default=100, ge=1, le=500),
+    user: dict = Depends(require_user),
+):
+    """Historial completo de presupuestos, del mes más reciente al más antiguo, paginado por cursor."""
+    try:
+        id_usuario = _get_id_usuario(user)
+    except ValueError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+    try:
+        rows, next_cursor = list_presupuestos_historial_sql(id_usuario, cursor=cursor, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": [_to_presupuesto_raw(r) for r in rows], "next_cursor": next_cursor}
+
+
+@router.get("/consumo")
+def get_consumo(
+    period: Optional[str] = Query(default=None, description="MM/YY o YYYY-MM; por defecto el mes actual"),
+    moneda: str = Query(default="ARS"),
+    user: dict = Depends(require_user),
+):
+    """
+    Presupuesto vs. gastado del período: cada presupuesto con gastado, restante y porcentaje usado.
+    Se calcula en SQL (un solo query), sin traer los movimientos del mes.
+    """
+    try:
+        id_usuario = _get_id_usuario(user)
+    except ValueError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+
+    periodo_mes = _parse_mes_anio(period)
+    rows = consumo_presupuestos_sql(id_usuario, periodo_mes, moneda)
+    return {
+        "mes_anio": periodo_mes_to_mes_anio(periodo_mes),
+        "moneda": (moneda or "ARS").strip().upper(),
+        "items": [
+            {
+                **_to_presupuesto_raw(r),
+                "gastado": r["gastado"],
+                "restante": r["restante"],
+                "porcentaje": r["porcentaje"],
+            }
+            for r in rows
+        ],
+    }
+
+
+@router.get("/alertas")
+def get_alertas(
+    period: Optional[str] = Query(default=None, description="MM/YY o YYYY-MM; por defecto el mes actual"),
+    moneda: str = Query(default="ARS"),
+    user: dict = Depends(require_user),
+):
+    """
+    Presupuestos del período que cruzaron un umbral de PRESUPUESTO_ALERTA_UMBRALES (ej. 80%, 100%).
+    Con GASTO_MENSUAL_ROLLUP lee el rollup dbo.GastoMensual (pocas filas: apto para polling
+    frecuente); con el flag apagado (default) agrega los movimientos del mes en cada llamada.
+    """
+    try:
+        id_usuario = _get_id_usuario(user)
+    except ValueError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+
+    periodo_mes = _parse_mes_anio(period)
+    rows = alertas_presupuestos_sql(id_usuario, periodo_mes, moneda)
+    return {
+        "mes_anio": periodo_mes_to_mes_anio(periodo_mes),
+        "moneda": (moneda or "ARS").strip().upper(),
+        "alertas": [
+            {
+                **_to_presupuesto_raw(r),
+                "gastado": r["gastado"],
+                "porcentaje": r["porcentaje"],
+                "umbral": r["umbral"],
+            }
+            for r in rows
+        ],
+    }
+
+
 @router.post("")
 def post_presupuesto(payload: BudgetIn, user: dict = Depends(require_user)):
     """
@@ -96,14 +213,7 @@ def post_presupuesto(payload: BudgetIn, user: dict = Depends(require_user)):
     except ValueError as e:
         raise HTTPException(status_code=401, detail=str(e))
 
-    mes = payload.mes_anio
-    if not mes:
-        today = date.today()
-        mes = f"{today.month:02d}/{today.year % 100:02d}"
-    try:
-        periodo_mes = parse_periodo_mes(mes)
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    periodo_mes = _parse_mes_anio(payload.mes_anio)
     try:
         cat_id = int(payload.categoryId)
     except (TypeError, ValueError):
@@ -130,6 +240,56 @@ def post_presupuesto(payload: BudgetIn, user: dict = Depends(require_user)):
     }
 
 
+@router.post("/bulk")
+def post_presupuestos_bulk(payload: BudgetBulkIn, user: dict = Depends(require_user)):
+    """
+    UPSERT de varios presupuestos en una sola transacción (mismo formato de ítem que POST).
+    Retorna las filas resultantes.
+    """
+    try:
+        id_usuario = _get_id_usuario(user)
+    except ValueError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+    if len(payload.items) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Máximo {BULK_MAX_ITEMS} presupuestos por llamada")
+
+    items = []
+    for item in payload.items:
+        try:
+            cat_id = int(item.categoryId)
+            sub_id = int(item.subcategoryId) if item.subcategoryId else None
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="categoryId y subcategoryId deben ser enteros")
+        if item.amount <= 0:
+            raise HTTPException(status_code=400, detail="Monto debe ser mayor a 0")
+        items.append((_parse_mes_anio(item.mes_anio), cat_id, sub_id, item.amount))
+
+    try:
+        rows = upsert_presupuestos_bulk_sql(id_usuario, items)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return [_to_presupuesto_raw(r) for r in rows]
+
+
+@router.post("/copy")
+def post_presupuestos_copy(payload: BudgetCopyIn, user: dict = Depends(require_user)):
+    """
+    Copia los presupuestos de un mes a otro en una sola transacción. Los que ya existen en el
+    destino no se tocan, salvo overwrite. Retorna los presupuestos del mes destino.
+    """
+    try:
+        id_usuario = _get_id_usuario(user)
+    except ValueError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+    desde = _parse_mes_anio(payload.from_mes_anio)
+    hasta = _parse_mes_anio(payload.to_mes_anio)
+    try:
+        rows = copy_presupuestos_sql(id_usuario, desde, hasta, overwrite=payload.overwrite)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return [_to_presupuesto_raw(r) for r in rows]
+
+
 @router.patch("/{id}")
 def patch_presupuesto(id: str, payload: BudgetPatch, user: dict = Depends(require_user)):
     """Actualiza monto del presupuesto."""
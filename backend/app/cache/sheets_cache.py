@@ -1,10 +1,17 @@
 """
 Cache in-memory para lecturas de Google Sheets por tabla.
-TTL configurable.
+TTL adaptativo por tabla: arranca en SHEETS_CACHE_TTL_SEC y en cada refresco se duplica si
+la tabla no cambió o se divide a la mitad si cambió, dentro de
+[SHEETS_CACHE_TTL_MIN_SEC, SHEETS_CACHE_TTL_MAX_SEC].
 Thread-safe con lock por tabla para evitar thundering herd.
+Soporta refresco incremental: al expirar, refresh_fn recibe el contenido anterior
+y puede devolver solo lo nuevo agregado (tablas append-only), o las mismas filas si
+un chequeo barato indica que no cambió: en ese caso se conserva el snapshot y solo
+se renueva su TTL.
 """
 from __future__ import annotations
 
+import itertools
 import logging
 import threading
 import time
@@ -14,10 +21,47 @@ from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
-# Cache: (spreadsheet_id, table_name) -> (ts, (headers, rows))
-_CacheValue = Tuple[float, Tuple[List[str], List[Dict[str, Any]]]]
-_cache: Dict[tuple, _CacheValue] = {}
+_Table = Tuple[List[str], List[Dict[str, Any]]]
+# refresh_fn(headers, rows) -> tabla actualizada (las mismas filas si no cambió), o None para pedir recarga completa
+RefreshFn = Callable[[List[str], List[Dict[str, Any]]], Optional[_Table]]
+
+# Versión global creciente de snapshots: sirve de clave para resultados derivados fuera del snapshot
+_versions = itertools.count(1)
+
+
+class TableSnapshot:
+    """
+    Contenido cacheado de una tabla + cuándo se refrescó y cuándo se cargó completo.
+    Inmutable: cada refresco o write-through crea un snapshot nuevo, así los derivados
+    (índices por columna, etc.) quedan atados a las filas con las que se calcularon.
+    """
+
+    __slots__ = ("ts", "headers", "rows", "full_ts", "version", "_derived")
+
+    def __init__(self, headers: List[str], rows: List[Dict[str, Any]], full_ts: float) -> None:
+        self.version = next(_versions)
+        self.ts = time.time()
+        self.headers = headers
+        self.rows = rows
+        self.full_ts = full_ts
+        self._derived: Dict[Any, Any] = {}
+
+    def derived(self, key: Any, build_fn: Callable[["TableSnapshot"], Any]) -> Any:
+        """Estructura derivada de las filas, construida una vez por snapshot (lazy)."""
+        try:
+            return self._derived[key]
+        except KeyError:
+            value = build_fn(self)
+            self._derived[key] = value
+            return value
+
+
+# Cache: (spreadsheet_id, table_name) -> TableSnapshot
+_cache: Dict[tuple, TableSnapshot] = {}
 _cache_lock = threading.Lock()
+# TTL adaptativo: (spreadsheet_id, table_name) -> segundos. Se conserva entre refrescos;
+# invalidate lo descarta (vuelve al inicial) para no acumular claves de tenants ya idos.
+_ttls: Dict[tuple, float] = {}
 # Per-table locks: (spreadsheet_id, table_name) -> threading.Lock
 _table_locks: Dict[tuple, threading.Lock] = {}
 _table_locks_lock = threading.Lock()
@@ -31,74 +75,329 @@ def _get_table_lock(spreadsheet_id: str, table_name: str) -> threading.Lock:
         return _table_locks[key]
 
 
-def get_table(
+def _ttl_bounds() -> Tuple[float, float, float]:
+    """(mínimo, máximo, inicial) del TTL adaptativo."""
+    lo = float(settings.SHEETS_CACHE_TTL_MIN_SEC)
+    hi = max(lo, float(settings.SHEETS_CACHE_TTL_MAX_SEC))
+    return lo, hi, min(max(float(settings.SHEETS_CACHE_TTL_SEC), lo), hi)
+
+
+def _ttl_for(key: tuple) -> float:
+    """TTL vigente de la tabla. Llamar con _cache_lock tomado."""
+    current = _ttls.get(key)
+    return _ttl_bounds()[2] if current is None else current
+
+
+def _adapt_ttl(key: tuple, changed: bool) -> None:
+    """Ajusta el TTL tras un refresco: mitad si la tabla cambió, doble si no. Llamar con _cache_lock tomado."""
+    lo, hi, _ = _ttl_bounds()
+    current = _ttl_for(key)
+    _ttls[key] = max(lo, current / 2) if changed else min(hi, current * 2)
+
+
+def ttl(spreadsheet_id: str, table_name: str) -> float:
+    """TTL vigente de la tabla (segundos); 0 si el cache está desactivado."""
+    if settings.SHEETS_CACHE_TTL_SEC <= 0:
+        return 0.0
+    with _cache_lock:
+        return _ttl_for((spreadsheet_id, table_name))
+
+
+def _store(
+    key: tuple,
+    prev: Optional[TableSnapshot],
+    headers: List[str],
+    rows: List[Dict[str, Any]],
+    now: float,
+) -> Tuple[TableSnapshot, bool]:
+    """
+    Guarda una carga completa. Si el contenido es igual al de prev, conserva prev (y sus
+    derivados) renovando ts/full_ts. Ajusta el TTL. Retorna (snapshot, cambió).
+    """
+    with _cache_lock:
+        if prev is not None and headers == prev.headers and rows == prev.rows:
+            prev.ts = prev.full_ts = now
+            _cache[key] = prev
+            _adapt_ttl(key, False)
+            return prev, False
+        snapshot = TableSnapshot(headers, rows, now)
+        _cache[key] = snapshot
+        if prev is not None:
+            _adapt_ttl(key, True)
+        return snapshot, True
+
+
+def _load(
+    key: tuple,
+    prev: Optional[TableSnapshot],
+    fetch_fn: Callable[[], _Table],
+    refresh_fn: Optional[RefreshFn],
+) -> Tuple[TableSnapshot, str]:
+    """
+    Carga la tabla: incremental sobre prev si se puede, si no completa.
+    Llamar con el lock de la tabla tomado. Retorna (snapshot, modo).
+    """
+    now = time.time()
+    if (
+        refresh_fn is not None
+        and prev is not None
+        and now - prev.full_ts <= settings.SHEETS_FULL_RELOAD_SEC
+    ):
+        result = refresh_fn(prev.headers, prev.rows)
+        if result is not None:
+            headers, rows = result
+            with _cache_lock:
+                if rows is prev.rows and headers == prev.headers:
+                    # Sin cambios: mismo snapshot (y sus derivados), TTL renovado
+                    prev.ts = now
+                    _adapt_ttl(key, False)
+                    return prev, "unchanged"
+                snapshot = TableSnapshot(headers, rows, prev.full_ts)
+                _cache[key] = snapshot
+                _adapt_ttl(key, True)
+            return snapshot, "incremental"
+
+    headers, rows = fetch_fn()
+    snapshot, changed = _store(key, prev, headers, rows, now)
+    return snapshot, "full" if changed else "unchanged"
+
+
+def get_snapshot(
     spreadsheet_id: str,
     table_name: str,
-    fetch_fn: Callable[[], Tuple[List[str], List[Dict[str, Any]]]],
-) -> Tuple[List[str], List[Dict[str, Any]]]:
+    fetch_fn: Callable[[], _Table],
+    refresh_fn: Optional[RefreshFn] = None,
+) -> TableSnapshot:
     """
-    Obtiene datos de tabla desde cache o ejecuta fetch_fn.
+    Obtiene el snapshot de la tabla desde cache o ejecuta fetch_fn.
+    Si hay refresh_fn y una entrada expirada, intenta refresco incremental primero.
     Thread-safe: evita thundering herd con lock por tabla.
     """
-    ttl = settings.SHEETS_CACHE_TTL_SEC
     key = (spreadsheet_id, table_name)
 
-    if ttl <= 0:
-        return fetch_fn()
+    if settings.SHEETS_CACHE_TTL_SEC <= 0:
+        headers, rows = fetch_fn()
+        return TableSnapshot(headers, rows, time.time())
 
     # Lectura rápida bajo lock global
     with _cache_lock:
         entry = _cache.get(key)
-        if entry:
-            ts, (headers, rows) = entry
-            if time.time() - ts <= ttl:
-                logger.info(
-                    f"cache_hit=true table_name={table_name} spreadsheet_id={spreadsheet_id[:8]}..."
-                )
-                return headers, rows
-            # Cache expirado, borrar
-            _cache.pop(key, None)
+        if entry and time.time() - entry.ts <= _ttl_for(key):
+            logger.info(
+                f"cache_hit=true table_name={table_name} spreadsheet_id={spreadsheet_id[:8]}..."
+            )
+            return entry
 
-    # Cache miss: refresh con lock por tabla
+    # Cache miss o expirado: refresh con lock por tabla
     table_lock = _get_table_lock(spreadsheet_id, table_name)
     with table_lock:
         # Double-check: otro thread pudo haber refrescado
         with _cache_lock:
             entry = _cache.get(key)
-            if entry:
-                ts, (headers, rows) = entry
-                if time.time() - ts <= ttl:
-                    logger.info(
-                        f"cache_hit=true table_name={table_name} spreadsheet_id={spreadsheet_id[:8]}..."
-                    )
-                    return headers, rows
+            if entry and time.time() - entry.ts <= _ttl_for(key):
+                logger.info(
+                    f"cache_hit=true table_name={table_name} spreadsheet_id={spreadsheet_id[:8]}..."
+                )
+                return entry
 
         t0 = time.perf_counter()
-        headers, rows = fetch_fn()
+        snapshot, mode = _load(key, entry, fetch_fn, refresh_fn)
         t_refresh = time.perf_counter() - t0
 
-        with _cache_lock:
-            _cache[key] = (time.time(), (headers, rows))
-
         logger.info(
             f"cache_hit=false table_name={table_name} t_refresh={t_refresh:.3f}s "
+            f"mode={mode} rows={len(snapshot.rows)} ttl={ttl(spreadsheet_id, table_name):.0f}s "
             f"spreadsheet_id={spreadsheet_id[:8]}..."
         )
-        return headers, rows
+        return snapshot
+
+
+def get_table(
+    spreadsheet_id: str,
+    table_name: str,
+    fetch_fn: Callable[[], _Table],
+    refresh_fn: Optional[RefreshFn] = None,
+) -> _Table:
+    """Como get_snapshot, devolviendo (headers, rows)."""
+    snapshot = get_snapshot(spreadsheet_id, table_name, fetch_fn, refresh_fn)
+    return snapshot.headers, snapshot.rows
+
+
+def get_tables(
+    spreadsheet_id: str,
+    table_names: List[str],
+    batch_fetch_fn: Callable[[List[str]], Dict[str, _Table]],
+) -> Dict[str, _Table]:
+    """
+    Varias tablas de un mismo spreadsheet: las frescas salen del cache y
+    las faltantes se traen juntas con una sola llamada a batch_fetch_fn(faltantes).
+    """
+    if settings.SHEETS_CACHE_TTL_SEC <= 0:
+        return batch_fetch_fn(list(table_names))
+
+    out: Dict[str, _Table] = {}
+    missing: List[str] = []
+    now = time.time()
+    with _cache_lock:
+        for name in table_names:
+            entry = _cache.get((spreadsheet_id, name))
+            if entry and now - entry.ts <= _ttl_for((spreadsheet_id, name)):
+                out[name] = (entry.headers, entry.rows)
+            else:
+                missing.append(name)
+
+    if missing:
+        t0 = time.perf_counter()
+        fetched = batch_fetch_fn(missing)
+        t_refresh = time.perf_counter() - t0
+        put_tables(spreadsheet_id, fetched)
+        out.update(fetched)
+        logger.info(
+            f"cache_hit=false table_names={','.join(missing)} t_refresh={t_refresh:.3f}s "
+            f"mode=batch spreadsheet_id={spreadsheet_id[:8]}..."
+        )
+    return out
+
+
+def put_tables(spreadsheet_id: str, tables: Dict[str, _Table]) -> None:
+    """
+    Guarda tablas recién cargadas completas (ej. desde un batchGet).
+    Toma el lock de cada tabla, como get_snapshot y update_table, para no pisarse con un
+    write-through o un refresco en curso.
+    """
+    if settings.SHEETS_CACHE_TTL_SEC <= 0:
+        return
+    now = time.time()
+    for name, (headers, rows) in tables.items():
+        key = (spreadsheet_id, name)
+        with _get_table_lock(spreadsheet_id, name):
+            with _cache_lock:
+                prev = _cache.get(key)
+            _store(key, prev, headers, rows, now)
+
+
+def is_fresh(spreadsheet_id: str, table_name: str) -> bool:
+    """True si la tabla está en cache y dentro de su TTL."""
+    if settings.SHEETS_CACHE_TTL_SEC <= 0:
+        return False
+    key = (spreadsheet_id, table_name)
+    with _cache_lock:
+        entry = _cache.get(key)
+        return entry is not None and time.time() - entry.ts <= _ttl_for(key)
+
+
+def peek(spreadsheet_id: str, table_name: str) -> Optional[TableSnapshot]:
+    """Snapshot cacheado aunque haya expirado (None si no hay entrada)."""
+    with _cache_lock:
+        return _cache.get((spreadsheet_id, table_name))
+
+
+def touch(spreadsheet_id: str, table_name: str, snapshot: TableSnapshot) -> bool:
+    """
+    Renueva el TTL de snapshot si sigue siendo la entrada vigente (la tabla no cambió).
+    Retorna False si entre tanto otro refresco o write-through la reemplazó.
+    """
+    key = (spreadsheet_id, table_name)
+    with _cache_lock:
+        if _cache.get(key) is not snapshot:
+            return False
+        snapshot.ts = time.time()
+        _adapt_ttl(key, False)
+    logger.info(
+        f"cache_refresh table_name={table_name} mode=unchanged rows={len(snapshot.rows)} "
+        f"spreadsheet_id={spreadsheet_id[:8]}..."
+    )
+    return True
+
+
+def refresh_table(
+    spreadsheet_id: str,
+    table_name: str,
+    fetch_fn: Callable[[], _Table],
+    refresh_fn: Optional[RefreshFn] = None,
+) -> _Table:
+    """
+    Fuerza la recarga y reemplaza la entrada del cache (refresco en background).
+    Usa el mismo lock por tabla que get_table para no duplicar fetches concurrentes.
+    Con el cache desactivado (TTL <= 0) solo lee, sin guardar nada.
+    """
+    if settings.SHEETS_CACHE_TTL_SEC <= 0:
+        return fetch_fn()
+    key = (spreadsheet_id, table_name)
+    table_lock = _get_table_lock(spreadsheet_id, table_name)
+    with table_lock:
+        with _cache_lock:
+            entry = _cache.get(key)
+        t0 = time.perf_counter()
+        snapshot, mode = _load(key, entry, fetch_fn, refresh_fn)
+        t_refresh = time.perf_counter() - t0
+    logger.info(
+        f"cache_refresh table_name={table_name} t_refresh={t_refresh:.3f}s "
+        f"mode={mode} rows={len(snapshot.rows)} ttl={ttl(spreadsheet_id, table_name):.0f}s "
+        f"spreadsheet_id={spreadsheet_id[:8]}..."
+    )
+    return snapshot.headers, snapshot.rows
+
+
+def update_table(
+    spreadsheet_id: str,
+    table_name: str,
+    update_fn: Callable[[List[str], List[Dict[str, Any]]], Optional[List[Dict[str, Any]]]],
+) -> bool:
+    """
+    Write-through: aplica update_fn(headers, rows) sobre la tabla cacheada y guarda las filas
+    que retorna, sin tocar el TTL. update_fn no debe mutar rows (copy-on-write: hay lectores
+    con la lista anterior). Si retorna None la entrada se invalida.
+    Toma el lock de la tabla para no pisarse con un refresco en curso.
+    Retorna True si el cache quedó actualizado.
+    """
+    key = (spreadsheet_id, table_name)
+    table_lock = _get_table_lock(spreadsheet_id, table_name)
+    with table_lock:
+        with _cache_lock:
+            entry = _cache.get(key)
+        if entry is None:
+            return False
+        rows = update_fn(entry.headers, entry.rows)
+        with _cache_lock:
+            if rows is None:
+                _cache.pop(key, None)
+                return False
+            new_entry = TableSnapshot(entry.headers, rows, entry.full_ts)
+            new_entry.ts = entry.ts
+            _cache[key] = new_entry
+    logger.info(
+        f"cache_write_through table_name={table_name} rows={len(rows)} "
+        f"spreadsheet_id={spreadsheet_id[:8]}..."
+    )
+    return True
 
 
 def invalidate(spreadsheet_id: str, table_name: Optional[str] = None) -> None:
-    """Invalida cache. table_name=None invalida todo para ese spreadsheet."""
+    """
+    Invalida cache. table_name=None invalida todo para ese spreadsheet.
+    También descarta el TTL adaptativo y los locks por tabla (salvo los tomados en este momento).
+    """
+    def match(k: tuple) -> bool:
+        return k == (spreadsheet_id, table_name) if table_name else k[0] == spreadsheet_id
+
     with _cache_lock:
-        if table_name:
-            _cache.pop((spreadsheet_id, table_name), None)
-        else:
-            to_del = [k for k in _cache if k[0] == spreadsheet_id]
-            for k in to_del:
-                del _cache[k]
+        for k in [k for k in (*_cache, *_ttls) if match(k)]:
+            _cache.pop(k, None)
+            _ttls.pop(k, None)
+        _drop_table_locks(match)
 
 
 def invalidate_all() -> None:
-    """Invalida todo el cache."""
+    """Invalida todo el cache (snapshots, TTL adaptativo y locks por tabla libres)."""
     with _cache_lock:
         _cache.clear()
+        _ttls.clear()
+        _drop_table_locks(lambda k: True)
+
+
+def _drop_table_locks(match: Callable[[tuple], bool]) -> None:
+    """Descarta los locks por tabla que cumplen match y nadie tiene tomados. Llamar con _cache_lock tomado."""
+    with _table_locks_lock:
+        for k in [k for k, lock in _table_locks.items() if match(k) and not lock.locked()]:
+            del _table_locks[k]
@@ -22,17 +22,73 @@ class Settings(BaseSettings):
     SQL_USUARIO_TABLE: str = "MaestroUsuarios"
     # Cache de usuario por nombre para login (segundos). 0 = desactivado.
     SQL_LOGIN_CACHE_TTL_SEC: int = 60
+    # Cache de reglas activas por usuario para resolve_regla (segundos). 0 = desactivado.
+    REGLAS_CACHE_TTL_SEC: int = 300
+    # Cache del catálogo SQL (categorías + subcategorías) por usuario (segundos). 0 = desactivado.
+    CATALOG_CACHE_TTL_SEC: int = 300
     GOOGLE_SHEETS_CREDENTIALS_FILE: str | None = None
     GOOGLE_SHEETS_CREDENTIALS_JSON: str | None = None
     SHEETS_REGISTRY_JSON: str | None = None
+    # "google" (API real) o "emulator" (app/sheets/emulator.py, in-memory, para benchmarks).
+    SHEETS_BACKEND: str = "google"
+    # Timeout (segundos) de la conexión HTTP a la API de Sheets.
+    SHEETS_HTTP_TIMEOUT_SEC: int = 60
+    # Cuota de requests/minuto a Sheets: por proyecto (la service account cuenta como un usuario)
+    # y por spreadsheet. 0 = sin límite. Son totales del deploy: cada proceso usa
+    # valor / WEB_CONCURRENCY (los buckets viven en cada worker).
+    SHEETS_QUOTA_PER_MIN_PROJECT: int = 60
+    SHEETS_QUOTA_PER_MIN_SPREADSHEET: int = 40
+    # Procesos worker que comparten la cuota (gunicorn.conf.py lo exporta).
+    WEB_CONCURRENCY: int = 1
+    # Fracción de cada bucket que el refresco en background no puede usar (queda para requests).
+    SHEETS_QUOTA_BACKGROUND_RESERVE: float = 0.25
+    # Reintentos ante 429/5xx con backoff exponencial + jitter (segundos).
+    SHEETS_MAX_RETRIES: int = 5
+    SHEETS_BACKOFF_BASE_SEC: float = 1.0
+    SHEETS_BACKOFF_MAX_SEC: float = 32.0  # también tope para Retry-After
     # Fallback solo para scripts/dev; en producción viene de ID_Sheets (MaestroUsuarios)
     SPREADSHEET_ID: str | None = None
     # Cache in-memory para read_table (segundos). 0 = desactivado.
     SHEETS_CACHE_TTL_SEC: int = 120
+    # Límites del TTL adaptativo por tabla: se duplica en cada refresco sin cambios y se divide
+    # a la mitad cuando la hoja cambió. Con MIN = MAX = SHEETS_CACHE_TTL_SEC queda fijo.
+    SHEETS_CACHE_TTL_MIN_SEC: int = 30
+    SHEETS_CACHE_TTL_MAX_SEC: int = 3600
+    # Tablas append-only que al expirar traen solo las filas nuevas (A{n+1}:Z) en vez de toda la hoja.
+    SHEETS_INCREMENTAL_TABLES: list[str] = ["movimientos"]
+    # Recarga completa forzada (segundos) de tablas incrementales o con chequeo barato; detecta ediciones en el medio.
+    SHEETS_FULL_RELOAD_SEC: int = 1800
+    # Resultados filtrados+ordenados de listados Sheets que se guardan para paginar (LRU). 0 = desactivado.
+    SHEETS_QUERY_CACHE_SIZE: int = 128
     # Movimientos desde SQL (True) o Sheets (False). Default SQL.
     MOVIMIENTOS_USE_SQL: bool = True
-    # Refresco periódico de cache (segundos). 0 = desactivado. Solo si SPREADSHEET_ID está set.
+    # Lecturas SQL de movimientos sin JOIN a Categoria/SubCategoria: nombres desde el catálogo
+    # en memoria y página resuelta sobre IX_movimientos_User_Fecha_Id (migración 007).
+    MOVIMIENTOS_JOIN_FREE_READS: bool = True
+    # Ventana por defecto de presupuestos en GET /presupuestos y /bootstrap: meses antes y después
+    # del mes actual. El historial completo se pagina con GET /presupuestos/historial.
+    PRESUPUESTOS_MESES_ATRAS: int = 3
+    PRESUPUESTOS_MESES_ADELANTE: int = 1
+    # Rollup dbo.GastoMensual (migración 008) mantenido en cada escritura de movimientos;
+    # consumo y alertas de presupuestos lo leen en vez de agregar movimientos.
+    # Activar solo con la migración 008 aplicada; al activarlo (o reactivarlo tras tenerlo
+    # apagado) correr antes el backfill de 008: con el flag apagado el rollup no se mantiene.
+    GASTO_MENSUAL_ROLLUP: bool = False
+    # Umbrales (% usado del presupuesto) que reporta GET /presupuestos/alertas
+    PRESUPUESTO_ALERTA_UMBRALES: list[int] = [80, 100]
+    # Refresco periódico de cache (segundos). 0 = desactivado.
+    # Aplica a los spreadsheets activos (ID_Sheets de usuarios logueados) y a SPREADSHEET_ID.
     SHEETS_REFRESH_INTERVAL_SEC: int = 300
+    # Jitter (+/- segundos) sobre el intervalo para no refrescar todos los tenants a la vez.
+    SHEETS_REFRESH_JITTER_SEC: int = 30
+    # Workers del pool de refresco en background.
+    SHEETS_REFRESH_WORKERS: int = 4
+    # Segundos sin requests tras los cuales se deja de refrescar un spreadsheet.
+    SHEETS_TENANT_IDLE_SEC: int = 1800
+    # Warm-up al hacer login: precarga en background las tablas de Sheets y las reglas del usuario.
+    WARMUP_ON_LOGIN: bool = True
+    # Workers del pool de warm-up (acota cuántos logins se precargan en paralelo).
+    WARMUP_WORKERS: int = 2
 
     class Config:
         env_file = ".env"
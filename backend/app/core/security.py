@@ -48,8 +48,10 @@ def require_user(creds: HTTPAuthorizationCredentials = Depends(bearer)) -> dict:
     # Establecer spreadsheet_id en contexto para que Sheets use el del usuario
     id_sheets = payload.get("id_sheets")
     if id_sheets:
+        from app.sheets.refresh import mark_active
         from app.sheets.registry import set_current_spreadsheet_id
         set_current_spreadsheet_id(id_sheets)
+        mark_active(id_sheets)
     # Establecer id_usuario para catalog SQL (sub = MaestroUsuarios.id)
     sub = payload.get("sub") or payload.get("id")
     if sub:
@@ -0,0 +1,257 @@
+"""
+Bootstrap del frontend en un solo round trip a SQL: un batch con varios result sets
+(cursor.nextset()) que trae versiones + categorías, subcategorías, reglas y presupuestos.
+
+Cada sección tiene versión "<count>.<max_id>.<max_ts_us>" (sobre [Timestamp], o ActualizadoEn
+en reglas). Con since, el batch solo trae las filas con timestamp o Id posteriores:
+- versión igual: la sección se omite;
+- si no hubo borrados (el count cierra con las filas nuevas): delta, upsert por id en el cliente;
+- si hubo borrados: la sección se vuelve a leer completa (segundo query, solo esa sección).
+Reglas y presupuestos incluyen nombres de categoría: si el catálogo cambió van completas.
+Presupuestos se limita a la ventana de presupuestos_window(); su versión lleva el mes inicial
+de la ventana y, si la ventana se movió, la sección va completa.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from app.db.catalog import _categoria_row, _subcategoria_row
+from app.db.connection import get_connection
+from app.db.presupuestos import _presupuesto_row, presupuestos_window
+from app.db.regla_comercio import _regla_row
+
+logger = logging.getLogger(__name__)
+
+SECTIONS = ("categorias", "subcategorias", "reglas", "presupuestos")
+# Secciones que muestran nombres de categoría/subcategoría
+_NAMED_SECTIONS = ("reglas", "presupuestos")
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class Version(NamedTuple):
+    count: int
+    max_id: int
+    max_ts_us: int
+    # Alcance de la sección (presupuestos: primer mes de la ventana, YYYYMM); 0 = sin alcance
+    scope: int = 0
+
+    def __str__(self) -> str:
+        base = f"{self.count}.{self.max_id}.{self.max_ts_us}"
+        return f"{base}.{self.scope}" if self.scope else base
+
+    @classmethod
+    def parse(cls, value: str) -> Optional["Version"]:
+        try:
+            parts = [int(p) for p in value.split(".")]
+        except (TypeError, ValueError):
+            return None
+        if len(parts) not in (3, 4):
+            return None
+        return cls(*parts)
+
+    @classmethod
+    def from_stats(cls, count: Any, max_id: Any, max_ts: Optional[datetime]) -> "Version":
+        ts_us = (max_ts - _EPOCH) // timedelta(microseconds=1) if max_ts else 0
+        return cls(int(count or 0), int(max_id or 0), ts_us)
+
+    def after(self) -> Optional[str]:
+        """
+        Cota para "timestamp posterior a esta versión" (comparar con >=). DATETIME2 guarda 100 ns
+        y la versión µs: se redondea hacia arriba para no re-enviar siempre la última fila.
+        Va como string para que el driver no recorte la precisión del parámetro.
+        """
+        if not self.max_ts_us:
+            return None
+        ts = _EPOCH + timedelta(microseconds=self.max_ts_us + 1)
+        return ts.isoformat(sep=" ", timespec="microseconds")
+
+
+def parse_since(since: Optional[str]) -> Dict[str, Version]:
+    """'categorias:3.12.1700000000000000,reglas:...' -> {sección: Version}. Ignora lo inválido."""
+    out: Dict[str, Version] = {}
+    for part in (since or "").split(","):
+        name, _, value = part.strip().partition(":")
+        version = Version.parse(value)
+        if name in SECTIONS and version is not None:
+            out[name] = version
+    return out
+
+
+# sección -> (tabla, columna timestamp, SELECT con {filter}, conversor de fila)
+_SECTION_SQL: Dict[str, Tuple[str, str, str, Callable[[tuple], Dict[str, Any]]]] = {
+    "categorias": (
+        "dbo.Categoria",
+        "[Timestamp]",
+        """
+        SELECT Id, Nombre, Icon, Color, [Timestamp]
+        FROM dbo.Categoria
+        WHERE Id_usuario = @u AND {filter}
+        ORDER BY Nombre
+        """,
+        _categoria_row,
+    ),
+    "subcategorias": (
+        "dbo.SubCategoria",
+        "[Timestamp]",
+        """
+        SELECT Id, Id_Categoria, Nombre_SubCategoria, [Timestamp]
+        FROM dbo.SubCategoria
+        WHERE Id_usuario = @u AND {filter}
+        ORDER BY Id_Categoria, Nombre_SubCategoria
+        """,
+        _subcategoria_row,
+    ),
+    "reglas": (
+        "dbo.ReglaComercio",
+        "ActualizadoEn",
+        """
+        SELECT rc.Id, rc.Patron, rc.EjemploRazonSocial, rc.Id_Categoria, c.Nombre,
+               rc.Id_SubCategoria, sc.Nombre_SubCategoria,
+               rc.Prioridad, rc.Activa, rc.Confianza, rc.ActualizadoEn
+        FROM dbo.ReglaComercio rc
+        JOIN dbo.Categoria c ON c.Id = rc.Id_Categoria AND c.Id_usuario = rc.Id_usuario
+        JOIN dbo.SubCategoria sc ON sc.Id = rc.Id_SubCategoria AND sc.Id_usuario = rc.Id_usuario
+        WHERE rc.Id_usuario = @u AND {filter}
+        ORDER BY rc.Prioridad ASC, LEN(rc.PatronNorm) DESC, rc.ActualizadoEn DESC
+        """,
+        _regla_row,
+    ),
+    "presupuestos": (
+        "dbo.Presupuestos",
+        "[Timestamp]",
+        """
+        SELECT p.Id, p.PeriodoMes, p.Id_Categoria, c.Nombre AS Nombre_Categoria,
+               p.Id_SubCategoria, sc.Nombre_SubCategoria, p.Monto, p.[Timestamp]
+        FROM dbo.Presupuestos p
+        LEFT JOIN dbo.Categoria c ON c.Id = p.Id_Categoria AND c.Id_usuario = p.Id_usuario
+        LEFT JOIN dbo.SubCategoria sc ON sc.Id = p.Id_SubCategoria AND sc.Id_usuario = p.Id_usuario
+        WHERE p.Id_usuario = @u AND p.PeriodoMes BETWEEN @presupuestos_desde AND @presupuestos_hasta
+          AND {filter}
+        ORDER BY p.PeriodoMes DESC, c.Nombre, sc.Nombre_SubCategoria
+        """,
+        _presupuesto_row,
+    ),
+}
+# Alias de la tabla principal en cada SELECT (para el filtro)
+_ALIAS = {"categorias": "", "subcategorias": "", "reglas": "rc.", "presupuestos": "p."}
+# Condición extra de las stats (mismo alcance que el SELECT de la sección)
+_STATS_WHERE = {"presupuestos": " AND PeriodoMes BETWEEN @presupuestos_desde AND @presupuestos_hasta"}
+# Variables comunes al batch y a _full_section: usuario y ventana de presupuestos
+_HEADER = "SET NOCOUNT ON;\nDECLARE @u INT = ?, @presupuestos_desde DATE = ?, @presupuestos_hasta DATE = ?;"
+
+
+def _section_filter(name: str) -> str:
+    ts_col = _SECTION_SQL[name][1]
+    alias = _ALIAS[name]
+    full = f"@{name}_full = 1"
+    if name in _NAMED_SECTIONS:
+        full += " OR @names_changed = 1"
+    return f"({full} OR {alias}{ts_col} >= @{name}_ts OR {alias}Id > @{name}_id)"
+
+
+def _build_batch() -> str:
+    declares = [_HEADER]
+    for name in SECTIONS:
+        declares.append(
+            f"DECLARE @{name}_full BIT = ?, @{name}_ts DATETIME2 = ?, @{name}_id INT = ?;"
+        )
+    # Nombres de categoría/subcategoría cambiados desde since (los borrados no importan:
+    # una categoría con reglas o presupuestos no se puede borrar)
+    declares.append(
+        """
+        DECLARE @names_changed BIT = CASE
+          WHEN @categorias_full = 1 OR @subcategorias_full = 1 THEN 1
+          WHEN EXISTS (SELECT 1 FROM dbo.Categoria WHERE Id_usuario = @u
+                       AND ([Timestamp] >= @categorias_ts OR Id > @categorias_id)) THEN 1
+          WHEN EXISTS (SELECT 1 FROM dbo.SubCategoria WHERE Id_usuario = @u
+                       AND ([Timestamp] >= @subcategorias_ts OR Id > @subcategorias_id)) THEN 1
+          ELSE 0 END;
+        """
+    )
+    stats_cols = []
+    stats_from = []
+    for i, name in enumerate(SECTIONS):
+        table, ts_col = _SECTION_SQL[name][:2]
+        stats_cols.append(f"s{i}.n, s{i}.max_id, s{i}.max_ts")
+        stats_from.append(
+            f"(SELECT COUNT(*) AS n, MAX(Id) AS max_id, MAX({ts_col}) AS max_ts "
+            f"FROM {table} WHERE Id_usuario = @u{_STATS_WHERE.get(name, '')}) s{i}"
+        )
+    stats = f"SELECT {', '.join(stats_cols)}, @names_changed FROM {' CROSS JOIN '.join(stats_from)};"
+    selects = [_SECTION_SQL[name][2].format(filter=_section_filter(name)) + ";" for name in SECTIONS]
+    return "\n".join(declares + [stats] + selects)
+
+
+_BATCH_SQL = _build_batch()
+
+
+def _full_section(cur, name: str, header_params: List[Any]) -> List[tuple]:
+    sql = _HEADER + _SECTION_SQL[name][2].format(filter="1 = 1")
+    cur.execute(sql, header_params)
+    return cur.fetchall()
+
+
+def fetch_bootstrap(id_usuario: int, since: Dict[str, Version]) -> Dict[str, Any]:
+    """
+    Lee las secciones SQL del bootstrap en un round trip (más uno por sección con borrados).
+    Retorna {"sections": {nombre: filas}, "versions": {nombre: str}, "delta": [nombres]}.
+    Las secciones sin cambios respecto de since no aparecen en "sections".
+    """
+    desde, hasta = presupuestos_window()
+    scopes = {"presupuestos": desde.year * 100 + desde.month}
+    # Una versión de otro alcance (la ventana se movió) no sirve de base: sección completa
+    since = {name: v for name, v in since.items() if v.scope == scopes.get(name, 0)}
+    header_params: List[Any] = [id_usuario, desde, hasta]
+    params = list(header_params)
+    for name in SECTIONS:
+        v = since.get(name)
+        params.extend([0 if v else 1, v.after() if v else None, v.max_id if v else 0])
+
+    t0 = time.perf_counter()
+    refetched: List[str] = []
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(_BATCH_SQL, params)
+        stats = cur.fetchone()
+        raw: Dict[str, List[tuple]] = {}
+        for name in SECTIONS:
+            cur.nextset()
+            raw[name] = cur.fetchall()
+
+        names_changed = bool(stats[-1])
+        versions: Dict[str, Version] = {}
+        sections: Dict[str, List[Dict[str, Any]]] = {}
+        delta: List[str] = []
+        for i, name in enumerate(SECTIONS):
+            current = Version.from_stats(*stats[3 * i:3 * i + 3])._replace(scope=scopes.get(name, 0))
+            versions[name] = current
+            previous = since.get(name)
+            full = previous is None or (name in _NAMED_SECTIONS and names_changed)
+            rows = raw[name]
+            if not full:
+                if previous == current:
+                    continue
+                inserted = sum(1 for r in rows if r[0] > previous.max_id)
+                if previous.count + inserted != current.count:
+                    # Hubo borrados: el delta no alcanza, la sección va completa
+                    rows = _full_section(cur, name, header_params)
+                    refetched.append(name)
+                else:
+                    delta.append(name)
+            to_dict = _SECTION_SQL[name][3]
+            sections[name] = [to_dict(r) for r in rows]
+
+    logger.info(
+        "bootstrap_sql t=%.3fs since=%s sections=%s delta=%s refetched=%s",
+        time.perf_counter() - t0, ",".join(since) or "-", ",".join(sections) or "-",
+        ",".join(delta) or "-", ",".join(refetched) or "-",
+    )
+    return {
+        "sections": sections,
+        "versions": {name: str(v) for name, v in versions.items()},
+        "delta": delta,
+    }
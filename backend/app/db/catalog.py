@@ -1,13 +1,20 @@
 """
 Repository SQL para Categoria y SubCategoria (multi-tenant por Id_usuario).
 Reemplaza lectura desde Google Sheets para estos catálogos.
+Las lecturas salen de un snapshot in-memory por usuario (CatalogSnapshot, CATALOG_CACHE_TTL_SEC)
+que las escrituras de este módulo invalidan; las de otros workers se detectan comparando la
+versión del snapshot (COUNT/MAX(Id)/MAX([Timestamp]) de ambas tablas) con SQL antes de servirlo.
 """
 from __future__ import annotations
 
+import itertools
 import logging
+import threading
+import time
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
+from app.core.config import settings
 from app.db.connection import get_connection
 
 logger = logging.getLogger(__name__)
@@ -27,13 +34,84 @@ def _get_id_usuario(user: dict) -> int:
         raise ValueError(f"Id_usuario inválido en token: {sub}") from e
 
 
-def list_categorias_sql(id_usuario: int) -> List[Dict[str, Any]]:
+class CatalogSnapshot:
     """
-    Lista categorías del usuario desde Azure SQL.
-    Formato compatible con frontend: { id, nombre, icon, color }.
+    Catálogo completo de un usuario (categorías + subcategorías) con índices por id y por
+    nombre en minúsculas. Inmutable (salvo checked): cada recarga crea uno nuevo con version mayor.
+    stats es la versión en SQL al momento de la carga; checked, la última vez que se comparó.
+    Los dicts son compartidos: las funciones públicas devuelven copias.
     """
+
+    __slots__ = (
+        "version", "ts", "stats", "checked", "categorias", "subcategorias",
+        "cat_by_id", "sub_by_id", "cat_by_nombre", "sub_by_nombre", "subs_by_cat",
+    )
+
+    def __init__(
+        self,
+        categorias: List[Dict[str, Any]],
+        subcategorias: List[Dict[str, Any]],
+        stats: Tuple[Any, ...] = (),
+    ) -> None:
+        self.version = next(_catalog_versions)
+        self.ts = time.time()
+        self.stats = stats
+        self.checked = self.ts
+        self.categorias = categorias  # ORDER BY Nombre
+        self.subcategorias = subcategorias  # ORDER BY Id_Categoria, Nombre_SubCategoria
+        self.cat_by_id = {int(c["id"]): c for c in categorias}
+        self.sub_by_id = {int(s["id"]): s for s in subcategorias}
+        # Primera aparición gana (mismo resultado que recorrer la lista)
+        self.cat_by_nombre: Dict[str, Dict[str, Any]] = {}
+        for c in categorias:
+            self.cat_by_nombre.setdefault(c["nombre"].lower(), c)
+        self.sub_by_nombre: Dict[tuple, Dict[str, Any]] = {}
+        self.subs_by_cat: Dict[int, List[Dict[str, Any]]] = {}
+        for s in subcategorias:
+            cat_id = int(s["categoria_id"])
+            self.sub_by_nombre.setdefault((cat_id, s["nombre"].lower()), s)
+            self.subs_by_cat.setdefault(cat_id, []).append(s)
+
+
+_catalog_versions = itertools.count(1)
+# id_usuario -> CatalogSnapshot
+_catalog_cache: Dict[int, CatalogSnapshot] = {}
+# id_usuario -> generación; invalidate la incrementa para descartar cargas en vuelo
+_catalog_gen: Dict[int, int] = {}
+_catalog_lock = threading.Lock()
+# Tras un miss por id/nombre se recarga una vez si el snapshot tiene más de estos segundos
+# (otro worker pudo haber creado la categoría)
+_MISS_RELOAD_SEC = 2.0
+# Un snapshot comparado con SQL hace menos de estos segundos se sirve sin volver a comparar
+# (varias búsquedas dentro de un mismo request)
+_VERSION_CHECK_SEC = 1.0
+
+# (count, max_id, max_ts) de Categoria y de SubCategoria: cambia con cada alta, edición o baja
+_STATS_SQL = """
+SELECT c.n, c.max_id, c.max_ts, s.n, s.max_id, s.max_ts
+FROM (SELECT COUNT(*) AS n, MAX(Id) AS max_id, MAX([Timestamp]) AS max_ts
+      FROM dbo.Categoria WHERE Id_usuario = ?) c
+CROSS JOIN (SELECT COUNT(*) AS n, MAX(Id) AS max_id, MAX([Timestamp]) AS max_ts
+      FROM dbo.SubCategoria WHERE Id_usuario = ?) s
+"""
+
+
+def _fetch_stats(cur, id_usuario: int) -> Tuple[Any, ...]:
+    cur.execute(_STATS_SQL, (id_usuario, id_usuario))
+    row = cur.fetchone()
+    return tuple(row) if row else ()
+
+
+def _query_catalog_stats(id_usuario: int) -> Tuple[Any, ...]:
+    with get_connection() as conn:
+        return _fetch_stats(conn.cursor(), id_usuario)
+
+
+def _query_catalog(id_usuario: int) -> CatalogSnapshot:
     with get_connection() as conn:
         cur = conn.cursor()
+        # Versión antes que las filas: si alguien escribe en el medio, la próxima comparación falla
+        stats = _fetch_stats(cur, id_usuario)
         cur.execute(
             """
             SELECT Id, Nombre, Icon, Color, [Timestamp]
@@ -43,16 +121,115 @@ def list_categorias_sql(id_usuario: int) -> List[Dict[str, Any]]:
             """,
             (id_usuario,),
         )
-        rows = cur.fetchall()
-    out = []
-    for r in rows:
-        out.append({
-            "id": str(r[0]),
-            "nombre": str(r[1] or "").strip() or "",
-            "icon": str(r[2] or "").strip() or DEFAULT_ICON,
-            "color": str(r[3] or "").strip() or DEFAULT_COLOR,
-        })
-    return out
+        cat_rows = cur.fetchall()
+        cur.execute(
+            """
+            SELECT Id, Id_Categoria, Nombre_SubCategoria, [Timestamp]
+            FROM dbo.SubCategoria
+            WHERE Id_usuario = ?
+            ORDER BY Id_Categoria, Nombre_SubCategoria
+            """,
+            (id_usuario,),
+        )
+        sub_rows = cur.fetchall()
+    return CatalogSnapshot(
+        [_categoria_row(r) for r in cat_rows], [_subcategoria_row(r) for r in sub_rows], stats
+    )
+
+
+def _categoria_row(r: tuple) -> Dict[str, Any]:
+    """Fila (Id, Nombre, Icon, Color, ...) -> { id, nombre, icon, color }."""
+    return {
+        "id": str(r[0]),
+        "nombre": str(r[1] or "").strip() or "",
+        "icon": str(r[2] or "").strip() or DEFAULT_ICON,
+        "color": str(r[3] or "").strip() or DEFAULT_COLOR,
+    }
+
+
+def _subcategoria_row(r: tuple) -> Dict[str, Any]:
+    """Fila (Id, Id_Categoria, Nombre_SubCategoria, ...) -> { id, categoria_id, nombre }."""
+    return {
+        "id": str(r[0]),
+        "categoria_id": str(r[1]),
+        "nombre": str(r[2] or "").strip() or "",
+    }
+
+
+def get_catalog(id_usuario: int, max_age: Optional[float] = None) -> CatalogSnapshot:
+    """
+    Snapshot del catálogo del usuario, desde cache (CATALOG_CACHE_TTL_SEC) o SQL.
+    max_age acota la antigüedad aceptada (ej. para recargar tras un miss).
+    Antes de servir un snapshot cacheado compara su versión con SQL (una consulta de agregados,
+    salvo que se haya comparado hace menos de _VERSION_CHECK_SEC): otro worker pudo escribir.
+    """
+    ttl = settings.CATALOG_CACHE_TTL_SEC
+    if max_age is not None:
+        ttl = min(ttl, max_age)
+    with _catalog_lock:
+        snapshot = _catalog_cache.get(id_usuario)
+        gen = _catalog_gen.get(id_usuario, 0)
+    now = time.time()
+    if snapshot is not None and now - snapshot.ts <= ttl:
+        if now - snapshot.checked <= _VERSION_CHECK_SEC:
+            return snapshot
+        if _query_catalog_stats(id_usuario) == snapshot.stats:
+            snapshot.checked = now
+            return snapshot
+    t0 = time.perf_counter()
+    snapshot = _query_catalog(id_usuario)
+    logger.info(
+        "catalog_cache_hit=false id_usuario=%s categorias=%d subcategorias=%d t=%.3fs",
+        id_usuario, len(snapshot.categorias), len(snapshot.subcategorias), time.perf_counter() - t0,
+    )
+    if settings.CATALOG_CACHE_TTL_SEC > 0:
+        with _catalog_lock:
+            # Si hubo una escritura mientras se cargaba, no guardar lo leído
+            if _catalog_gen.get(id_usuario, 0) == gen:
+                _catalog_cache[id_usuario] = snapshot
+    return snapshot
+
+
+def get_catalog_covering(id_usuario: int, cat_ids: Iterable[int], sub_ids: Iterable[int]) -> CatalogSnapshot:
+    """Como get_catalog, recargando una vez si falta algún id (ej. creado por otro worker)."""
+    snapshot = get_catalog(id_usuario)
+    missing = any(i not in snapshot.cat_by_id for i in cat_ids) or any(
+        i not in snapshot.sub_by_id for i in sub_ids
+    )
+    if missing and time.time() - snapshot.ts > _MISS_RELOAD_SEC:
+        snapshot = get_catalog(id_usuario, max_age=_MISS_RELOAD_SEC)
+    return snapshot
+
+
+def invalidate_catalog(id_usuario: int) -> None:
+    """Descarta el catálogo cacheado del usuario (llamar tras escribir Categoria/SubCategoria)."""
+    with _catalog_lock:
+        _catalog_cache.pop(id_usuario, None)
+        _catalog_gen[id_usuario] = _catalog_gen.get(id_usuario, 0) + 1
+
+
+def catalog_cache_warm(id_usuario: int) -> bool:
+    """True si el catálogo del usuario ya está en cache (para el warm-up)."""
+    with _catalog_lock:
+        snapshot = _catalog_cache.get(id_usuario)
+        return snapshot is not None and time.time() - snapshot.ts <= settings.CATALOG_CACHE_TTL_SEC
+
+
+def _lookup(id_usuario: int, find) -> Optional[Dict[str, Any]]:
+    """find(snapshot) en el catálogo cacheado; ante un miss recarga una vez si no es reciente."""
+    snapshot = get_catalog(id_usuario)
+    found = find(snapshot)
+    if found is None and time.time() - snapshot.ts > _MISS_RELOAD_SEC:
+        found = find(get_catalog(id_usuario, max_age=_MISS_RELOAD_SEC))
+    return dict(found) if found is not None else None
+
+
+def list_categorias_sql(id_usuario: int) -> List[Dict[str, Any]]:
+    """
+    Lista categorías del usuario (desde el catálogo cacheado).
+    Formato compatible con frontend: { id, nombre, icon, color }.
+    """
+    return [dict(c) for c in get_catalog(id_usuario).categorias]
 
 
 def list_subcategorias_sql(
@@ -60,7 +237,7 @@ def list_subcategorias_sql(
     categoria_id: Optional[int] = None,
 ) -> List[Dict[str, Any]]:
     """
-    Lista subcategorías del usuario desde Azure SQL.
+    Lista subcategorías del usuario (desde el catálogo cacheado).
     Si categoria_id se pasa, filtra y valida que la categoría pertenezca al usuario.
     Formato: { id, categoria_id, nombre }.
     """
@@ -69,39 +246,10 @@ def list_subcategorias_sql(
         cat = get_categoria_by_id_sql(id_usuario, categoria_id)
         if not cat:
             return []  # Categoría no existe o no pertenece al usuario
-        with get_connection() as conn:
-            cur = conn.cursor()
-            cur.execute(
-                """
-                SELECT Id, Id_Categoria, Nombre_SubCategoria, [Timestamp]
-                FROM dbo.SubCategoria
-                WHERE Id_usuario = ? AND Id_Categoria = ?
-                ORDER BY Nombre_SubCategoria
-                """,
-                (id_usuario, categoria_id),
-            )
-            rows = cur.fetchall()
+        subs = get_catalog(id_usuario).subs_by_cat.get(int(cat["id"]), [])
     else:
-        with get_connection() as conn:
-            cur = conn.cursor()
-            cur.execute(
-                """
-                SELECT Id, Id_Categoria, Nombre_SubCategoria, [Timestamp]
-                FROM dbo.SubCategoria
-                WHERE Id_usuario = ?
-                ORDER BY Id_Categoria, Nombre_SubCategoria
-                """,
-                (id_usuario,),
-            )
-            rows = cur.fetchall()
-    out = []
-    for r in rows:
-        out.append({
-            "id": str(r[0]),
-            "categoria_id": str(r[1]),
-            "nombre": str(r[2] or "").strip() or "",
-        })
-    return out
+        subs = get_catalog(id_usuario).subcategorias
+    return [dict(s) for s in subs]
 
 
 def get_categoria_by_id_sql(id_usuario: int, categoria_id: int | str) -> Optional[Dict[str, Any]]:
@@ -110,25 +258,7 @@ def get_categoria_by_id_sql(id_usuario: int, categoria_id: int | str) -> Optiona
         cat_id = int(categoria_id)
     except (TypeError, ValueError):
         return None
-    with get_connection() as conn:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT Id, Nombre, Icon, Color, [Timestamp]
-            FROM dbo.Categoria
-            WHERE Id_usuario = ? AND Id = ?
-            """,
-            (id_usuario, cat_id),
-        )
-        row = cur.fetchone()
-    if not row:
-        return None
-    return {
-        "id": str(row[0]),
-        "nombre": str(row[1] or "").strip() or "",
-        "icon": str(row[2] or "").strip() or DEFAULT_ICON,
-        "color": str(row[3] or "").strip() or DEFAULT_COLOR,
-    }
+    return _lookup(id_usuario, lambda snap: snap.cat_by_id.get(cat_id))
 
 
 def get_subcategoria_by_id_sql(
@@ -139,37 +269,36 @@ def get_subcategoria_by_id_sql(
     """Obtiene una subcategoría por Id. Valida que pertenezca al usuario."""
     try:
         sub_id = int(subcategoria_id)
+        cat_id = int(categoria_id) if categoria_id is not None else None
     except (TypeError, ValueError):
         return None
-    with get_connection() as conn:
-        cur = conn.cursor()
-        if categoria_id is not None:
-            cat_id = int(categoria_id) if isinstance(categoria_id, str) else categoria_id
-            cur.execute(
-                """
-                SELECT Id, Id_Categoria, Nombre_SubCategoria, [Timestamp]
-                FROM dbo.SubCategoria
-                WHERE Id_usuario = ? AND Id = ? AND Id_Categoria = ?
-                """,
-                (id_usuario, sub_id, cat_id),
-            )
-        else:
-            cur.execute(
-                """
-                SELECT Id, Id_Categoria, Nombre_SubCategoria, [Timestamp]
-                FROM dbo.SubCategoria
-                WHERE Id_usuario = ? AND Id = ?
-                """,
-                (id_usuario, sub_id),
-            )
-        row = cur.fetchone()
-    if not row:
+
+    def find(snap: CatalogSnapshot) -> Optional[Dict[str, Any]]:
+        sub = snap.sub_by_id.get(sub_id)
+        if sub is None or (cat_id is not None and int(sub["categoria_id"]) != cat_id):
+            return None
+        return sub
+
+    return _lookup(id_usuario, find)
+
+
+def find_categoria_by_nombre_sql(id_usuario: int, nombre: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Categoría del usuario por nombre (sin distinguir mayúsculas ni espacios al borde)."""
+    key = (nombre or "").strip().lower()
+    return _lookup(id_usuario, lambda snap: snap.cat_by_nombre.get(key))
+
+
+def find_subcategoria_by_nombre_sql(
+    id_usuario: int,
+    categoria_id: int | str,
+    nombre: Optional[str],
+) -> Optional[Dict[str, Any]]:
+    """Subcategoría de la categoría por nombre (sin distinguir mayúsculas ni espacios al borde)."""
+    try:
+        key = (int(categoria_id), (nombre or "").strip().lower())
+    except (TypeError, ValueError):
         return None
-    return {
-        "id": str(row[0]),
-        "categoria_id": str(row[1]),
-        "nombre": str(row[2] or "").strip() or "",
-    }
+    return _lookup(id_usuario, lambda snap: snap.sub_by_nombre.get(key))
 
 
 def create_categoria_sql(
@@ -191,6 +320,7 @@ def create_categoria_sql(
         )
         row = cur.fetchone()
         conn.commit()
+        invalidate_catalog(id_usuario)
     if not row:
         raise RuntimeError("No se pudo crear la categoría")
     return {
@@ -234,6 +364,7 @@ def patch_categoria_sql(
             params,
         )
         conn.commit()
+        invalidate_catalog(id_usuario)
         if cur.rowcount == 0:
             return None
     return get_categoria_by_id_sql(id_usuario, cat_id)
@@ -249,6 +380,7 @@ def delete_categoria_sql(id_usuario: int, categoria_id: int | str) -> bool:
             (id_usuario, cat_id),
         )
         conn.commit()
+        invalidate_catalog(id_usuario)
         return cur.rowcount > 0
 
 
@@ -273,6 +405,7 @@ def create_subcategoria_sql(
         )
         row = cur.fetchone()
         conn.commit()
+        invalidate_catalog(id_usuario)
     if not row:
         raise RuntimeError("No se pudo crear la subcategoría")
     return {
@@ -300,6 +433,7 @@ def patch_subcategoria_sql(
             (nombre.strip(), id_usuario, sub_id),
         )
         conn.commit()
+        invalidate_catalog(id_usuario)
         if cur.rowcount == 0:
             return None
     return get_subcategoria_by_id_sql(id_usuario, sub_id)
@@ -315,4 +449,5 @@ def delete_subcategoria_sql(id_usuario: int, subcategoria_id: int | str) -> bool
             (id_usuario, sub_id),
         )
         conn.commit()
+        invalidate_catalog(id_usuario)
         return cur.rowcount > 0
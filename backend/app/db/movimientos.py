@@ -9,17 +9,76 @@ from datetime import date, datetime
 from decimal import Decimal
 from typing import Any, Dict, List, Optional
 
+from app.core.config import settings
 from app.db.catalog import (
+    find_categoria_by_nombre_sql,
+    find_subcategoria_by_nombre_sql,
+    get_catalog_covering,
     get_categoria_by_id_sql,
     get_subcategoria_by_id_sql,
-    list_categorias_sql,
-    list_subcategorias_sql,
 )
 from app.db.connection import get_connection
 from app.utils.parse_utils import parse_date_flex, parse_money
 
 logger = logging.getLogger(__name__)
 
+# Columnas de dbo.movimientos que devuelven las lecturas
+_MOVIMIENTO_COLS = [
+    "Id", "Fecha", "Timestamp", "MedioCarga", "TipoMovimiento", "Moneda", "Monto",
+    "Id_Credito_Debito", "Id_Medio_Pago_Final", "Descripcion",
+    "Id_Categoria", "Id_SubCategoria", "Origen", "Origen_Id",
+]
+_SELECT_COLS = """
+              m.Id, m.Fecha, m.[Timestamp], m.MedioCarga, m.TipoMovimiento, m.Moneda, m.Monto,
+              m.Id_Credito_Debito, m.Id_Medio_Pago_Final, m.Descripcion,
+              m.Id_Categoria, m.Id_SubCategoria, m.Origen, m.Origen_Id"""
+# Lecturas con JOIN: nombres de categoría/subcategoría desde SQL
+_SELECT_JOIN = f"""
+            SELECT{_SELECT_COLS},
+              c.Nombre AS Nombre_Categoria,
+              sc.Nombre_SubCategoria
+            FROM dbo.movimientos m
+            LEFT JOIN dbo.Categoria c ON c.Id = m.Id_Categoria AND c.Id_usuario = m.Id_usuario
+            LEFT JOIN dbo.SubCategoria sc ON sc.Id = m.Id_SubCategoria AND sc.Id_usuario = m.Id_usuario"""
+_JOIN_COLS = _MOVIMIENTO_COLS + ["Nombre_Categoria", "Nombre_SubCategoria"]
+
+# Rollup dbo.GastoMensual (migración 008): cada escritura deja en @delta las filas que salen
+# (Signo -1) y las que entran (Signo +1), vía OUTPUT INTO, y las aplica en el mismo batch.
+_DELTA_DECLARE = """
+            DECLARE @delta TABLE (
+              Id INT, Fecha DATE, TipoMovimiento NVARCHAR(20), Moneda NVARCHAR(10), Monto DECIMAL(18,2),
+              Id_Categoria INT, Id_SubCategoria INT, Signo INT
+            );"""
+_APPLY_DELTA = """
+            MERGE dbo.GastoMensual WITH (HOLDLOCK) AS g
+            USING (
+              SELECT DATEFROMPARTS(YEAR(Fecha), MONTH(Fecha), 1) AS PeriodoMes, Moneda,
+                     Id_Categoria, Id_SubCategoria, SUM(Signo * Monto) AS Monto, SUM(Signo) AS Cantidad
+              FROM @delta
+              WHERE TipoMovimiento = 'Gasto'
+              GROUP BY DATEFROMPARTS(YEAR(Fecha), MONTH(Fecha), 1), Moneda, Id_Categoria, Id_SubCategoria
+              HAVING SUM(Signo * Monto) <> 0 OR SUM(Signo) <> 0
+            ) AS d
+            ON g.Id_usuario = @u AND g.PeriodoMes = d.PeriodoMes AND g.Moneda = d.Moneda
+               AND EXISTS (SELECT g.Id_Categoria, g.Id_SubCategoria INTERSECT SELECT d.Id_Categoria, d.Id_SubCategoria)
+            WHEN MATCHED THEN
+              UPDATE SET Monto = g.Monto + d.Monto, Cantidad = g.Cantidad + d.Cantidad
+            WHEN NOT MATCHED THEN
+              INSERT (Id_usuario, PeriodoMes, Moneda, Id_Categoria, Id_SubCategoria, Monto, Cantidad)
+              VALUES (@u, d.PeriodoMes, d.Moneda, d.Id_Categoria, d.Id_SubCategoria, d.Monto, d.Cantidad);"""
+
+
+def _delta_cols(prefix: str, signo: int) -> str:
+    """Columnas de @delta desde INSERTED/DELETED (o un alias de tabla) con su signo."""
+    return (
+        f"{prefix}.Id, {prefix}.Fecha, {prefix}.TipoMovimiento, {prefix}.Moneda, {prefix}.Monto, "
+        f"{prefix}.Id_Categoria, {prefix}.Id_SubCategoria, {signo}"
+    )
+
+
+def _apply_delta() -> str:
+    return _APPLY_DELTA if settings.GASTO_MENSUAL_ROLLUP else ""
+
 
 def _row_to_item(r: tuple, col_names: List[str]) -> Dict[str, Any]:
     """Convierte fila SQL a dict con nombres de columna."""
@@ -92,21 +151,13 @@ def _resolve_categoria_subcategoria_from_names(
     """Resuelve nombres a IDs (compatibilidad con payload legacy)."""
     if not nombre_categoria and not nombre_subcategoria:
         return None, None
-    cats = list_categorias_sql(id_usuario)
-    cat = next(
-        (c for c in cats if (c.get("nombre") or "").strip().lower() == (nombre_categoria or "").strip().lower()),
-        None,
-    )
+    cat = find_categoria_by_nombre_sql(id_usuario, nombre_categoria)
     if not cat:
         return None, None
     id_cat = int(cat["id"])
     if not nombre_subcategoria:
         return id_cat, None
-    subs = list_subcategorias_sql(id_usuario, categoria_id=id_cat)
-    sub = next(
-        (s for s in subs if (s.get("nombre") or "").strip().lower() == (nombre_subcategoria or "").strip().lower()),
-        None,
-    )
+    sub = find_subcategoria_by_nombre_sql(id_usuario, id_cat, nombre_subcategoria)
     if not sub:
         return id_cat, None
     return id_cat, int(sub["id"])
@@ -138,6 +189,18 @@ def _validate_categoria_subcategoria(
     return None, None
 
 
+def _hydrate_nombres(id_usuario: int, rows: List[Dict[str, Any]]) -> None:
+    """Completa Nombre_Categoria/Nombre_SubCategoria desde el catálogo en memoria (lecturas sin JOIN)."""
+    cat_ids = {r["Id_Categoria"] for r in rows if r.get("Id_Categoria") is not None}
+    sub_ids = {r["Id_SubCategoria"] for r in rows if r.get("Id_SubCategoria") is not None}
+    catalog = get_catalog_covering(id_usuario, cat_ids, sub_ids)
+    for r in rows:
+        cat = catalog.cat_by_id.get(r.get("Id_Categoria"))
+        sub = catalog.sub_by_id.get(r.get("Id_SubCategoria"))
+        r["Nombre_Categoria"] = cat["nombre"] if cat else None
+        r["Nombre_SubCategoria"] = sub["nombre"] if sub else None
+
+
 def list_movimientos(
     id_usuario: int,
     from_date: Optional[date] = None,
@@ -209,67 +272,75 @@ def list_movimientos(
         )
         total = cur.fetchone()[0] or 0
 
-        # Data con JOIN para nombres
-        cur.execute(
-            f"""
-            SELECT
-              m.Id, m.Fecha, m.[Timestamp], m.MedioCarga, m.TipoMovimiento, m.Moneda, m.Monto,
-              m.Id_Credito_Debito, m.Id_Medio_Pago_Final, m.Descripcion,
-              m.Id_Categoria, m.Id_SubCategoria, m.Origen, m.Origen_Id,
-              c.Nombre AS Nombre_Categoria,
-              sc.Nombre_SubCategoria
-            FROM dbo.movimientos m
-            LEFT JOIN dbo.Categoria c ON c.Id = m.Id_Categoria AND c.Id_usuario = m.Id_usuario
-            LEFT JOIN dbo.SubCategoria sc ON sc.Id = m.Id_SubCategoria AND sc.Id_usuario = m.Id_usuario
-            WHERE {where}
-            ORDER BY m.Fecha DESC, m.Id DESC
-            OFFSET ? ROWS FETCH NEXT ? ROWS ONLY
-            """,
-            params + [offset, limit],
-        )
+        if settings.MOVIMIENTOS_JOIN_FREE_READS:
+            # La página se resuelve sobre IX_movimientos_User_Fecha_Id (migración 007) y
+            # solo sus filas se leen de la tabla; los nombres salen del catálogo en memoria
+            cur.execute(
+                f"""
+                WITH page AS (
+                  SELECT m.Id, m.Fecha
+                  FROM dbo.movimientos m
+                  WHERE {where}
+                  ORDER BY m.Fecha DESC, m.Id DESC
+                  OFFSET ? ROWS FETCH NEXT ? ROWS ONLY
+                )
+                SELECT{_SELECT_COLS}
+                FROM page p
+                JOIN dbo.movimientos m ON m.Id = p.Id
+                ORDER BY p.Fecha DESC, p.Id DESC
+                """,
+                params + [offset, limit],
+            )
+            col_names = _MOVIMIENTO_COLS
+        else:
+            # Data con JOIN para nombres
+            cur.execute(
+                f"""{_SELECT_JOIN}
+                WHERE {where}
+                ORDER BY m.Fecha DESC, m.Id DESC
+                OFFSET ? ROWS FETCH NEXT ? ROWS ONLY
+                """,
+                params + [offset, limit],
+            )
+            col_names = _JOIN_COLS
         rows = cur.fetchall()
 
-    col_names = [
-        "Id", "Fecha", "Timestamp", "MedioCarga", "TipoMovimiento", "Moneda", "Monto",
-        "Id_Credito_Debito", "Id_Medio_Pago_Final", "Descripcion",
-        "Id_Categoria", "Id_SubCategoria", "Origen", "Origen_Id",
-        "Nombre_Categoria", "Nombre_SubCategoria",
-    ]
-    items = [_movimiento_to_api(_row_to_item(r, col_names)) for r in rows]
-    return items, total
+    raw = [_row_to_item(r, col_names) for r in rows]
+    if settings.MOVIMIENTOS_JOIN_FREE_READS:
+        _hydrate_nombres(id_usuario, raw)
+    return [_movimiento_to_api(r) for r in raw], total
 
 
 def get_movimiento(id_usuario: int, mov_id: int) -> Optional[Dict[str, Any]]:
     """Obtiene un movimiento por Id."""
+    join_free = settings.MOVIMIENTOS_JOIN_FREE_READS
     with get_connection() as conn:
         cur = conn.cursor()
-        cur.execute(
-            """
-            SELECT
-              m.Id, m.Fecha, m.[Timestamp], m.MedioCarga, m.TipoMovimiento, m.Moneda, m.Monto,
-              m.Id_Credito_Debito, m.Id_Medio_Pago_Final, m.Descripcion,
-              m.Id_Categoria, m.Id_SubCategoria, m.Origen, m.Origen_Id,
-              c.Nombre AS Nombre_Categoria,
-              sc.Nombre_SubCategoria
-            FROM dbo.movimientos m
-            LEFT JOIN dbo.Categoria c ON c.Id = m.Id_Categoria AND c.Id_usuario = m.Id_usuario
-            LEFT JOIN dbo.SubCategoria sc ON sc.Id = m.Id_SubCategoria AND sc.Id_usuario = m.Id_usuario
-            WHERE m.Id_usuario = ? AND m.Id = ?
-            """,
-            (id_usuario, mov_id),
-        )
+        if join_free:
+            cur.execute(
+                f"""
+                SELECT{_SELECT_COLS}
+                FROM dbo.movimientos m
+                WHERE m.Id_usuario = ? AND m.Id = ?
+                """,
+                (id_usuario, mov_id),
+            )
+        else:
+            cur.execute(
+                f"""{_SELECT_JOIN}
+                WHERE m.Id_usuario = ? AND m.Id = ?
+                """,
+                (id_usuario, mov_id),
+            )
         row = cur.fetchone()
 
     if not row:
         return None
 
-    col_names = [
-        "Id", "Fecha", "Timestamp", "MedioCarga", "TipoMovimiento", "Moneda", "Monto",
-        "Id_Credito_Debito", "Id_Medio_Pago_Final", "Descripcion",
-        "Id_Categoria", "Id_SubCategoria", "Origen", "Origen_Id",
-        "Nombre_Categoria", "Nombre_SubCategoria",
-    ]
-    return _movimiento_to_api(_row_to_item(row, col_names))
+    item = _row_to_item(row, _MOVIMIENTO_COLS if join_free else _JOIN_COLS)
+    if join_free:
+        _hydrate_nombres(id_usuario, [item])
+    return _movimiento_to_api(item)
 
 
 def create_movimiento(
@@ -362,18 +433,20 @@ def create_movimiento(
     with get_connection() as conn:
         cur = conn.cursor()
         cur.execute(
-            """
+            f"""
+            SET NOCOUNT ON;
+            DECLARE @u INT = ?;{_DELTA_DECLARE}
             INSERT INTO dbo.movimientos
             (Id_usuario, Fecha, MedioCarga, TipoMovimiento, Moneda, Monto,
              Id_Credito_Debito, Id_Medio_Pago_Final, Descripcion,
              Id_Categoria, Id_SubCategoria, Origen, Origen_Id,
              ReglaComercioId, ComercioRaw, ComercioNorm)
-            OUTPUT INSERTED.Id, INSERTED.Fecha, INSERTED.[Timestamp], INSERTED.MedioCarga,
-                   INSERTED.TipoMovimiento, INSERTED.Moneda, INSERTED.Monto,
-                   INSERTED.Id_Credito_Debito, INSERTED.Id_Medio_Pago_Final,
-                   INSERTED.Descripcion,
-                   INSERTED.Id_Categoria, INSERTED.Id_SubCategoria, INSERTED.Origen, INSERTED.Origen_Id
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            OUTPUT {_delta_cols("INSERTED", 1)} INTO @delta
+            VALUES (@u, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+            {_apply_delta()}
+            SELECT{_SELECT_COLS}
+            FROM dbo.movimientos m
+            WHERE m.Id IN (SELECT Id FROM @delta);
             """,
             (
                 id_usuario,
@@ -400,13 +473,9 @@ def create_movimiento(
     if not row:
         raise RuntimeError("No se pudo crear el movimiento")
 
-    # Re-fetch con JOIN para nombres
+    # Re-fetch con nombres de categoría/subcategoría
     created = get_movimiento(id_usuario, row[0])
-    return created or _movimiento_to_api(_row_to_item(row, [
-        "Id", "Fecha", "Timestamp", "MedioCarga", "TipoMovimiento", "Moneda", "Monto",
-        "Id_Credito_Debito", "Id_Medio_Pago_Final", "Descripcion",
-        "Id_Categoria", "Id_SubCategoria", "Origen", "Origen_Id",
-    ]))
+    return created or _movimiento_to_api(_row_to_item(row, _MOVIMIENTO_COLS))
 
 
 def get_movimiento_by_origen(id_usuario: int, origen: str, origen_id: str) -> Optional[Dict[str, Any]]:
@@ -490,16 +559,27 @@ def update_movimiento(
         return existing
 
     updates.append("[Timestamp] = SYSUTCDATETIME()")
-    params.extend([id_usuario, mov_id])
 
     with get_connection() as conn:
         cur = conn.cursor()
         cur.execute(
-            f"UPDATE dbo.movimientos SET {', '.join(updates)} WHERE Id_usuario = ? AND Id = ?",
-            params,
+            f"""
+            SET NOCOUNT ON;
+            DECLARE @u INT = ?, @id INT = ?;{_DELTA_DECLARE}
+            INSERT INTO @delta
+            SELECT {_delta_cols("m", -1)} FROM dbo.movimientos m WITH (UPDLOCK)
+            WHERE m.Id_usuario = @u AND m.Id = @id;
+            UPDATE dbo.movimientos SET {', '.join(updates)}
+            OUTPUT {_delta_cols("INSERTED", 1)} INTO @delta
+            WHERE Id_usuario = @u AND Id = @id;
+            {_apply_delta()}
+            SELECT COUNT(*) FROM @delta WHERE Signo = 1;
+            """,
+            [id_usuario, mov_id] + params,
         )
+        updated = cur.fetchone()[0]
         conn.commit()
-        if cur.rowcount == 0:
+        if updated == 0:
             return None
 
     return get_movimiento(id_usuario, mov_id)
@@ -524,15 +604,23 @@ def recategorize_by_regla(
     with get_connection() as conn:
         cur = conn.cursor()
         cur.execute(
-            """
+            f"""
+            SET NOCOUNT ON;
+            DECLARE @u INT = ?, @since DATE = ?, @regla INT = ?;{_DELTA_DECLARE}
+            INSERT INTO @delta
+            SELECT {_delta_cols("m", -1)} FROM dbo.movimientos m WITH (UPDLOCK)
+            WHERE m.Id_usuario = @u AND m.Fecha >= @since AND m.ReglaComercioId = @regla;
             UPDATE m
             SET m.Id_Categoria = ?, m.Id_SubCategoria = ?, m.[Timestamp] = SYSUTCDATETIME()
+            OUTPUT {_delta_cols("INSERTED", 1)} INTO @delta
             FROM dbo.movimientos m
-            WHERE m.Id_usuario = ? AND m.Fecha >= ? AND m.ReglaComercioId = ?
+            WHERE m.Id_usuario = @u AND m.Fecha >= @since AND m.ReglaComercioId = @regla;
+            {_apply_delta()}
+            SELECT COUNT(*) FROM @delta WHERE Signo = 1;
             """,
-            (id_categoria, id_subcategoria, id_usuario, since_date, regla_id),
+            (id_usuario, since_date, regla_id, id_categoria, id_subcategoria),
         )
-        updated = cur.rowcount
+        updated = cur.fetchone()[0]
         conn.commit()
     return updated
 
@@ -542,8 +630,17 @@ def delete_movimiento(id_usuario: int, mov_id: int) -> bool:
     with get_connection() as conn:
         cur = conn.cursor()
         cur.execute(
-            "DELETE FROM dbo.movimientos WHERE Id_usuario = ? AND Id = ?",
+            f"""
+            SET NOCOUNT ON;
+            DECLARE @u INT = ?, @id INT = ?;{_DELTA_DECLARE}
+            DELETE FROM dbo.movimientos
+            OUTPUT {_delta_cols("DELETED", -1)} INTO @delta
+            WHERE Id_usuario = @u AND Id = @id;
+            {_apply_delta()}
+            SELECT COUNT(*) FROM @delta;
+            """,
             (id_usuario, mov_id),
         )
+        deleted = cur.fetchone()[0]
         conn.commit()
-        return cur.rowcount > 0
+        return deleted > 0
@@ -5,104 +5,251 @@ Reemplaza lectura/escritura desde Google Sheets.
 from __future__ import annotations
 
 from datetime import date
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
-from app.db.catalog import get_categoria_by_id_sql, get_subcategoria_by_id_sql
+from app.core.config import settings
+from app.db.catalog import get_catalog_covering
 from app.db.connection import get_connection
 from app.utils.parse_utils import parse_periodo_mes, periodo_mes_to_mes_anio
 
+# Máximo de ítems por upsert bulk (4 parámetros por fila; SQL Server acepta hasta 2100 por statement)
+BULK_MAX_ITEMS = 500
 
-def _check_categoria_user(id_usuario: int, id_categoria: int) -> bool:
-    """Valida que la categoría pertenezca al usuario."""
-    return get_categoria_by_id_sql(id_usuario, id_categoria) is not None
+# Columnas de _presupuesto_row sobre dbo.Presupuestos p (con nombres de categoría/subcategoría)
+# Columnas y FROM por separado para armar variantes (ej. SELECT TOP (?) del historial)
+_PRESUPUESTO_COLS = """
+p.Id, p.PeriodoMes, p.Id_Categoria, c.Nombre AS Nombre_Categoria,
+       p.Id_SubCategoria, sc.Nombre_SubCategoria, p.Monto, p.[Timestamp]
+"""
+_PRESUPUESTO_FROM = """
+FROM dbo.Presupuestos p
+LEFT JOIN dbo.Categoria c ON c.Id = p.Id_Categoria AND c.Id_usuario = p.Id_usuario
+LEFT JOIN dbo.SubCategoria sc ON sc.Id = p.Id_SubCategoria AND sc.Id_usuario = p.Id_usuario
+"""
+_SELECT_PRESUPUESTO = f"SELECT {_PRESUPUESTO_COLS}{_PRESUPUESTO_FROM}"
 
 
-def _check_subcategoria_user(id_usuario: int, id_subcategoria: int) -> Optional[int]:
+def _same_key(dst: str, src: str) -> str:
     """
-    Valida que la subcategoría pertenezca al usuario.
-    Retorna Id_Categoria real (desde SQL, no confiar en payload).
+    Condición SQL "misma clave de presupuesto" entre dst y src (el período va aparte):
+    por subcategoría si src la tiene, si no por categoría sin subcategoría (igual que el upsert).
     """
-    sub = get_subcategoria_by_id_sql(id_usuario, id_subcategoria)
-    if not sub:
-        return None
-    return int(sub["categoria_id"])
+    return (
+        f"(({src}.Id_SubCategoria IS NOT NULL AND {dst}.Id_SubCategoria = {src}.Id_SubCategoria)"
+        f" OR ({src}.Id_SubCategoria IS NULL AND {dst}.Id_SubCategoria IS NULL"
+        f" AND {dst}.Id_Categoria = {src}.Id_Categoria))"
+    )
+
+
+def _add_months(periodo: date, n: int) -> date:
+    """Primer día del mes n meses después (o antes, si n < 0) de periodo."""
+    months = periodo.year * 12 + periodo.month - 1 + n
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def presupuestos_window(hoy: Optional[date] = None) -> Tuple[date, date]:
+    """
+    (desde, hasta) por defecto para listar presupuestos: PRESUPUESTOS_MESES_ATRAS meses antes y
+    PRESUPUESTOS_MESES_ADELANTE después del mes actual, ambos inclusive.
+    """
+    mes = (hoy or date.today()).replace(day=1)
+    return (
+        _add_months(mes, -settings.PRESUPUESTOS_MESES_ATRAS),
+        _add_months(mes, settings.PRESUPUESTOS_MESES_ADELANTE),
+    )
 
 
 def list_presupuestos_sql(
     id_usuario: int,
     periodo_mes: Optional[date] = None,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
 ) -> List[Dict[str, Any]]:
     """
     Lista presupuestos del usuario.
-    Si periodo_mes es None, devuelve todos los presupuestos del usuario.
+    periodo_mes filtra un mes; si no, desde/hasta (inclusive) acotan el rango de meses.
+    Sin ninguno de los tres devuelve todos los presupuestos del usuario.
     """
+    if periodo_mes is not None:
+        desde = hasta = periodo_mes
+    where = ["p.Id_usuario = ?"]
+    params: List[Any] = [id_usuario]
+    if desde is not None:
+        where.append("p.PeriodoMes >= ?")
+        params.append(desde)
+    if hasta is not None:
+        where.append("p.PeriodoMes <= ?")
+        params.append(hasta)
     with get_connection() as conn:
         cur = conn.cursor()
-        if periodo_mes is not None:
-            cur.execute(
-                """
-                SELECT
-                  p.Id,
-                  p.PeriodoMes,
-                  p.Id_Categoria,
-                  c.Nombre AS Nombre_Categoria,
-                  p.Id_SubCategoria,
-                  sc.Nombre_SubCategoria,
-                  p.Monto,
-                  p.[Timestamp]
-                FROM dbo.Presupuestos p
-                LEFT JOIN dbo.Categoria c
-                  ON c.Id = p.Id_Categoria AND c.Id_usuario = p.Id_usuario
-                LEFT JOIN dbo.SubCategoria sc
-                  ON sc.Id = p.Id_SubCategoria AND sc.Id_usuario = p.Id_usuario
-                WHERE p.Id_usuario = ? AND p.PeriodoMes = ?
-                ORDER BY c.Nombre, sc.Nombre_SubCategoria
-                """,
-                (id_usuario, periodo_mes),
-            )
-        else:
-            cur.execute(
-                """
-                SELECT
-                  p.Id,
-                  p.PeriodoMes,
-                  p.Id_Categoria,
-                  c.Nombre AS Nombre_Categoria,
-                  p.Id_SubCategoria,
-                  sc.Nombre_SubCategoria,
-                  p.Monto,
-                  p.[Timestamp]
-                FROM dbo.Presupuestos p
-                LEFT JOIN dbo.Categoria c
-                  ON c.Id = p.Id_Categoria AND c.Id_usuario = p.Id_usuario
-                LEFT JOIN dbo.SubCategoria sc
-                  ON sc.Id = p.Id_SubCategoria AND sc.Id_usuario = p.Id_usuario
-                WHERE p.Id_usuario = ?
-                ORDER BY p.PeriodoMes DESC, c.Nombre, sc.Nombre_SubCategoria
-                """,
-                (id_usuario,),
+        cur.execute(
+            f"""
+            {_SELECT_PRESUPUESTO}
+            WHERE {" AND ".join(where)}
+            ORDER BY p.PeriodoMes DESC, c.Nombre, sc.Nombre_SubCategoria
+            """,
+            params,
+        )
+        rows = cur.fetchall()
+    return [_presupuesto_row(r) for r in rows]
+
+
+def list_presupuestos_historial_sql(
+    id_usuario: int,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Historial completo paginado por keyset sobre (PeriodoMes DESC, Id DESC): cada página es un
+    seek sobre IX_Presupuestos_Id_usuario_PeriodoMes, sin OFFSET. Retorna (filas, next_cursor).
+    El cursor es "<PeriodoMes ISO>.<Id>" de la última fila de la página anterior.
+    """
+    where = "p.Id_usuario = ?"
+    params: List[Any] = [int(limit) + 1, id_usuario]
+    if cursor:
+        try:
+            periodo_s, _, id_s = cursor.partition(".")
+            periodo, last_id = date.fromisoformat(periodo_s), int(id_s)
+        except ValueError:
+            raise ValueError(f"cursor inválido: {cursor}")
+        where += " AND (p.PeriodoMes < ? OR (p.PeriodoMes = ? AND p.Id < ?))"
+        params.extend([periodo, periodo, last_id])
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            f"""
+            SELECT TOP (?) {_PRESUPUESTO_COLS}{_PRESUPUESTO_FROM}
+            WHERE {where}
+            ORDER BY p.PeriodoMes DESC, p.Id DESC
+            """,
+            params,
+        )
+        rows = cur.fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = f"{last[1].isoformat()}.{last[0]}"
+    return [_presupuesto_row(r) for r in rows[:limit]], next_cursor
+
+
+def _presupuesto_row(r: tuple) -> Dict[str, Any]:
+    """Fila (Id, PeriodoMes, Id_Categoria, Nombre, Id_SubCategoria, Nombre_SubCategoria, Monto, Timestamp) -> dict."""
+    row_periodo = r[1]  # PeriodoMes de la fila
+    mes_anio = periodo_mes_to_mes_anio(row_periodo) if row_periodo else ""
+    return {
+        "id": str(r[0]),
+        "mesAño": mes_anio,
+        "mes_anio": mes_anio,
+        "idCategoria": str(r[2]) if r[2] is not None else "",
+        "categoria_id": str(r[2]) if r[2] is not None else "",
+        "Nombre_Categoria": str(r[3] or "").strip(),
+        "categoria_nombre": str(r[3] or "").strip(),
+        "idSubcategoria": str(r[4]) if r[4] is not None else "",
+        "subcategoria_id": str(r[4]) if r[4] is not None else "",
+        "Nombre_SubCategoria": str(r[5] or "").strip(),
+        "subcategoria_nombre": str(r[5] or "").strip(),
+        "Monto": float(r[6]) if r[6] is not None else 0.0,
+        "monto": str(r[6]) if r[6] is not None else "0",
+        "Timestamp": str(r[7]) if r[7] else "",
+    }
+
+
+# Presupuestos del período (@u, @periodo) como CTE p, seguida de uno de los _GASTO_*
+_CONSUMO_PRESUPUESTOS = f"""
+            WITH p AS ({_SELECT_PRESUPUESTO}
+              WHERE p.Id_usuario = @u AND p.PeriodoMes = @periodo
+            )"""
+# Gastado por presupuesto agregando movimientos del período: GROUPING SETS suma por
+# (categoría, subcategoría) y por categoría; un presupuesto con subcategoría toma su fila,
+# uno solo de categoría toma el total de la categoría.
+_GASTO_MOVIMIENTOS = """,
+            gasto AS (
+              SELECT
+                m.Id_Categoria,
+                m.Id_SubCategoria,
+                GROUPING(m.Id_SubCategoria) AS EsTotalCategoria,
+                SUM(m.Monto) AS Gastado
+              FROM dbo.movimientos m
+              WHERE m.Id_usuario = @u AND m.Fecha >= @periodo AND m.Fecha < DATEADD(MONTH, 1, @periodo)
+                AND m.TipoMovimiento = 'Gasto' AND m.Moneda = @moneda
+              GROUP BY GROUPING SETS ((m.Id_Categoria, m.Id_SubCategoria), (m.Id_Categoria))
             )
+            SELECT p.*, COALESCE(g.Gastado, 0) AS Gastado
+            FROM p
+            LEFT JOIN gasto g
+              ON g.Id_Categoria = p.Id_Categoria
+             AND ((p.Id_SubCategoria IS NULL AND g.EsTotalCategoria = 1)
+                  OR (g.EsTotalCategoria = 0 AND g.Id_SubCategoria = p.Id_SubCategoria))"""
+# Gastado desde el rollup dbo.GastoMensual (GASTO_MENSUAL_ROLLUP): pocas filas por usuario y mes
+_GASTO_ROLLUP = """
+            SELECT p.*, COALESCE(g.Gastado, 0) AS Gastado
+            FROM p
+            OUTER APPLY (
+              SELECT SUM(gm.Monto) AS Gastado
+              FROM dbo.GastoMensual gm
+              WHERE gm.Id_usuario = @u AND gm.PeriodoMes = @periodo AND gm.Moneda = @moneda
+                AND gm.Id_Categoria = p.Id_Categoria
+                AND (p.Id_SubCategoria IS NULL OR gm.Id_SubCategoria = p.Id_SubCategoria)
+            ) g"""
+
+
+def consumo_presupuestos_sql(
+    id_usuario: int,
+    periodo_mes: date,
+    moneda: str = "ARS",
+) -> List[Dict[str, Any]]:
+    """
+    Presupuestos del período con lo gastado, en un solo statement. Lo gastado sale del rollup
+    dbo.GastoMensual (GASTO_MENSUAL_ROLLUP) o, si está desactivado, de agregar los movimientos.
+    Agrega gastado, restante y porcentaje (usado, sobre Monto) a cada fila.
+    """
+    gasto = _GASTO_ROLLUP if settings.GASTO_MENSUAL_ROLLUP else _GASTO_MOVIMIENTOS
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            f"""
+            SET NOCOUNT ON;
+            DECLARE @u INT = ?, @periodo DATE = ?, @moneda NVARCHAR(10) = ?;
+            {_CONSUMO_PRESUPUESTOS}{gasto}
+            ORDER BY p.Nombre_Categoria, p.Nombre_SubCategoria;
+            """,
+            (id_usuario, periodo_mes, (moneda or "ARS").strip().upper()),
+        )
         rows = cur.fetchall()
     out = []
     for r in rows:
-        row_periodo = r[1]  # PeriodoMes de la fila
-        mes_anio = periodo_mes_to_mes_anio(row_periodo) if row_periodo else ""
-        out.append({
-            "id": str(r[0]),
-            "mesAño": mes_anio,
-            "mes_anio": mes_anio,
-            "idCategoria": str(r[2]) if r[2] is not None else "",
-            "categoria_id": str(r[2]) if r[2] is not None else "",
-            "Nombre_Categoria": str(r[3] or "").strip(),
-            "categoria_nombre": str(r[3] or "").strip(),
-            "idSubcategoria": str(r[4]) if r[4] is not None else "",
-            "subcategoria_id": str(r[4]) if r[4] is not None else "",
-            "Nombre_SubCategoria": str(r[5] or "").strip(),
-            "subcategoria_nombre": str(r[5] or "").strip(),
-            "Monto": float(r[6]) if r[6] is not None else 0.0,
-            "monto": str(r[6]) if r[6] is not None else "0",
-            "Timestamp": str(r[7]) if r[7] else "",
-        })
+        row = _presupuesto_row(r)
+        monto = row["Monto"]
+        gastado = float(r[8] or 0)
+        row["gastado"] = round(gastado, 2)
+        row["restante"] = round(monto - gastado, 2)
+        row["porcentaje"] = round(gastado * 100 / monto, 1) if monto > 0 else 0.0
+        out.append(row)
+    return out
+
+
+def alertas_presupuestos_sql(
+    id_usuario: int,
+    periodo_mes: date,
+    moneda: str = "ARS",
+) -> List[Dict[str, Any]]:
+    """
+    Presupuestos del período que cruzaron algún umbral de PRESUPUESTO_ALERTA_UMBRALES (% usado).
+    Cada fila de consumo_presupuestos_sql agrega "umbral": el mayor umbral alcanzado.
+    Compara gastado * 100 >= umbral * Monto en centavos (enteros), no el porcentaje redondeado:
+    79.96% no debe contar como 80%.
+    """
+    umbrales = sorted(settings.PRESUPUESTO_ALERTA_UMBRALES)
+    out = []
+    for row in consumo_presupuestos_sql(id_usuario, periodo_mes, moneda):
+        gastado_c = round(row["gastado"] * 100)
+        monto_c = round(row["Monto"] * 100)
+        if monto_c <= 0:
+            continue
+        alcanzados = [u for u in umbrales if gastado_c * 100 >= u * monto_c]
+        if alcanzados:
+            row["umbral"] = alcanzados[-1]
+            out.append(row)
     return out
 
 
@@ -118,61 +265,148 @@ def upsert_presupuesto_sql(
     Si id_subcategoria viene, resuelve id_categoria desde SubCategoria.
     Valida pertenencia al usuario.
     """
-    if monto <= 0:
-        raise ValueError("Monto debe ser mayor a 0")
+    rows = upsert_presupuestos_bulk_sql(id_usuario, [(periodo_mes, id_categoria, id_subcategoria, monto)])
+    if not rows:
+        raise RuntimeError("UPSERT OK pero no se pudo recuperar el registro")
+    return rows[0]
+
+
+def _resolve_bulk_items(
+    id_usuario: int,
+    items: Sequence[Tuple[date, Optional[int], Optional[int], float]],
+) -> List[Tuple[date, int, Optional[int], float]]:
+    """
+    Valida los ítems contra el catálogo cacheado (sin ir a SQL) y resuelve Id_Categoria desde
+    la subcategoría. Si una clave se repite, gana el último ítem.
+    """
+    snapshot = get_catalog_covering(
+        id_usuario,
+        [cat for _, cat, sub, _ in items if sub is None and cat is not None],
+        [sub for _, _, sub, _ in items if sub is not None],
+    )
+    by_key: Dict[Tuple[date, Optional[int], Optional[int]], Tuple[date, int, Optional[int], float]] = {}
+    for periodo_mes, cat_id, sub_id, monto in items:
+        if monto <= 0:
+            raise ValueError("Monto debe ser mayor a 0")
+        if sub_id is not None:
+            # Resolver Id_Categoria real desde SubCategoria (no confiar en payload)
+            sub = snapshot.sub_by_id.get(sub_id)
+            if sub is None:
+                raise ValueError("Subcategoría no encontrada o no pertenece al usuario")
+            cat_id = int(sub["categoria_id"])
+            key = (periodo_mes, None, sub_id)
+        else:
+            if cat_id is None:
+                raise ValueError("Debe indicar idCategoria o idSubcategoria")
+            if cat_id not in snapshot.cat_by_id:
+                raise ValueError("Categoría no encontrada o no pertenece al usuario")
+            key = (periodo_mes, cat_id, None)
+        by_key[key] = (periodo_mes, cat_id, sub_id, monto)
+    return list(by_key.values())
 
-    cat_id = id_categoria
-    sub_id = id_subcategoria
 
-    if sub_id is not None:
-        # Resolver Id_Categoria real desde SubCategoria (no confiar en payload)
-        cat_id = _check_subcategoria_user(id_usuario, sub_id)
-        if cat_id is None:
-            raise ValueError("Subcategoría no encontrada o no pertenece al usuario")
-    else:
-        if cat_id is None:
-            raise ValueError("Debe indicar idCategoria o idSubcategoria")
-        if not _check_categoria_user(id_usuario, cat_id):
-            raise ValueError("Categoría no encontrada o no pertenece al usuario")
+def upsert_presupuestos_bulk_sql(
+    id_usuario: int,
+    items: Sequence[Tuple[date, Optional[int], Optional[int], float]],
+) -> List[Dict[str, Any]]:
+    """
+    UPSERT de varios presupuestos (periodo_mes, id_categoria, id_subcategoria, monto) en un solo
+    batch y transacción: carga los ítems en una variable tabla, UPDATE de los existentes, INSERT
+    del resto y SELECT de las filas resultantes. Misma validación y clave que upsert_presupuesto_sql.
+    """
+    if len(items) > BULK_MAX_ITEMS:
+        raise ValueError(f"Máximo {BULK_MAX_ITEMS} presupuestos por llamada")
+    resolved = _resolve_bulk_items(id_usuario, items)
+    if not resolved:
+        return []
 
+    values = ", ".join(["(?, ?, ?, ?)"] * len(resolved))
+    params: List[Any] = [id_usuario]
+    for periodo_mes, cat_id, sub_id, monto in resolved:
+        params.extend([periodo_mes, cat_id, sub_id, monto])
     with get_connection() as conn:
         cur = conn.cursor()
-        # UPDATE si existe (evita problemas con NULL en MERGE)
-        if sub_id is not None:
-            cur.execute(
-                """
-                UPDATE dbo.Presupuestos
-                SET Monto = ?, Id_Categoria = ?, [Timestamp] = SYSUTCDATETIME()
-                WHERE Id_usuario = ? AND PeriodoMes = ? AND Id_SubCategoria = ?
-                """,
-                (monto, cat_id, id_usuario, periodo_mes, sub_id),
-            )
-        else:
-            cur.execute(
-                """
-                UPDATE dbo.Presupuestos
-                SET Monto = ?, [Timestamp] = SYSUTCDATETIME()
-                WHERE Id_usuario = ? AND PeriodoMes = ? AND Id_Categoria = ? AND Id_SubCategoria IS NULL
-                """,
-                (monto, id_usuario, periodo_mes, cat_id),
-            )
-        if cur.rowcount == 0:
-            cur.execute(
-                """
-                INSERT INTO dbo.Presupuestos (Id_usuario, PeriodoMes, Id_Categoria, Id_SubCategoria, Monto, [Timestamp])
-                VALUES (?, ?, ?, ?, ?, SYSUTCDATETIME())
-                """,
-                (id_usuario, periodo_mes, cat_id, sub_id, monto),
-            )
+        cur.execute(
+            f"""
+            SET NOCOUNT ON;
+            DECLARE @u INT = ?;
+            DECLARE @in TABLE (
+              PeriodoMes DATE NOT NULL, Id_Categoria INT NOT NULL, Id_SubCategoria INT NULL,
+              Monto DECIMAL(18,2) NOT NULL
+            );
+            INSERT INTO @in (PeriodoMes, Id_Categoria, Id_SubCategoria, Monto) VALUES {values};
+
+            UPDATE p
+            SET Monto = i.Monto, Id_Categoria = i.Id_Categoria, [Timestamp] = SYSUTCDATETIME()
+            FROM dbo.Presupuestos p WITH (UPDLOCK, HOLDLOCK)
+            JOIN @in i ON p.Id_usuario = @u AND p.PeriodoMes = i.PeriodoMes AND {_same_key("p", "i")};
+
+            INSERT INTO dbo.Presupuestos (Id_usuario, PeriodoMes, Id_Categoria, Id_SubCategoria, Monto, [Timestamp])
+            SELECT @u, i.PeriodoMes, i.Id_Categoria, i.Id_SubCategoria, i.Monto, SYSUTCDATETIME()
+            FROM @in i
+            WHERE NOT EXISTS (
+              SELECT 1 FROM dbo.Presupuestos p WITH (UPDLOCK, HOLDLOCK)
+              WHERE p.Id_usuario = @u AND p.PeriodoMes = i.PeriodoMes AND {_same_key("p", "i")}
+            );
+
+            {_SELECT_PRESUPUESTO}
+            JOIN @in i ON p.PeriodoMes = i.PeriodoMes AND {_same_key("p", "i")}
+            WHERE p.Id_usuario = @u
+            ORDER BY p.PeriodoMes DESC, c.Nombre, sc.Nombre_SubCategoria;
+            """,
+            params,
+        )
+        rows = cur.fetchall()
         conn.commit()
+    return [_presupuesto_row(r) for r in rows]
 
-    # Leer el registro actualizado/insertado
-    rows = list_presupuestos_sql(id_usuario, periodo_mes)
-    for r in rows:
-        if (str(r["categoria_id"]) == str(cat_id) and
-            (str(r["subcategoria_id"]) == str(sub_id) if sub_id else r["subcategoria_id"] == "")):
-            return r
-    raise RuntimeError("UPSERT OK pero no se pudo recuperar el registro")
+
+def copy_presupuestos_sql(
+    id_usuario: int,
+    desde: date,
+    hasta: date,
+    overwrite: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Copia los presupuestos del período desde al período hasta en un solo batch y transacción.
+    Las claves que ya existen en hasta quedan como están, salvo overwrite (se actualiza el Monto).
+    Retorna los presupuestos resultantes del período hasta.
+    """
+    if desde == hasta:
+        raise ValueError("El período de origen y el de destino deben ser distintos")
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            f"""
+            SET NOCOUNT ON;
+            DECLARE @u INT = ?, @desde DATE = ?, @hasta DATE = ?, @overwrite BIT = ?;
+
+            IF @overwrite = 1
+              UPDATE dst
+              SET Monto = src.Monto, [Timestamp] = SYSUTCDATETIME()
+              FROM dbo.Presupuestos dst WITH (UPDLOCK, HOLDLOCK)
+              JOIN dbo.Presupuestos src
+                ON src.Id_usuario = @u AND src.PeriodoMes = @desde AND {_same_key("dst", "src")}
+              WHERE dst.Id_usuario = @u AND dst.PeriodoMes = @hasta AND dst.Monto <> src.Monto;
+
+            INSERT INTO dbo.Presupuestos (Id_usuario, PeriodoMes, Id_Categoria, Id_SubCategoria, Monto, [Timestamp])
+            SELECT @u, @hasta, src.Id_Categoria, src.Id_SubCategoria, src.Monto, SYSUTCDATETIME()
+            FROM dbo.Presupuestos src
+            WHERE src.Id_usuario = @u AND src.PeriodoMes = @desde
+              AND NOT EXISTS (
+                SELECT 1 FROM dbo.Presupuestos dst WITH (UPDLOCK, HOLDLOCK)
+                WHERE dst.Id_usuario = @u AND dst.PeriodoMes = @hasta AND {_same_key("dst", "src")}
+              );
+
+            {_SELECT_PRESUPUESTO}
+            WHERE p.Id_usuario = @u AND p.PeriodoMes = @hasta
+            ORDER BY c.Nombre, sc.Nombre_SubCategoria;
+            """,
+            (id_usuario, desde, hasta, 1 if overwrite else 0),
+        )
+        rows = cur.fetchall()
+        conn.commit()
+    return [_presupuesto_row(r) for r in rows]
 
 
 def delete_presupuesto_sql(id_usuario: int, presupuesto_id: int | str) -> bool:
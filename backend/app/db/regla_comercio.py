@@ -6,9 +6,12 @@ Multi-tenant por Id_usuario.
 from __future__ import annotations
 
 import logging
+import threading
+import time
 from datetime import datetime
 from typing import Any, Dict, List, Optional, Tuple
 
+from app.core.config import settings
 from app.db.connection import get_connection
 from app.db.catalog import (
     get_categoria_by_id_sql,
@@ -25,27 +28,31 @@ SUBCATEGORIA_NO_CATEGORIZADOS = "Gastos no categorizados"
 PRIORIDAD_AUTO = 200
 PRIORIDAD_USER_DEFAULT = 100
 
+# Cache de reglas activas para resolve_regla: id_usuario -> (reglas, timestamp, versión).
+# La versión es (COUNT(*), MAX(ActualizadoEn)) de las reglas del usuario: con varios workers
+# cada uno tiene su cache, así que antes de servir una lista se compara contra SQL.
+_ReglasVersion = Tuple[int, Optional[datetime]]
+_reglas_cache: Dict[int, Tuple[List[Dict[str, Any]], float, _ReglasVersion]] = {}
+# Generación por usuario: invalidate la incrementa; una carga que empezó antes no se guarda
+_reglas_gen: Dict[int, int] = {}
+_reglas_cache_lock = threading.Lock()
+
 
 def _get_or_create_otros_defaults(id_usuario: int) -> Tuple[int, int]:
     """
     Obtiene o crea Categoría "Otros" y SubCategoría "Gastos no categorizados".
     Retorna (id_categoria, id_subcategoria).
     """
-    from app.db.catalog import list_categorias_sql, list_subcategorias_sql
+    from app.db.catalog import find_categoria_by_nombre_sql, find_subcategoria_by_nombre_sql
 
-    cats = list_categorias_sql(id_usuario)
-    otros = next((c for c in cats if (c.get("nombre") or "").strip().lower() == "otros"), None)
+    otros = find_categoria_by_nombre_sql(id_usuario, CATEGORIA_OTROS)
     if otros:
         id_cat = int(otros["id"])
     else:
         created = create_categoria_sql(id_usuario, CATEGORIA_OTROS)
         id_cat = int(created["id"])
 
-    subs = list_subcategorias_sql(id_usuario, categoria_id=id_cat)
-    no_cat = next(
-        (s for s in subs if (s.get("nombre") or "").strip().lower() == SUBCATEGORIA_NO_CATEGORIZADOS.lower()),
-        None,
-    )
+    no_cat = find_subcategoria_by_nombre_sql(id_usuario, id_cat, SUBCATEGORIA_NO_CATEGORIZADOS)
     if no_cat:
         id_sub = int(no_cat["id"])
     else:
@@ -77,29 +84,34 @@ def list_reglas_comercio(id_usuario: int) -> List[Dict[str, Any]]:
         )
         rows = cur.fetchall()
 
-    out = []
-    for r in rows:
-        out.append({
-            "id": str(r[0]),
-            "patron": str(r[1] or "").strip(),
-            "ejemploRazonSocial": str(r[2] or "").strip() if r[2] else None,
-            "idCategoria": r[3],
-            "nombreCategoria": str(r[4] or "").strip(),
-            "idSubcategoria": r[5],
-            "nombreSubcategoria": str(r[6] or "").strip(),
-            "prioridad": r[7] or 100,
-            "activa": bool(r[8]) if r[8] is not None else True,
-            "confianza": str(r[9] or "AUTO").strip(),
-            "actualizadoEn": r[10].isoformat() if r[10] else None,
-            # Compatibilidad ReglaRaw
-            "comercio": str(r[1] or "").strip(),
-            "categoria_id": str(r[3]),
-            "categoria_nombre": str(r[4] or "").strip(),
-            "subcategoria_id": str(r[5]),
-            "subcategoria_nombre": str(r[6] or "").strip(),
-            "timestamp": r[10].isoformat() if r[10] else None,
-        })
-    return out
+    return [_regla_row(r) for r in rows]
+
+
+def _regla_row(r: tuple) -> Dict[str, Any]:
+    """
+    Fila (Id, Patron, EjemploRazonSocial, Id_Categoria, Nombre, Id_SubCategoria, Nombre_SubCategoria,
+    Prioridad, Activa, Confianza, ActualizadoEn) -> dict de list_reglas_comercio.
+    """
+    return {
+        "id": str(r[0]),
+        "patron": str(r[1] or "").strip(),
+        "ejemploRazonSocial": str(r[2] or "").strip() if r[2] else None,
+        "idCategoria": r[3],
+        "nombreCategoria": str(r[4] or "").strip(),
+        "idSubcategoria": r[5],
+        "nombreSubcategoria": str(r[6] or "").strip(),
+        "prioridad": r[7] or 100,
+        "activa": bool(r[8]) if r[8] is not None else True,
+        "confianza": str(r[9] or "AUTO").strip(),
+        "actualizadoEn": r[10].isoformat() if r[10] else None,
+        # Compatibilidad ReglaRaw
+        "comercio": str(r[1] or "").strip(),
+        "categoria_id": str(r[3]),
+        "categoria_nombre": str(r[4] or "").strip(),
+        "subcategoria_id": str(r[5]),
+        "subcategoria_nombre": str(r[6] or "").strip(),
+        "timestamp": r[10].isoformat() if r[10] else None,
+    }
 
 
 def create_regla_user(
@@ -148,6 +160,7 @@ def create_regla_user(
         )
         row = cur.fetchone()
         conn.commit()
+    invalidate_reglas_cache(id_usuario)
 
     if not row:
         raise RuntimeError("No se pudo crear la regla")
@@ -232,6 +245,7 @@ def update_regla(
             params,
         )
         conn.commit()
+        invalidate_reglas_cache(id_usuario)
         if cur.rowcount == 0:
             return None
 
@@ -281,8 +295,65 @@ def get_regla_by_id(id_usuario: int, regla_id: int | str) -> Optional[Dict[str,
     }
 
 
+def invalidate_reglas_cache(id_usuario: int) -> None:
+    """Descarta las reglas activas cacheadas del usuario (llamar tras escribir ReglaComercio)."""
+    with _reglas_cache_lock:
+        _reglas_cache.pop(id_usuario, None)
+        _reglas_gen[id_usuario] = _reglas_gen.get(id_usuario, 0) + 1
+
+
+def _reglas_cache_get(id_usuario: int) -> Optional[Tuple[List[Dict[str, Any]], _ReglasVersion]]:
+    ttl = settings.REGLAS_CACHE_TTL_SEC
+    if ttl <= 0:
+        return None
+    with _reglas_cache_lock:
+        entry = _reglas_cache.get(id_usuario)
+        if entry and time.time() - entry[1] <= ttl:
+            return entry[0], entry[2]
+    return None
+
+
+def reglas_cache_warm(id_usuario: int) -> bool:
+    """True si las reglas activas del usuario ya están en cache (para el warm-up)."""
+    return _reglas_cache_get(id_usuario) is not None
+
+
+def _query_reglas_version(id_usuario: int) -> _ReglasVersion:
+    """(COUNT(*), MAX(ActualizadoEn)) de las reglas del usuario: cambia con cada alta, edición o baja."""
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT COUNT(*), MAX(ActualizadoEn) FROM dbo.ReglaComercio WHERE Id_usuario = ?",
+            (id_usuario,),
+        )
+        row = cur.fetchone()
+    return (int(row[0] or 0), row[1]) if row else (0, None)
+
+
 def _fetch_reglas_activas_para_resolve(id_usuario: int) -> List[Dict[str, Any]]:
-    """Trae reglas activas con PatronNorm para matching en Python."""
+    """
+    Reglas activas con PatronNorm para matching en Python.
+    Cacheadas por usuario REGLAS_CACHE_TTL_SEC; las escrituras de reglas invalidan en este worker
+    y la versión en SQL detecta las de otros workers (una consulta de agregados por llamada).
+    La lista es compartida: no mutarla.
+    """
+    if settings.REGLAS_CACHE_TTL_SEC <= 0:
+        return _query_reglas_activas(id_usuario)
+    with _reglas_cache_lock:
+        gen = _reglas_gen.get(id_usuario, 0)
+    version = _query_reglas_version(id_usuario)
+    cached = _reglas_cache_get(id_usuario)
+    if cached is not None and cached[1] == version:
+        return cached[0]
+    # Versión leída antes que las filas: si alguien escribe en el medio, la próxima comparación falla
+    reglas = _query_reglas_activas(id_usuario)
+    with _reglas_cache_lock:
+        if _reglas_gen.get(id_usuario, 0) == gen:
+            _reglas_cache[id_usuario] = (reglas, time.time(), version)
+    return reglas
+
+
+def _query_reglas_activas(id_usuario: int) -> List[Dict[str, Any]]:
     with get_connection() as conn:
         cur = conn.cursor()
         cur.execute(
@@ -441,6 +512,7 @@ def _create_regla_auto_idempotente(
             ),
         )
         conn.commit()
+    invalidate_reglas_cache(id_usuario)
     logger.info("ReglaComercio: regla AUTO creada para patron_norm=%s usuario=%s", patron_norm, id_usuario)
     return get_regla_id_by_patron_norm(id_usuario, patron_norm)
 
@@ -455,4 +527,5 @@ def delete_regla(id_usuario: int, regla_id: int | str) -> bool:
             (id_usuario, regla_id),
         )
         conn.commit()
+        invalidate_reglas_cache(id_usuario)
         return cur.rowcount > 0
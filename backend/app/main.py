@@ -1,6 +1,5 @@
 import logging
 import threading
-import time
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -51,39 +50,15 @@ def _prefetch_tables() -> None:
     if not sid:
         return
     from app.sheets.registry import set_current_spreadsheet_id
-    from app.sheets.service import read_table
+    from app.sheets.service import read_tables
 
     set_current_spreadsheet_id(sid)
     tables = ["reglas", "categorias", "subcategorias"]  # presupuestos ahora en SQL
-    for t in tables:
-        try:
-            read_table(t)
-            logger.info(f"prefetch ok: {t}")
-        except Exception as e:
-            logger.warning(f"prefetch {t}: {e}")
-
-
-def _refresh_loop() -> None:
-    """Refresco periódico de cache cada SHEETS_REFRESH_INTERVAL_SEC."""
-    interval = settings.SHEETS_REFRESH_INTERVAL_SEC
-    if interval <= 0:
-        return
-    sid = settings.SPREADSHEET_ID
-    if not sid:
-        return
-    from app.sheets.registry import set_current_spreadsheet_id
-    from app.sheets.service import read_table
-
-    set_current_spreadsheet_id(sid)
-    tables = ["reglas", "categorias", "subcategorias"]  # presupuestos ahora en SQL
-    while True:
-        time.sleep(interval)
-        for t in tables:
-            try:
-                read_table(t)
-                logger.info(f"refresh ok: {t}")
-            except Exception as e:
-                logger.warning(f"refresh {t}: {e}")
+    try:
+        read_tables(tables)  # un solo batchGet
+        logger.info(f"prefetch ok: {','.join(tables)}")
+    except Exception as e:
+        logger.warning(f"prefetch {','.join(tables)}: {e}")
 
 
 @app.on_event("startup")
@@ -91,7 +66,13 @@ def startup_event() -> None:
     # Prefetch en background (solo si SPREADSHEET_ID está set)
     t = threading.Thread(target=_prefetch_tables, daemon=True)
     t.start()
-    # Refresco periódico en background
-    if settings.SHEETS_REFRESH_INTERVAL_SEC > 0 and settings.SPREADSHEET_ID:
-        tr = threading.Thread(target=_refresh_loop, daemon=True)
-        tr.start()
+    # Refresco periódico en background de los spreadsheets activos
+    from app.sheets import refresh
+
+    refresh.mark_active(settings.SPREADSHEET_ID, pinned=True)
+    refresh.start()
+    if not settings.GASTO_MENSUAL_ROLLUP:
+        logger.warning(
+            "GASTO_MENSUAL_ROLLUP=false: /presupuestos/consumo y /alertas agregan movimientos en cada "
+            "request; para leer el rollup aplicar la migración 008, correr su backfill y activar el flag"
+        )
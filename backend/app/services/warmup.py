@@ -0,0 +1,107 @@
+"""
+Warm-up de caches al hacer login, para que la primera pantalla no pague las lecturas en frío:
+- tablas calientes de Sheets del spreadsheet del usuario (ID_Sheets), en un solo batchGet;
+- catálogo SQL (categorías/subcategorías) y reglas activas del usuario para resolve_regla (Id_usuario).
+Corre en un pool acotado (WARMUP_WORKERS), con prioridad de cuota background,
+y saltea lo que ya está en cache o ya se está precargando.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Set, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ThreadPoolExecutor] = None
+# (spreadsheet_id, id_usuario) con warm-up en curso: logins repetidos no lo duplican
+_in_flight: Set[Tuple[str, Optional[int]]] = set()
+_lock = threading.Lock()
+
+
+def _warm_sheets(spreadsheet_id: str) -> None:
+    from app.cache.sheets_cache import is_fresh
+    from app.sheets.quota import background
+    from app.sheets.refresh import hot_tables, mark_active
+    from app.sheets.registry import set_current_spreadsheet_id
+    from app.sheets.service import read_tables
+
+    mark_active(spreadsheet_id)
+    cold = [t for t in hot_tables() if not is_fresh(spreadsheet_id, t)]
+    if not cold:
+        logger.info(f"warmup sheets skip=warm spreadsheet_id={spreadsheet_id[:8]}...")
+        return
+    set_current_spreadsheet_id(spreadsheet_id)
+    t0 = time.perf_counter()
+    with background():
+        read_tables(cold)
+    logger.info(
+        f"warmup sheets tables={','.join(cold)} t={time.perf_counter() - t0:.3f}s "
+        f"spreadsheet_id={spreadsheet_id[:8]}..."
+    )
+
+
+def _warm_catalog(id_usuario: int) -> None:
+    from app.db.catalog import catalog_cache_warm, get_catalog
+
+    if catalog_cache_warm(id_usuario):
+        logger.info(f"warmup catalog skip=warm id_usuario={id_usuario}")
+        return
+    t0 = time.perf_counter()
+    get_catalog(id_usuario)
+    logger.info(f"warmup catalog t={time.perf_counter() - t0:.3f}s id_usuario={id_usuario}")
+
+
+def _warm_reglas(id_usuario: int) -> None:
+    from app.db.regla_comercio import _fetch_reglas_activas_para_resolve, reglas_cache_warm
+
+    if reglas_cache_warm(id_usuario):
+        logger.info(f"warmup reglas skip=warm id_usuario={id_usuario}")
+        return
+    t0 = time.perf_counter()
+    reglas = _fetch_reglas_activas_para_resolve(id_usuario)
+    logger.info(f"warmup reglas rows={len(reglas)} t={time.perf_counter() - t0:.3f}s id_usuario={id_usuario}")
+
+
+def _run(spreadsheet_id: str, id_usuario: Optional[int]) -> None:
+    try:
+        # Cada parte por separado: si SQL falla, Sheets igual queda caliente (y viceversa)
+        if spreadsheet_id:
+            try:
+                _warm_sheets(spreadsheet_id)
+            except Exception as e:
+                logger.warning(f"warmup sheets spreadsheet_id={spreadsheet_id[:8]}...: {e}")
+        if id_usuario is not None:
+            try:
+                _warm_catalog(id_usuario)
+                _warm_reglas(id_usuario)
+            except Exception as e:
+                logger.warning(f"warmup sql id_usuario={id_usuario}: {e}")
+    finally:
+        with _lock:
+            _in_flight.discard((spreadsheet_id, id_usuario))
+
+
+def schedule(spreadsheet_id: str, id_usuario: Optional[int]) -> None:
+    """
+    Encola el warm-up del usuario en el pool (no bloquea). Pensado para BackgroundTasks
+    del login, así corre después de enviar la respuesta.
+    """
+    global _executor
+    if not settings.WARMUP_ON_LOGIN:
+        return
+    key = (spreadsheet_id, id_usuario)
+    with _lock:
+        if key in _in_flight:
+            return
+        _in_flight.add(key)
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, settings.WARMUP_WORKERS),
+                thread_name_prefix="warmup",
+            )
+    _executor.submit(_run, spreadsheet_id, id_usuario)
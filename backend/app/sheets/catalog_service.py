@@ -1,19 +1,23 @@
 from __future__ import annotations
 
 import re
-import time
 from typing import Any, Dict, List, Optional
 
 from app.cache.sheets_cache import invalidate
 from app.sheets.client import get_sheets_service
+from app.sheets.quota import execute as sheets_execute
 from app.sheets.registry import SHEETS, get_current_spreadsheet_id
 from app.sheets.service import (
     _col_to_a1,
-    _find_row_index_by_column_value,
+    _append_row,
+    _get_headers,
     _get_headers_and_values_raw,
+    _locate_row,
     _now_timestamp_iso_local,
     _values_to_rows,
-    patch_movimiento_by_id,
+    delete_row_by_id,
+    find_row,
+    patch_rows_bulk,
     read_table,
 )
 
@@ -55,8 +59,7 @@ def create_categoria(nombre: str, icon: str = DEFAULT_ICON, color: str = DEFAULT
     Agregar columnas Icon, Color, Timestamp si no existen.
     """
     cfg = SHEETS["categorias"]
-    svc = get_sheets_service()
-    headers, _ = _get_headers_and_values_raw("categorias")
+    headers = _get_headers("categorias")
     if not headers:
         raise RuntimeError("No se pudieron leer headers de Categoria")
     if "Timestamp" not in headers:
@@ -81,27 +84,7 @@ def create_categoria(nombre: str, icon: str = DEFAULT_ICON, color: str = DEFAULT
         else:
             row_out.append("")
 
-    append_range = f"{cfg.worksheet}!A{cfg.header_row + 1}:Z"
-    svc.spreadsheets().values().append(
-        spreadsheetId=cfg.spreadsheet_id,
-        range=append_range,
-        valueInputOption="USER_ENTERED",
-        insertDataOption="INSERT_ROWS",
-        body={"values": [row_out]},
-    ).execute()
-
-    time.sleep(0.2)
-    headers2, values2 = _get_headers_and_values_raw("categorias")
-    idx = _find_row_index_by_column_value(headers2, values2, "Timestamp", ts)
-    if idx is None:
-        time.sleep(0.3)
-        headers2, values2 = _get_headers_and_values_raw("categorias")
-        idx = _find_row_index_by_column_value(headers2, values2, "Timestamp", ts)
-    if idx is None:
-        raise RuntimeError("Insert OK pero no pude re-encontrar la fila por Timestamp")
-
-    row_dict = _values_to_rows(headers2, [values2[idx]])[0]
-    invalidate(get_current_spreadsheet_id(), "categorias")
+    row_dict = _append_row("categorias", headers, row_out, ts)
     r = _categoria_row_to_response(row_dict)
     r["name"] = r["nombre"]
     return r
@@ -111,11 +94,9 @@ def patch_categoria_by_id(cat_id: str, patch: Dict[str, Any]) -> Dict[str, Any]:
     """Actualiza categoría por Id. No permite cambiar Id."""
     cfg = SHEETS["categorias"]
     svc = get_sheets_service()
-    headers, values = _get_headers_and_values_raw("categorias")
+    headers, idx = _locate_row("categorias", cfg.id_column, cat_id)
     if not headers:
         raise RuntimeError("No se pudieron leer headers de Categoria")
-
-    idx = _find_row_index_by_column_value(headers, values, cfg.id_column, cat_id)
     if idx is None:
         raise KeyError("Categoría no encontrada")
 
@@ -131,10 +112,10 @@ def patch_categoria_by_id(cat_id: str, patch: Dict[str, Any]) -> Dict[str, Any]:
         updates.append({"range": a1, "values": [[patch[api_key]]]})
 
     if updates:
-        svc.spreadsheets().values().batchUpdate(
+        sheets_execute(svc.spreadsheets().values().batchUpdate(
             spreadsheetId=cfg.spreadsheet_id,
             body={"valueInputOption": "USER_ENTERED", "data": updates},
-        ).execute()
+        ))
         invalidate(get_current_spreadsheet_id(), "categorias")
 
     updated = get_categoria_by_id(cat_id)
@@ -152,11 +133,8 @@ def get_categoria_by_id(cat_id: str) -> Optional[Dict[str, Any]]:
     id_usuario = get_current_user_id()
     if id_usuario is not None:
         return get_categoria_by_id_sql(id_usuario, cat_id)
-    _, rows = read_table("categorias")
-    for r in rows:
-        if str(r.get("Id", "")).strip() == str(cat_id).strip():
-            return _categoria_row_to_response(r)
-    return None
+    r = find_row("categorias", "Id", cat_id)
+    return _categoria_row_to_response(r) if r else None
 
 
 def _categoria_row_to_response(row: Dict[str, Any]) -> Dict[str, Any]:
@@ -170,43 +148,7 @@ def _categoria_row_to_response(row: Dict[str, Any]) -> Dict[str, Any]:
 
 def delete_categoria_by_id(cat_id: str) -> bool:
     """Elimina la fila de la categoría en Sheets."""
-    cfg = SHEETS["categorias"]
-    svc = get_sheets_service()
-    headers, values = _get_headers_and_values_raw("categorias")
-    if not headers:
-        raise RuntimeError("No se pudieron leer headers de Categoria")
-
-    idx = _find_row_index_by_column_value(headers, values, cfg.id_column, cat_id)
-    if idx is None:
-        return False
-
-    spreadsheet = svc.spreadsheets().get(spreadsheetId=cfg.spreadsheet_id).execute()
-    sheet_id = None
-    for s in spreadsheet.get("sheets", []):
-        if s.get("properties", {}).get("title") == cfg.worksheet:
-            sheet_id = s["properties"]["sheetId"]
-            break
-    if sheet_id is None:
-        raise RuntimeError("No se encontró la hoja Categoria")
-
-    row_number = cfg.header_row + 1 + idx
-    svc.spreadsheets().batchUpdate(
-        spreadsheetId=cfg.spreadsheet_id,
-        body={
-            "requests": [{
-                "deleteDimension": {
-                    "range": {
-                        "sheetId": sheet_id,
-                        "dimension": "ROWS",
-                        "startIndex": row_number - 1,
-                        "endIndex": row_number,
-                    }
-                }
-            }]
-        },
-    ).execute()
-    invalidate(get_current_spreadsheet_id(), "categorias")
-    return True
+    return delete_row_by_id("categorias", cat_id)
 
 
 def create_subcategoria(categoria_id: str, nombre: str) -> Dict[str, Any]:
@@ -225,8 +167,7 @@ def create_subcategoria(categoria_id: str, nombre: str) -> Dict[str, Any]:
                 f"Ya existe una subcategoría llamada '{nombre.strip()}' en esta categoría"
             )
     cfg = SHEETS["subcategorias"]
-    svc = get_sheets_service()
-    headers, _ = _get_headers_and_values_raw("subcategorias")
+    headers = _get_headers("subcategorias")
     if not headers:
         raise RuntimeError("No se pudieron leer headers de Sub-Categoria")
     if "Timestamp" not in headers:
@@ -249,27 +190,7 @@ def create_subcategoria(categoria_id: str, nombre: str) -> Dict[str, Any]:
         else:
             row_out.append("")
 
-    append_range = f"{cfg.worksheet}!A{cfg.header_row + 1}:Z"
-    svc.spreadsheets().values().append(
-        spreadsheetId=cfg.spreadsheet_id,
-        range=append_range,
-        valueInputOption="USER_ENTERED",
-        insertDataOption="INSERT_ROWS",
-        body={"values": [row_out]},
-    ).execute()
-
-    time.sleep(0.2)
-    headers2, values2 = _get_headers_and_values_raw("subcategorias")
-    idx = _find_row_index_by_column_value(headers2, values2, "Timestamp", ts)
-    if idx is None:
-        time.sleep(0.3)
-        headers2, values2 = _get_headers_and_values_raw("subcategorias")
-        idx = _find_row_index_by_column_value(headers2, values2, "Timestamp", ts)
-    if idx is None:
-        raise RuntimeError("Insert OK pero no pude re-encontrar la subcategoría por Timestamp")
-
-    row_dict = _values_to_rows(headers2, [values2[idx]])[0]
-    invalidate(get_current_spreadsheet_id(), "subcategorias")
+    row_dict = _append_row("subcategorias", headers, row_out, ts)
     return {
         "id": str(row_dict.get("Id", "")).strip(),
         "categoria_id": str(row_dict.get("Id_Categoria", "")).strip(),
@@ -281,11 +202,9 @@ def patch_subcategoria_by_id(sub_id: str, nombre: str) -> Dict[str, Any]:
     """Actualiza el nombre de una subcategoría por Id."""
     cfg = SHEETS["subcategorias"]
     svc = get_sheets_service()
-    headers, values = _get_headers_and_values_raw("subcategorias")
+    headers, idx = _locate_row("subcategorias", cfg.id_column, sub_id)
     if not headers:
         raise RuntimeError("No se pudieron leer headers de Sub-Categoria")
-
-    idx = _find_row_index_by_column_value(headers, values, cfg.id_column, sub_id)
     if idx is None:
         raise KeyError("Subcategoría no encontrada")
 
@@ -295,64 +214,27 @@ def patch_subcategoria_by_id(sub_id: str, nombre: str) -> Dict[str, Any]:
     row_number = cfg.header_row + 1 + idx
     col_letter = _col_to_a1(headers.index("Nombre_SubCategoria") + 1)
     a1 = f"{cfg.worksheet}!{col_letter}{row_number}"
-    svc.spreadsheets().values().update(
+    sheets_execute(svc.spreadsheets().values().update(
         spreadsheetId=cfg.spreadsheet_id,
         range=a1,
         valueInputOption="USER_ENTERED",
         body={"values": [[nombre]]},
-    ).execute()
+    ))
     invalidate(get_current_spreadsheet_id(), "subcategorias")
 
-    _, rows = read_table("subcategorias")
-    for r in rows:
-        if str(r.get("Id", "")).strip() == str(sub_id).strip():
-            return {
-                "id": str(r.get("Id", "")).strip(),
-                "categoria_id": str(r.get("Id_Categoria", "")).strip(),
-                "nombre": str(r.get("Nombre_SubCategoria", "")).strip(),
-            }
+    r = find_row("subcategorias", "Id", sub_id)
+    if r:
+        return {
+            "id": str(r.get("Id", "")).strip(),
+            "categoria_id": str(r.get("Id_Categoria", "")).strip(),
+            "nombre": str(r.get("Nombre_SubCategoria", "")).strip(),
+        }
     raise RuntimeError("Actualicé pero no pude leer la subcategoría")
 
 
 def delete_subcategoria_by_id(sub_id: str) -> bool:
     """Elimina la fila de la subcategoría en Sheets."""
-    cfg = SHEETS["subcategorias"]
-    svc = get_sheets_service()
-    headers, values = _get_headers_and_values_raw("subcategorias")
-    if not headers:
-        raise RuntimeError("No se pudieron leer headers de Sub-Categoria")
-
-    idx = _find_row_index_by_column_value(headers, values, cfg.id_column, sub_id)
-    if idx is None:
-        return False
-
-    spreadsheet = svc.spreadsheets().get(spreadsheetId=cfg.spreadsheet_id).execute()
-    sheet_id = None
-    for s in spreadsheet.get("sheets", []):
-        if s.get("properties", {}).get("title") == cfg.worksheet:
-            sheet_id = s["properties"]["sheetId"]
-            break
-    if sheet_id is None:
-        raise RuntimeError("No se encontró la hoja Sub-Categoria")
-
-    row_number = cfg.header_row + 1 + idx
-    svc.spreadsheets().batchUpdate(
-        spreadsheetId=cfg.spreadsheet_id,
-        body={
-            "requests": [{
-                "deleteDimension": {
-                    "range": {
-                        "sheetId": sheet_id,
-                        "dimension": "ROWS",
-                        "startIndex": row_number - 1,
-                        "endIndex": row_number,
-                    }
-                }
-            }]
-        },
-    ).execute()
-    invalidate(get_current_spreadsheet_id(), "subcategorias")
-    return True
+    return delete_row_by_id("subcategorias", sub_id)
 
 
 def list_subcategorias(categoria_id: Optional[str] = None) -> List[Dict[str, Any]]:
@@ -467,8 +349,7 @@ def create_regla(
     sub_nombre = _get_subcategoria_nombre(category_id, sub_id)
 
     cfg = SHEETS["reglas"]
-    svc = get_sheets_service()
-    headers, _ = _get_headers_and_values_raw("reglas")
+    headers = _get_headers("reglas")
     if not headers:
         raise RuntimeError("No se pudieron leer headers de Reglas")
     if "Timestamp" not in headers:
@@ -494,27 +375,7 @@ def create_regla(
         else:
             row_out.append("")
 
-    append_range = f"{cfg.worksheet}!A{cfg.header_row + 1}:Z"
-    svc.spreadsheets().values().append(
-        spreadsheetId=cfg.spreadsheet_id,
-        range=append_range,
-        valueInputOption="USER_ENTERED",
-        insertDataOption="INSERT_ROWS",
-        body={"values": [row_out]},
-    ).execute()
-    invalidate(get_current_spreadsheet_id(), "reglas")
-
-    time.sleep(0.2)
-    headers2, values2 = _get_headers_and_values_raw("reglas")
-    idx = _find_row_index_by_column_value(headers2, values2, "Timestamp", ts)
-    if idx is None:
-        time.sleep(0.3)
-        headers2, values2 = _get_headers_and_values_raw("reglas")
-        idx = _find_row_index_by_column_value(headers2, values2, "Timestamp", ts)
-    if idx is None:
-        raise RuntimeError("Insert OK pero no pude re-encontrar la regla por Timestamp")
-
-    row_dict = _values_to_rows(headers2, [values2[idx]])[0]
+    row_dict = _append_row("reglas", headers, row_out, ts)
     result = _regla_row_to_response(row_dict)
 
     # Propagar a movimientos existentes con ese comercio
@@ -540,11 +401,8 @@ def _regla_row_to_response(row: Dict[str, Any]) -> Dict[str, Any]:
 
 
 def get_regla_by_id(regla_id: str) -> Optional[Dict[str, Any]]:
-    _, rows = read_table("reglas")
-    for r in rows:
-        if str(r.get("Id", "")).strip() == str(regla_id).strip():
-            return _regla_row_to_response(r)
-    return None
+    r = find_row("reglas", "Id", regla_id)
+    return _regla_row_to_response(r) if r else None
 
 
 def _comercio_matches_regla(mov_comercio: str, regla_comercio: str) -> bool:
@@ -563,34 +421,42 @@ def _propagar_regla_a_movimientos(
 ) -> int:
     """
     Actualiza todos los movimientos cuyo Comercio coincide con la regla,
-    asignando la nueva categoría y subcategoría. Retorna la cantidad actualizada.
+    asignando la nueva categoría y subcategoría. Retorna la cantidad de movimientos que
+    coinciden con la regla (aunque ya tuvieran esa categoría).
+    Lee la hoja una sola vez y manda solo las celdas que cambian en batchUpdate por bloques.
     """
-    _, rows = read_table("movimientos")
-    count = 0
-    for r in rows:
+    headers, values = _get_headers_and_values_raw("movimientos")
+    if not headers or "Comercio" not in headers:
+        return 0
+    rows = _values_to_rows(headers, values)
+    target = {"Nombre_Categoria": cat_nombre, "Nombre_SubCategoria": sub_nombre}
+    patches = []
+    matched = 0
+    for idx, r in enumerate(rows):
         mov_comercio = str(r.get("Comercio", "")).strip()
         if not _comercio_matches_regla(mov_comercio, regla_comercio):
             continue
         mov_id = str(r.get("Id", "")).strip()
         if not mov_id:
             continue
-        patch_movimiento_by_id(
-            mov_id,
-            {"Nombre_Categoria": cat_nombre, "Nombre_SubCategoria": sub_nombre},
-        )
-        count += 1
-    return count
+        matched += 1
+        changes = {
+            col: val for col, val in target.items()
+            if col in headers and str(r.get(col, "")).strip() != str(val).strip()
+        }
+        if changes:
+            patches.append((idx, mov_id, changes))
+    patch_rows_bulk("movimientos", headers, patches)
+    return matched
 
 
 def patch_regla_by_id(regla_id: str, patch: Dict[str, Any]) -> Dict[str, Any]:
     """Actualiza regla por Id. No permite cambiar Id."""
     cfg = SHEETS["reglas"]
     svc = get_sheets_service()
-    headers, values = _get_headers_and_values_raw("reglas")
+    headers, idx = _locate_row("reglas", cfg.id_column, regla_id)
     if not headers:
         raise RuntimeError("No se pudieron leer headers de Reglas")
-
-    idx = _find_row_index_by_column_value(headers, values, cfg.id_column, regla_id)
     if idx is None:
         raise KeyError("Regla no encontrada")
 
@@ -630,10 +496,10 @@ def patch_regla_by_id(regla_id: str, patch: Dict[str, Any]) -> Dict[str, Any]:
                 a1 = f"{cfg.worksheet}!{col_letter}{row_number}"
                 data.append({"range": a1, "values": [[val]]})
         if data:
-            svc.spreadsheets().values().batchUpdate(
+            sheets_execute(svc.spreadsheets().values().batchUpdate(
                 spreadsheetId=cfg.spreadsheet_id,
                 body={"valueInputOption": "USER_ENTERED", "data": data},
-            ).execute()
+            ))
             invalidate(get_current_spreadsheet_id(), "reglas")
 
     updated = get_regla_by_id(regla_id)
@@ -653,43 +519,7 @@ def patch_regla_by_id(regla_id: str, patch: Dict[str, Any]) -> Dict[str, Any]:
 
 def delete_regla_by_id(regla_id: str) -> bool:
     """Elimina la fila de la regla en Sheets."""
-    cfg = SHEETS["reglas"]
-    svc = get_sheets_service()
-    headers, values = _get_headers_and_values_raw("reglas")
-    if not headers:
-        raise RuntimeError("No se pudieron leer headers de Reglas")
-
-    idx = _find_row_index_by_column_value(headers, values, cfg.id_column, regla_id)
-    if idx is None:
-        return False
-
-    spreadsheet = svc.spreadsheets().get(spreadsheetId=cfg.spreadsheet_id).execute()
-    sheet_id = None
-    for s in spreadsheet.get("sheets", []):
-        if s.get("properties", {}).get("title") == cfg.worksheet:
-            sheet_id = s["properties"]["sheetId"]
-            break
-    if sheet_id is None:
-        raise RuntimeError("No se encontró la hoja Reglas")
-
-    row_number = cfg.header_row + 1 + idx
-    svc.spreadsheets().batchUpdate(
-        spreadsheetId=cfg.spreadsheet_id,
-        body={
-            "requests": [{
-                "deleteDimension": {
-                    "range": {
-                        "sheetId": sheet_id,
-                        "dimension": "ROWS",
-                        "startIndex": row_number - 1,
-                        "endIndex": row_number,
-                    }
-                }
-            }]
-        },
-    ).execute()
-    invalidate(get_current_spreadsheet_id(), "reglas")
-    return True
+    return delete_row_by_id("reglas", regla_id)
 
 
 def list_presupuestos(
@@ -797,8 +627,7 @@ def create_presupuesto(
         mes_norm = f"{today.year}-{today.month:02d}"
 
     cfg = SHEETS["presupuestos"]
-    svc = get_sheets_service()
-    headers, _ = _get_headers_and_values_raw("presupuestos")
+    headers = _get_headers("presupuestos")
     if not headers:
         raise RuntimeError("No se pudieron leer headers de Presupuesto")
     if "Timestamp" not in headers:
@@ -828,27 +657,7 @@ def create_presupuesto(
         else:
             row_out.append("")
 
-    append_range = f"{cfg.worksheet}!A{cfg.header_row + 1}:Z"
-    svc.spreadsheets().values().append(
-        spreadsheetId=cfg.spreadsheet_id,
-        range=append_range,
-        valueInputOption="USER_ENTERED",
-        insertDataOption="INSERT_ROWS",
-        body={"values": [row_out]},
-    ).execute()
-    invalidate(get_current_spreadsheet_id(), "presupuestos")
-
-    time.sleep(0.2)
-    headers2, values2 = _get_headers_and_values_raw("presupuestos")
-    idx = _find_row_index_by_column_value(headers2, values2, "Timestamp", ts)
-    if idx is None:
-        time.sleep(0.3)
-        headers2, values2 = _get_headers_and_values_raw("presupuestos")
-        idx = _find_row_index_by_column_value(headers2, values2, "Timestamp", ts)
-    if idx is None:
-        raise RuntimeError("Insert OK pero no pude re-encontrar el presupuesto por Timestamp")
-
-    row_dict = _values_to_rows(headers2, [values2[idx]])[0]
+    row_dict = _append_row("presupuestos", headers, row_out, ts)
     return _presupuesto_row_to_response(row_dict)
 
 
@@ -865,22 +674,17 @@ def _presupuesto_row_to_response(row: Dict[str, Any]) -> Dict[str, Any]:
 
 
 def get_presupuesto_by_id(presup_id: str) -> Optional[Dict[str, Any]]:
-    _, rows = read_table("presupuestos")
-    for r in rows:
-        if str(r.get("Id", "")).strip() == str(presup_id).strip():
-            return _presupuesto_row_to_response(r)
-    return None
+    r = find_row("presupuestos", "Id", presup_id)
+    return _presupuesto_row_to_response(r) if r else None
 
 
 def patch_presupuesto_by_id(presup_id: str, patch: Dict[str, Any]) -> Dict[str, Any]:
     """Actualiza presupuesto por Id. No permite cambiar Id."""
     cfg = SHEETS["presupuestos"]
     svc = get_sheets_service()
-    headers, values = _get_headers_and_values_raw("presupuestos")
+    headers, idx = _locate_row("presupuestos", cfg.id_column, presup_id)
     if not headers:
         raise RuntimeError("No se pudieron leer headers de Presupuesto")
-
-    idx = _find_row_index_by_column_value(headers, values, cfg.id_column, presup_id)
     if idx is None:
         raise KeyError("Presupuesto no encontrado")
 
@@ -918,10 +722,10 @@ def patch_presupuesto_by_id(presup_id: str, patch: Dict[str, Any]) -> Dict[str,
                 updates.append({"range": f"{cfg.worksheet}!{col_letter}{row_number}", "values": [[val]]})
 
     if updates:
-        svc.spreadsheets().values().batchUpdate(
+        sheets_execute(svc.spreadsheets().values().batchUpdate(
             spreadsheetId=cfg.spreadsheet_id,
             body={"valueInputOption": "USER_ENTERED", "data": updates},
-        ).execute()
+        ))
         invalidate(get_current_spreadsheet_id(), "presupuestos")
 
     updated = get_presupuesto_by_id(presup_id)
@@ -932,40 +736,4 @@ def patch_presupuesto_by_id(presup_id: str, patch: Dict[str, Any]) -> Dict[str,
 
 def delete_presupuesto_by_id(presup_id: str) -> bool:
     """Elimina la fila del presupuesto en Sheets."""
-    cfg = SHEETS["presupuestos"]
-    svc = get_sheets_service()
-    headers, values = _get_headers_and_values_raw("presupuestos")
-    if not headers:
-        raise RuntimeError("No se pudieron leer headers de Presupuesto")
-
-    idx = _find_row_index_by_column_value(headers, values, cfg.id_column, presup_id)
-    if idx is None:
-        return False
-
-    spreadsheet = svc.spreadsheets().get(spreadsheetId=cfg.spreadsheet_id).execute()
-    sheet_id = None
-    for s in spreadsheet.get("sheets", []):
-        if s.get("properties", {}).get("title") == cfg.worksheet:
-            sheet_id = s["properties"]["sheetId"]
-            break
-    if sheet_id is None:
-        raise RuntimeError("No se encontró la hoja Presupuesto")
-
-    row_number = cfg.header_row + 1 + idx
-    svc.spreadsheets().batchUpdate(
-        spreadsheetId=cfg.spreadsheet_id,
-        body={
-            "requests": [{
-                "deleteDimension": {
-                    "range": {
-                        "sheetId": sheet_id,
-                        "dimension": "ROWS",
-                        "startIndex": row_number - 1,
-                        "endIndex": row_number,
-                    }
-                }
-            }]
-        },
-    ).execute()
-    invalidate(get_current_spreadsheet_id(), "presupuestos")
-    return True
+    return delete_row_by_id("presupuestos", presup_id)
@@ -1,6 +1,14 @@
+"""
+Cliente de la API de Google Sheets.
+Las credenciales se cargan una vez por proceso (el access token se renueva solo al expirar)
+y cada thread reutiliza su propio service + conexión HTTP: httplib2 no es thread-safe.
+"""
 import json
+import threading
 from pathlib import Path
 
+import google_auth_httplib2
+import httplib2
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 
@@ -8,8 +16,14 @@ from app.core.config import settings
 
 SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
 
+_creds = None
+_creds_lock = threading.Lock()
+# Se incrementa en reset_sheets_service() para que cada thread reconstruya su service
+_generation = 0
+_local = threading.local()
 
-def get_sheets_service():
+
+def _load_credentials():
     """
     Credenciales: 1) GOOGLE_SHEETS_CREDENTIALS_JSON (env, ej. Azure App Settings)
     2) Fallback: GOOGLE_SHEETS_CREDENTIALS_FILE (ruta al .json)
@@ -17,13 +31,49 @@ def get_sheets_service():
     creds_json = settings.GOOGLE_SHEETS_CREDENTIALS_JSON
     if creds_json:
         info = json.loads(creds_json)
-        creds = service_account.Credentials.from_service_account_info(info, scopes=SCOPES)
-    else:
-        path = settings.GOOGLE_SHEETS_CREDENTIALS_FILE or "creds/service-account.json"
-        if not Path(path).exists():
-            raise RuntimeError(
-                "Falta GOOGLE_SHEETS_CREDENTIALS_JSON o GOOGLE_SHEETS_CREDENTIALS_FILE con archivo existente"
-            )
-        creds = service_account.Credentials.from_service_account_file(path, scopes=SCOPES)
-
-    return build("sheets", "v4", credentials=creds, cache_discovery=False)
+        return service_account.Credentials.from_service_account_info(info, scopes=SCOPES)
+    path = settings.GOOGLE_SHEETS_CREDENTIALS_FILE or "creds/service-account.json"
+    if not Path(path).exists():
+        raise RuntimeError(
+            "Falta GOOGLE_SHEETS_CREDENTIALS_JSON o GOOGLE_SHEETS_CREDENTIALS_FILE con archivo existente"
+        )
+    return service_account.Credentials.from_service_account_file(path, scopes=SCOPES)
+
+
+def _get_credentials():
+    global _creds
+    with _creds_lock:
+        if _creds is None:
+            _creds = _load_credentials()
+        return _creds
+
+
+def get_sheets_service():
+    """
+    Service de Sheets del thread actual. La primera llamada en cada thread arma el cliente
+    (discovery + conexión); las siguientes lo reutilizan.
+    Con SHEETS_BACKEND=emulator devuelve el emulador in-memory.
+    """
+    if settings.SHEETS_BACKEND == "emulator":
+        from app.sheets.emulator import get_service
+
+        return get_service()
+    service = getattr(_local, "service", None)
+    if service is not None and getattr(_local, "generation", None) == _generation:
+        return service
+    http = google_auth_httplib2.AuthorizedHttp(
+        _get_credentials(),
+        http=httplib2.Http(timeout=settings.SHEETS_HTTP_TIMEOUT_SEC),
+    )
+    service = build("sheets", "v4", http=http, cache_discovery=False)
+    _local.service = service
+    _local.generation = _generation
+    return service
+
+
+def reset_sheets_service() -> None:
+    """Descarta credenciales y clientes (ej. rotación de la service account)."""
+    global _creds, _generation
+    with _creds_lock:
+        _creds = None
+        _generation += 1
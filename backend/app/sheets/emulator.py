@@ -0,0 +1,477 @@
+"""
+Emulador in-memory de la API de Google Sheets (v4) para benchmarks y pruebas locales.
+Implementa lo que usa la app: values().get/batchGet/append/update/batchUpdate y
+spreadsheets().get/batchUpdate (deleteDimension), con latencia y errores 429 configurables.
+
+Uso: SHEETS_BACKEND=emulator hace que get_sheets_service() devuelva este emulador;
+los datos se cargan con seed() o seed_demo() sobre backend().
+"""
+from __future__ import annotations
+
+import json
+import random
+import re
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+_BASE_URI = "https://sheets.googleapis.com/v4/spreadsheets"
+_CELL_RE = re.compile(r"^([A-Z]*)(\d*)$")
+
+
+def _col_index(letters: str) -> int:
+    """A -> 0, Z -> 25, AA -> 26"""
+    n = 0
+    for ch in letters:
+        n = n * 26 + (ord(ch) - 64)
+    return n - 1
+
+
+def _col_letters(idx0: int) -> str:
+    s = ""
+    n = idx0 + 1
+    while n > 0:
+        n, r = divmod(n - 1, 26)
+        s = chr(65 + r) + s
+    return s
+
+
+def _cell_str(value: Any) -> str:
+    """Lo que devolvería Sheets con FORMATTED_VALUE para un valor USER_ENTERED."""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class _Worksheet:
+    __slots__ = ("sheet_id", "title", "rows", "id_column", "column_count")
+
+    def __init__(self, sheet_id: int, title: str, id_column: Optional[str], column_count: int) -> None:
+        self.sheet_id = sheet_id
+        self.title = title
+        self.rows: List[List[str]] = []
+        self.id_column = id_column
+        self.column_count = column_count
+
+    def last_row(self) -> int:
+        """Última fila (1-based) con algún valor."""
+        for i in range(len(self.rows) - 1, -1, -1):
+            if any(c != "" for c in self.rows[i]):
+                return i + 1
+        return 0
+
+
+class _Range:
+    __slots__ = ("title", "c0", "r0", "c1", "r1")
+
+    def __init__(self, title: str, c0: int, r0: int, c1: Optional[int], r1: Optional[int]) -> None:
+        self.title = title
+        self.c0 = c0  # columna inicial 0-based
+        self.r0 = r0  # fila inicial 1-based
+        self.c1 = c1  # columna final 0-based inclusive (None = hasta el final)
+        self.r1 = r1  # fila final 1-based inclusive (None = hasta el final)
+
+
+def _parse_range(a1: str) -> _Range:
+    """'Hoja!A2:Z', 'Hoja!C15', "'Hoja con espacios'!A1:Z1" -> _Range."""
+    title, _, cells = a1.rpartition("!")
+    if not title:
+        title, cells = cells, ""
+    title = title.strip("'")
+    if not cells:
+        return _Range(title, 0, 1, None, None)
+    start, _, end = cells.partition(":")
+    m0 = _CELL_RE.match(start)
+    if not m0:
+        raise ValueError(f"Rango inválido: {a1}")
+    c0 = _col_index(m0.group(1)) if m0.group(1) else 0
+    r0 = int(m0.group(2)) if m0.group(2) else 1
+    if not end:
+        return _Range(title, c0, r0, c0, r0)
+    m1 = _CELL_RE.match(end)
+    if not m1:
+        raise ValueError(f"Rango inválido: {a1}")
+    c1 = _col_index(m1.group(1)) if m1.group(1) else None
+    r1 = int(m1.group(2)) if m1.group(2) else None
+    return _Range(title, c0, r0, c1, r1)
+
+
+class SheetsEmulator:
+    """Backend in-memory: spreadsheet_id -> worksheets. Thread-safe."""
+
+    def __init__(self, latency_sec: float = 0.0, quota_error_rate: float = 0.0) -> None:
+        self.latency_sec = latency_sec
+        self.quota_error_rate = quota_error_rate
+        self.calls: Dict[str, int] = {}
+        self._spreadsheets: Dict[str, Dict[str, _Worksheet]] = {}
+        self._next_sheet_id = 1000
+        self._lock = threading.Lock()
+
+    # ---------- carga de datos ----------
+
+    def seed(
+        self,
+        spreadsheet_id: str,
+        worksheet: str,
+        rows: List[List[Any]],
+        id_column: Optional[str] = "Id",
+    ) -> None:
+        """
+        Reemplaza el contenido de una hoja (rows[0] = headers).
+        id_column: columna que se autocompleta en append (como la fórmula del Sheet real).
+        """
+        with self._lock:
+            sheets = self._spreadsheets.setdefault(spreadsheet_id, {})
+            ws = sheets.get(worksheet)
+            if ws is None:
+                ws = _Worksheet(self._next_sheet_id, worksheet, id_column, 26)
+                self._next_sheet_id += 1
+                sheets[worksheet] = ws
+            ws.id_column = id_column
+            ws.rows = [[_cell_str(v) for v in r] for r in rows]
+
+    def dump(self, spreadsheet_id: str, worksheet: str) -> List[List[str]]:
+        with self._lock:
+            return [list(r) for r in self._worksheet(spreadsheet_id, worksheet).rows]
+
+    def reset_calls(self) -> None:
+        with self._lock:
+            self.calls = {}
+
+    # ---------- helpers ----------
+
+    def _worksheet(self, spreadsheet_id: str, title: str) -> _Worksheet:
+        sheets = self._spreadsheets.get(spreadsheet_id)
+        if sheets is None:
+            raise _http_error(404, f"Requested entity was not found: {spreadsheet_id}")
+        ws = sheets.get(title)
+        if ws is None:
+            raise _http_error(400, f"Unable to parse range: {title}")
+        return ws
+
+    def _read(self, spreadsheet_id: str, a1: str) -> Dict[str, Any]:
+        rng = _parse_range(a1)
+        ws = self._worksheet(spreadsheet_id, rng.title)
+        r1 = ws.last_row() if rng.r1 is None else min(rng.r1, ws.last_row())
+        out: List[List[str]] = []
+        for rn in range(rng.r0, r1 + 1):
+            row = ws.rows[rn - 1]
+            cells = row[rng.c0:] if rng.c1 is None else row[rng.c0: rng.c1 + 1]
+            while cells and cells[-1] == "":
+                cells = cells[:-1]
+            out.append(list(cells))
+        while out and not out[-1]:
+            out.pop()
+        resp: Dict[str, Any] = {"range": a1, "majorDimension": "ROWS"}
+        if out:
+            resp["values"] = out
+        return resp
+
+    def _write(self, ws: _Worksheet, row_number: int, c0: int, values: List[Any]) -> None:
+        while len(ws.rows) < row_number:
+            ws.rows.append([])
+        row = ws.rows[row_number - 1]
+        need = c0 + len(values)
+        if len(row) < need:
+            row.extend([""] * (need - len(row)))
+        for i, v in enumerate(values):
+            row[c0 + i] = _cell_str(v)
+
+    def _next_id(self, ws: _Worksheet, col: int) -> str:
+        best = 0
+        for row in ws.rows[1:]:
+            if col < len(row):
+                try:
+                    best = max(best, int(float(row[col])))
+                except ValueError:
+                    continue
+        return str(best + 1)
+
+    # ---------- operaciones (las llama _FakeRequest.execute) ----------
+
+    def values_get(self, spreadsheetId: str, range: str, **_: Any) -> Dict[str, Any]:
+        return self._read(spreadsheetId, range)
+
+    def values_batch_get(self, spreadsheetId: str, ranges: List[str], **_: Any) -> Dict[str, Any]:
+        return {
+            "spreadsheetId": spreadsheetId,
+            "valueRanges": [self._read(spreadsheetId, r) for r in ranges],
+        }
+
+    def values_append(self, spreadsheetId: str, range: str, body: Dict[str, Any], **_: Any) -> Dict[str, Any]:
+        rng = _parse_range(range)
+        ws = self._worksheet(spreadsheetId, rng.title)
+        headers = ws.rows[0] if ws.rows else []
+        id_col = headers.index(ws.id_column) if ws.id_column in headers else None
+        start = max(ws.last_row() + 1, rng.r0)
+        width = 0
+        for i, values in enumerate(body.get("values", [])):
+            values = list(values)
+            if id_col is not None and id_col < len(values) and str(values[id_col]).strip() == "":
+                values[id_col] = self._next_id(ws, id_col)
+            self._write(ws, start + i, rng.c0, values)
+            width = max(width, len(values))
+        n = len(body.get("values", []))
+        end = start + max(n, 1) - 1
+        updated = (
+            f"'{ws.title}'!{_col_letters(rng.c0)}{start}:{_col_letters(rng.c0 + max(width, 1) - 1)}{end}"
+        )
+        return {
+            "spreadsheetId": spreadsheetId,
+            "tableRange": f"'{ws.title}'!A1:{_col_letters(max(len(headers), 1) - 1)}{start - 1}",
+            "updates": {
+                "spreadsheetId": spreadsheetId,
+                "updatedRange": updated,
+                "updatedRows": n,
+                "updatedColumns": width,
+                "updatedCells": sum(len(v) for v in body.get("values", [])),
+            },
+        }
+
+    def values_update(self, spreadsheetId: str, range: str, body: Dict[str, Any], **_: Any) -> Dict[str, Any]:
+        rng = _parse_range(range)
+        ws = self._worksheet(spreadsheetId, rng.title)
+        values = body.get("values", [])
+        for i, row in enumerate(values):
+            self._write(ws, rng.r0 + i, rng.c0, row)
+        return {"spreadsheetId": spreadsheetId, "updatedRange": range, "updatedRows": len(values)}
+
+    def values_batch_update(self, spreadsheetId: str, body: Dict[str, Any], **_: Any) -> Dict[str, Any]:
+        responses = []
+        for item in body.get("data", []):
+            resp = self.values_update(spreadsheetId, item["range"], {"values": item.get("values", [])})
+            if body.get("includeValuesInResponse"):
+                resp["updatedData"] = self._read(spreadsheetId, item["range"])
+            responses.append(resp)
+        return {
+            "spreadsheetId": spreadsheetId,
+            "totalUpdatedCells": sum(len(r) for d in body.get("data", []) for r in d.get("values", [])),
+            "responses": responses,
+        }
+
+    def spreadsheets_get(self, spreadsheetId: str, **_: Any) -> Dict[str, Any]:
+        sheets = self._spreadsheets.get(spreadsheetId)
+        if sheets is None:
+            raise _http_error(404, f"Requested entity was not found: {spreadsheetId}")
+        return {
+            "spreadsheetId": spreadsheetId,
+            "sheets": [
+                {
+                    "properties": {
+                        "sheetId": ws.sheet_id,
+                        "title": ws.title,
+                        "gridProperties": {
+                            "rowCount": max(len(ws.rows), 1000),
+                            "columnCount": ws.column_count,
+                        },
+                    }
+                }
+                for ws in sheets.values()
+            ],
+        }
+
+    def spreadsheets_batch_update(self, spreadsheetId: str, body: Dict[str, Any], **_: Any) -> Dict[str, Any]:
+        sheets = self._spreadsheets.get(spreadsheetId) or {}
+        by_id = {ws.sheet_id: ws for ws in sheets.values()}
+        replies = []
+        for req in body.get("requests", []):
+            if "deleteDimension" not in req:
+                raise _http_error(400, f"Request no soportada por el emulador: {list(req)}")
+            rng = req["deleteDimension"]["range"]
+            ws = by_id.get(rng["sheetId"])
+            if ws is None or rng.get("dimension") != "ROWS":
+                raise _http_error(400, "deleteDimension inválido")
+            del ws.rows[rng["startIndex"]: rng["endIndex"]]
+            replies.append({})
+        return {"spreadsheetId": spreadsheetId, "replies": replies}
+
+    def _call(self, name: str, fn, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        if self.latency_sec > 0:
+            time.sleep(self.latency_sec)
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+            if self.quota_error_rate > 0 and random.random() < self.quota_error_rate:
+                raise _http_error(429, "Quota exceeded (emulator)")
+            # Copia profunda: el caller no debe poder mutar el estado del emulador
+            return json.loads(json.dumps(fn(**kwargs)))
+
+
+def _http_error(status: int, message: str) -> HttpError:
+    content = json.dumps({"error": {"code": status, "message": message}}).encode()
+    return HttpError(httplib2.Response({"status": status}), content)
+
+
+class _FakeRequest:
+    """Equivalente a googleapiclient.http.HttpRequest: .execute(), .uri y .method."""
+
+    def __init__(self, emulator: SheetsEmulator, name: str, fn, method: str, uri: str, kwargs: Dict[str, Any]):
+        self._emulator = emulator
+        self._name = name
+        self._fn = fn
+        self._kwargs = kwargs
+        self.method = method
+        self.uri = uri
+
+    def execute(self, num_retries: int = 0) -> Dict[str, Any]:
+        return self._emulator._call(self._name, self._fn, self._kwargs)
+
+
+class _Values:
+    def __init__(self, emulator: SheetsEmulator) -> None:
+        self._e = emulator
+
+    def _req(self, name: str, fn, method: str, suffix: str, kwargs: Dict[str, Any]) -> _FakeRequest:
+        uri = f"{_BASE_URI}/{kwargs.get('spreadsheetId')}/values{suffix}"
+        return _FakeRequest(self._e, name, fn, method, uri, kwargs)
+
+    def get(self, **kwargs: Any) -> _FakeRequest:
+        return self._req("values.get", self._e.values_get, "GET", f"/{kwargs.get('range')}", kwargs)
+
+    def batchGet(self, **kwargs: Any) -> _FakeRequest:
+        return self._req("values.batchGet", self._e.values_batch_get, "GET", ":batchGet", kwargs)
+
+    def append(self, **kwargs: Any) -> _FakeRequest:
+        return self._req("values.append", self._e.values_append, "POST", f"/{kwargs.get('range')}:append", kwargs)
+
+    def update(self, **kwargs: Any) -> _FakeRequest:
+        return self._req("values.update", self._e.values_update, "PUT", f"/{kwargs.get('range')}", kwargs)
+
+    def batchUpdate(self, **kwargs: Any) -> _FakeRequest:
+        return self._req("values.batchUpdate", self._e.values_batch_update, "POST", ":batchUpdate", kwargs)
+
+
+class _Spreadsheets:
+    def __init__(self, emulator: SheetsEmulator) -> None:
+        self._e = emulator
+
+    def values(self) -> _Values:
+        return _Values(self._e)
+
+    def get(self, **kwargs: Any) -> _FakeRequest:
+        uri = f"{_BASE_URI}/{kwargs.get('spreadsheetId')}"
+        return _FakeRequest(self._e, "spreadsheets.get", self._e.spreadsheets_get, "GET", uri, kwargs)
+
+    def batchUpdate(self, **kwargs: Any) -> _FakeRequest:
+        uri = f"{_BASE_URI}/{kwargs.get('spreadsheetId')}:batchUpdate"
+        return _FakeRequest(self._e, "spreadsheets.batchUpdate", self._e.spreadsheets_batch_update, "POST", uri, kwargs)
+
+
+class EmulatedSheetsService:
+    """Reemplazo de build("sheets", "v4", ...)."""
+
+    def __init__(self, emulator: SheetsEmulator) -> None:
+        self._e = emulator
+
+    def spreadsheets(self) -> _Spreadsheets:
+        return _Spreadsheets(self._e)
+
+
+_backend = SheetsEmulator()
+
+
+def backend() -> SheetsEmulator:
+    """Emulador compartido por el proceso (el que usa get_sheets_service con SHEETS_BACKEND=emulator)."""
+    return _backend
+
+
+def get_service() -> EmulatedSheetsService:
+    return EmulatedSheetsService(_backend)
+
+
+# =========================
+# Datos de ejemplo
+# =========================
+
+MOVIMIENTOS_HEADERS = [
+    "Id", "Fecha", "Tipo de Movimiento", "Moneda", "Monto", "Comercio", "Descripcion",
+    "Nombre_Categoria", "Nombre_SubCategoria", "Medios de pago", "Id_usuario", "Timestamp",
+]
+REGLAS_HEADERS = [
+    "Id", "Comercio", "IdCategoria", "Nombre_Categoria", "IdSubCategoria", "Nombre_SubCategoria", "Timestamp",
+]
+CATEGORIAS_HEADERS = ["Id", "Nombre", "Icon", "Color", "Timestamp"]
+SUBCATEGORIAS_HEADERS = ["Id", "Id_Categoria", "Nombre_SubCategoria", "Timestamp"]
+PRESUPUESTOS_HEADERS = [
+    "Id", "mesAño", "idCategoria", "Nombre_Categoria", "idSubcategoria", "Nombre_SubCategoria", "Monto", "Timestamp",
+]
+
+
+def seed_demo(
+    spreadsheet_id: str,
+    movimientos: int = 5000,
+    comercios: int = 200,
+    categorias: int = 12,
+    subcategorias_por_categoria: int = 4,
+    seed: int = 42,
+    emulator: Optional[SheetsEmulator] = None,
+) -> None:
+    """Carga las cinco hojas de la app con datos sintéticos reproducibles."""
+    from app.sheets.registry import _build_sheets
+
+    e = emulator or _backend
+    rnd = random.Random(seed)
+    tabs = _build_sheets(spreadsheet_id)
+    base_ts = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    def ts(i: int) -> str:
+        return (base_ts + timedelta(seconds=i)).isoformat(timespec="milliseconds")
+
+    cats: List[Tuple[int, str]] = [(i, f"Categoria {i}") for i in range(1, categorias + 1)]
+    subs: List[Tuple[int, int, str]] = []
+    for cid, _ in cats:
+        for j in range(subcategorias_por_categoria):
+            subs.append((len(subs) + 1, cid, f"Sub {cid}.{j + 1}"))
+    cat_name = dict(cats)
+
+    e.seed(spreadsheet_id, tabs["categorias"].worksheet, [CATEGORIAS_HEADERS] + [
+        [cid, name, "📁", "#6b7280", ts(cid)] for cid, name in cats
+    ])
+    e.seed(spreadsheet_id, tabs["subcategorias"].worksheet, [SUBCATEGORIAS_HEADERS] + [
+        [sid, cid, name, ts(sid)] for sid, cid, name in subs
+    ])
+
+    comercio_sub = {f"Comercio {k}": rnd.choice(subs) for k in range(1, comercios + 1)}
+    reglas = [REGLAS_HEADERS]
+    for i, (comercio, (sid, cid, sname)) in enumerate(list(comercio_sub.items())[: comercios // 2], start=1):
+        reglas.append([i, comercio, cid, cat_name[cid], sid, sname, ts(i)])
+    e.seed(spreadsheet_id, tabs["reglas"].worksheet, reglas)
+
+    today = date.today()
+    presupuestos = [PRESUPUESTOS_HEADERS]
+    for m in range(6):
+        y, mo = divmod(today.year * 12 + today.month - 1 - m, 12)
+        for cid, name in cats:
+            presupuestos.append([
+                len(presupuestos), f"{mo + 1:02d}/{y}", cid, name, "", "", rnd.randrange(1000, 100000), ts(len(presupuestos)),
+            ])
+    e.seed(spreadsheet_id, tabs["presupuestos"].worksheet, presupuestos)
+
+    movs = [MOVIMIENTOS_HEADERS]
+    names = list(comercio_sub)
+    for i in range(1, movimientos + 1):
+        comercio = rnd.choice(names)
+        sid, cid, sname = comercio_sub[comercio]
+        d = today - timedelta(days=rnd.randrange(0, 730))
+        movs.append([
+            i,
+            f"{d.day}/{d.month:02d}/{d.year}",
+            "Ingreso" if rnd.random() < 0.1 else "Gasto",
+            "USD" if rnd.random() < 0.05 else "ARS",
+            f"{rnd.randrange(100, 500000):,}",
+            comercio,
+            "",
+            cat_name[cid],
+            sname,
+            rnd.choice(["Efectivo", "Débito", "Crédito"]),
+            "",
+            ts(i),
+        ])
+    e.seed(spreadsheet_id, tabs["movimientos"].worksheet, movs)
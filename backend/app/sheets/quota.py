@@ -0,0 +1,172 @@
+"""
+Scheduler de llamadas a la API de Sheets: toda request pasa por execute().
+- Token bucket por proyecto (la service account es un único usuario para la cuota de Google)
+  y por spreadsheet, para que un tenant no se coma la cuota de los demás. Los buckets son
+  por proceso: cada worker usa la cuota configurada / WEB_CONCURRENCY.
+- Prioridad: las llamadas en background (refresco, warm-up) no usan la reserva
+  SHEETS_QUOTA_BACKGROUND_RESERVE de cada bucket, que queda para requests interactivos.
+- Backoff exponencial con jitter ante 429/5xx. Los 5xx solo se reintentan en requests
+  idempotentes (un append que falló con 500 pudo haberse aplicado).
+"""
+from __future__ import annotations
+
+import logging
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+from googleapiclient.errors import HttpError
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_background: ContextVar[bool] = ContextVar("sheets_background", default=False)
+
+_SPREADSHEET_RE = re.compile(r"/spreadsheets/([^/:?]+)")
+
+
+class _Bucket:
+    """Token bucket: capacity = cuota por minuto, se repone a per_min/60 tokens por segundo."""
+
+    def __init__(self, per_min: float) -> None:
+        self.rate = per_min / 60.0
+        self.capacity = float(per_min)
+        self.tokens = float(per_min)
+        self.ts = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.ts) * self.rate)
+        self.ts = now
+
+    def take(self, reserve: float) -> float:
+        """Toma un token dejando `reserve` libres. Retorna 0 si lo tomó, si no los segundos a esperar."""
+        with self.lock:
+            self._refill(time.monotonic())
+            if self.tokens - reserve >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 + reserve - self.tokens) / self.rate
+
+    def refund(self) -> None:
+        with self.lock:
+            self.tokens = min(self.capacity, self.tokens + 1)
+
+    def drain(self) -> None:
+        """Tras un 429: vacía el bucket para que el resto de las llamadas también frene."""
+        with self.lock:
+            self.tokens = min(self.tokens, 0.0)
+
+
+_project_bucket: Optional[_Bucket] = None
+_spreadsheet_buckets: Dict[str, _Bucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def _per_worker(per_min: int) -> float:
+    """Parte de la cuota que le toca a este proceso (la cuota de Google es del proyecto)."""
+    return per_min / max(1, settings.WEB_CONCURRENCY)
+
+
+def _buckets(spreadsheet_id: Optional[str]) -> List[_Bucket]:
+    global _project_bucket
+    out: List[_Bucket] = []
+    with _buckets_lock:
+        if settings.SHEETS_QUOTA_PER_MIN_PROJECT > 0:
+            if _project_bucket is None:
+                _project_bucket = _Bucket(_per_worker(settings.SHEETS_QUOTA_PER_MIN_PROJECT))
+            out.append(_project_bucket)
+        if spreadsheet_id and settings.SHEETS_QUOTA_PER_MIN_SPREADSHEET > 0:
+            bucket = _spreadsheet_buckets.get(spreadsheet_id)
+            if bucket is None:
+                bucket = _Bucket(_per_worker(settings.SHEETS_QUOTA_PER_MIN_SPREADSHEET))
+                _spreadsheet_buckets[spreadsheet_id] = bucket
+            out.append(bucket)
+    return out
+
+
+def _acquire(buckets: List[_Bucket]) -> float:
+    """Espera hasta tener token en todos los buckets. Retorna los segundos esperados."""
+    background = _background.get()
+    waited = 0.0
+    while True:
+        taken: List[_Bucket] = []
+        wait = 0.0
+        for bucket in buckets:
+            reserve = bucket.capacity * settings.SHEETS_QUOTA_BACKGROUND_RESERVE if background else 0.0
+            wait = bucket.take(reserve)
+            if wait:
+                break
+            taken.append(bucket)
+        if not wait:
+            return waited
+        for bucket in taken:
+            bucket.refund()
+        wait = min(wait, 1.0)
+        time.sleep(wait)
+        waited += wait
+
+
+@contextmanager
+def background() -> Iterator[None]:
+    """Marca las llamadas a Sheets del bloque como de baja prioridad (refresco, warm-up)."""
+    token = _background.set(True)
+    try:
+        yield
+    finally:
+        _background.reset(token)
+
+
+def _is_idempotent(request: Any) -> bool:
+    method = getattr(request, "method", "GET")
+    uri = getattr(request, "uri", "")
+    return method in ("GET", "PUT") or "/values:batchUpdate" in uri
+
+
+def _backoff(attempt: int, error: HttpError) -> float:
+    retry_after = error.resp.get("retry-after") if error.resp is not None else None
+    if retry_after:
+        # Acotado: un header absurdo no debe colgar el thread del request
+        try:
+            return min(max(float(retry_after), 0.0), settings.SHEETS_BACKOFF_MAX_SEC)
+        except ValueError:
+            pass
+    cap = min(settings.SHEETS_BACKOFF_MAX_SEC, settings.SHEETS_BACKOFF_BASE_SEC * (2 ** attempt))
+    return random.uniform(0, cap)  # full jitter
+
+
+def execute(request: Any) -> Dict[str, Any]:
+    """
+    Ejecuta una request de googleapiclient (ej. svc.spreadsheets().values().get(...))
+    respetando la cuota y reintentando 429/5xx.
+    """
+    match = _SPREADSHEET_RE.search(getattr(request, "uri", "") or "")
+    spreadsheet_id = match.group(1) if match else None
+    buckets = _buckets(spreadsheet_id)
+    attempt = 0
+    while True:
+        waited = _acquire(buckets)
+        if waited >= 1:
+            logger.info(f"sheets_quota_wait={waited:.2f}s background={_background.get()}")
+        try:
+            return request.execute()
+        except HttpError as e:
+            status = e.resp.status if e.resp is not None else 0
+            retryable = status == 429 or (status >= 500 and _is_idempotent(request))
+            if not retryable or attempt >= settings.SHEETS_MAX_RETRIES:
+                raise
+            if status == 429:
+                for bucket in buckets:
+                    bucket.drain()
+            delay = _backoff(attempt, e)
+            logger.warning(
+                f"sheets_retry status={status} attempt={attempt + 1} sleep={delay:.2f}s "
+                f"spreadsheet_id={(spreadsheet_id or '')[:8]}..."
+            )
+            time.sleep(delay)
+            attempt += 1
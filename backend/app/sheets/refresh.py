@@ -0,0 +1,163 @@
+"""
+Refresco en background de tablas calientes de Sheets, multi-tenant.
+Registra los spreadsheets activos (ID_Sheets del JWT) y refresca sus tablas
+con tiempos escalonados y jitter en un pool acotado de workers.
+Los spreadsheets sin actividad por SHEETS_TENANT_IDLE_SEC se dejan de refrescar y
+se descartan sus tablas del cache.
+"""
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.cache.sheets_cache import invalidate, ttl
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Tablas que se leen en casi todos los requests (presupuestos ahora en SQL)
+HOT_TABLES = ("reglas", "categorias", "subcategorias")
+
+# Cada cuánto revisa el loop qué tablas vencieron (segundos)
+_TICK_SEC = 1.0
+
+# spreadsheet_id -> última actividad (time.time())
+_tenants: Dict[str, float] = {}
+# Spreadsheets que nunca expiran (ej. SPREADSHEET_ID de .env)
+_pinned: Set[str] = set()
+# (spreadsheet_id, table_name) -> próximo refresco (time.time())
+_due: Dict[Tuple[str, str], float] = {}
+_in_flight: Set[Tuple[str, str]] = set()
+_lock = threading.Lock()
+
+_executor: Optional[ThreadPoolExecutor] = None
+_started = False
+
+
+def hot_tables() -> List[str]:
+    """Tablas a refrescar por spreadsheet. Movimientos solo si se leen desde Sheets."""
+    tables = list(HOT_TABLES)
+    if not settings.MOVIMIENTOS_USE_SQL:
+        tables.append("movimientos")
+    return tables
+
+
+def _enabled() -> bool:
+    """Refresco activo: hay intervalo y hay cache que mantener (TTL > 0)."""
+    return settings.SHEETS_REFRESH_INTERVAL_SEC > 0 and settings.SHEETS_CACHE_TTL_SEC > 0
+
+
+def _next_delay(spreadsheet_id: str, table: str) -> float:
+    """Próximo refresco: cada SHEETS_REFRESH_INTERVAL_SEC, o al vencer el TTL adaptativo si es mayor."""
+    interval = max(settings.SHEETS_REFRESH_INTERVAL_SEC, ttl(spreadsheet_id, table))
+    jitter = min(settings.SHEETS_REFRESH_JITTER_SEC, interval / 2)
+    return interval + random.uniform(-jitter, jitter)
+
+
+def mark_active(spreadsheet_id: Optional[str], pinned: bool = False) -> None:
+    """
+    Registra actividad de un spreadsheet (llamado por require_user).
+    Al entrar un tenant nuevo, agenda sus tablas escalonadas dentro del primer intervalo.
+    """
+    if not spreadsheet_id or not _enabled():
+        return
+    now = time.time()
+    with _lock:
+        is_new = spreadsheet_id not in _tenants
+        _tenants[spreadsheet_id] = now
+        if pinned:
+            _pinned.add(spreadsheet_id)
+        if is_new:
+            interval = settings.SHEETS_REFRESH_INTERVAL_SEC
+            for table in hot_tables():
+                _due[(spreadsheet_id, table)] = now + random.uniform(interval / 2, interval)
+
+
+def active_tenants() -> List[str]:
+    with _lock:
+        return list(_tenants)
+
+
+def _drop_idle(now: float) -> List[str]:
+    """Quita tenants inactivos. Llamar con _lock tomado. Retorna los spreadsheets quitados."""
+    idle = settings.SHEETS_TENANT_IDLE_SEC
+    expired = [
+        sid for sid, seen in _tenants.items()
+        if sid not in _pinned and now - seen > idle
+    ]
+    for sid in expired:
+        del _tenants[sid]
+        for key in [k for k in _due if k[0] == sid]:
+            del _due[key]
+        logger.info(f"refresh tenant_idle spreadsheet_id={sid[:8]}...")
+    return expired
+
+
+def _refresh(spreadsheet_id: str, tables: List[str]) -> None:
+    from app.sheets.quota import background
+    from app.sheets.registry import set_current_spreadsheet_id
+    from app.sheets.service import refresh_tables
+
+    names = ",".join(tables)
+    try:
+        set_current_spreadsheet_id(spreadsheet_id)
+        with background():
+            refresh_tables(tables)
+        logger.info(f"refresh ok: {names} spreadsheet_id={spreadsheet_id[:8]}...")
+    except Exception as e:
+        logger.warning(f"refresh {names} spreadsheet_id={spreadsheet_id[:8]}...: {e}")
+    finally:
+        with _lock:
+            for table in tables:
+                _in_flight.discard((spreadsheet_id, table))
+
+
+def _tick() -> None:
+    now = time.time()
+    by_tenant: Dict[str, List[str]] = {}
+    with _lock:
+        idle = _drop_idle(now)
+        due = [k for k, ts in _due.items() if ts <= now and k not in _in_flight]
+        for key in due:
+            _in_flight.add(key)
+            _due[key] = now + _next_delay(*key)
+            by_tenant.setdefault(key[0], []).append(key[1])
+    # Sin refresco ni actividad: sus snapshots solo ocuparían memoria (fuera de _lock)
+    for sid in idle:
+        invalidate(sid)
+    # Las tablas de un mismo tenant que vencen juntas van en un solo batchGet
+    for sid, tables in by_tenant.items():
+        _executor.submit(_refresh, sid, tables)
+
+
+def _loop() -> None:
+    while True:
+        time.sleep(_TICK_SEC)
+        try:
+            _tick()
+        except Exception as e:
+            logger.warning(f"refresh tick: {e}")
+
+
+def start() -> None:
+    """
+    Arranca el loop de refresco (idempotente). No hace nada si SHEETS_REFRESH_INTERVAL_SEC <= 0
+    o con el cache desactivado (SHEETS_CACHE_TTL_SEC <= 0).
+    """
+    global _executor, _started
+    if not _enabled():
+        return
+    with _lock:
+        if _started:
+            return
+        _started = True
+        _executor = ThreadPoolExecutor(
+            max_workers=max(1, settings.SHEETS_REFRESH_WORKERS),
+            thread_name_prefix="sheets-refresh",
+        )
+    t = threading.Thread(target=_loop, daemon=True)
+    t.start()
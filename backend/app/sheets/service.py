@@ -1,27 +1,103 @@
 from __future__ import annotations
 
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from collections.abc import Mapping
 from typing import Any, Dict, List, Optional, Tuple
 from datetime import date, datetime, timezone
+import heapq
+import logging
 import re
+import threading
 import time
 
+from app.core.config import settings
 from app.core.request_metrics import time_sheets_block
-from app.cache.sheets_cache import get_table as cache_get_table, invalidate
+from app.cache.sheets_cache import (
+    TableSnapshot,
+    get_snapshot as cache_get_snapshot,
+    get_table as cache_get_table,
+    get_tables as cache_get_tables,
+    peek as cache_peek,
+    put_tables as cache_put_tables,
+    refresh_table as cache_refresh_table,
+    touch as cache_touch,
+    update_table as cache_update_table,
+)
+from googleapiclient.errors import HttpError
+
 from app.sheets.client import get_sheets_service
+from app.sheets.quota import execute as sheets_execute
 from app.sheets.registry import SHEETS, get_current_spreadsheet_id
 
+logger = logging.getLogger(__name__)
+
 
 # =========================
 # Helpers base
 # =========================
 
-def _values_to_rows(headers: List[str], values: List[List[Any]]) -> List[Dict[str, Any]]:
-    out: List[Dict[str, Any]] = []
+class SheetRow(Mapping):
+    """
+    Fila de Sheets como vista de solo lectura tipo dict: tupla de valores + índice de columnas
+    compartido por toda la tabla, en vez de un dict por fila que repite todos los headers.
+    Para devolverla por la API usar dict(row).
+    """
+
+    __slots__ = ("_cols", "_values")
+
+    def __init__(self, cols: Dict[str, int], values: Tuple[Any, ...]) -> None:
+        self._cols = cols
+        self._values = values
+
+    def __getitem__(self, key: str) -> Any:
+        return self._values[self._cols[key]]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        i = self._cols.get(key)
+        return default if i is None else self._values[i]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._cols
+
+    def __iter__(self):
+        return iter(self._cols)
+
+    def __len__(self) -> int:
+        return len(self._cols)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, SheetRow) and other._cols == self._cols:
+            return other._values == self._values
+        return Mapping.__eq__(self, other)
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"SheetRow({dict(self)!r})"
+
+    def replace(self, changes: Dict[str, Any]) -> "SheetRow":
+        """Copia con las columnas de changes actualizadas (las que no existen se ignoran)."""
+        values = list(self._values)
+        for key, value in changes.items():
+            i = self._cols.get(key)
+            if i is not None:
+                values[i] = value
+        return SheetRow(self._cols, tuple(values))
+
+
+def _values_to_rows(headers: List[str], values: List[List[Any]]) -> List[SheetRow]:
+    # Mismo criterio que un dict armado columna por columna: con headers repetidos gana el último
+    cols = {h: i for i, h in enumerate(headers)}
+    n = len(headers)
+    # Una sola instancia por string repetido (Moneda, Tipo, categorías, fechas...)
+    pool: Dict[Any, Any] = {}
+    intern = pool.setdefault
+    out: List[SheetRow] = []
     for row in values:
-        obj: Dict[str, Any] = {}
-        for i, h in enumerate(headers):
-            obj[h] = row[i] if i < len(row) else ""
-        out.append(obj)
+        if len(row) < n:
+            row = row + [""] * (n - len(row))
+        out.append(SheetRow(cols, tuple([intern(v, v) for v in row[:n]])))
     return out
 
 
@@ -82,36 +158,268 @@ def _now_timestamp_iso_local() -> str:
 # Lectura (ya la tenías)
 # =========================
 
+def _table_range(cfg) -> str:
+    """Rango que incluye la fila de headers y todos los datos: una sola llamada por tabla."""
+    return f"{cfg.worksheet}!A{cfg.header_row}:Z"
+
+
+def _split_headers(values: List[List[Any]]) -> Tuple[List[str], List[List[Any]]]:
+    """Separa la fila de headers (primera del rango) de los datos."""
+    if not values or not values[0]:
+        return [], []
+    return values[0], values[1:]
+
+
 def _fetch_table_from_sheets(entity: str) -> Tuple[List[str], List[Dict[str, Any]]]:
-    """Fetch raw desde Google Sheets (sin cache)."""
+    """Fetch raw desde Google Sheets (sin cache). Headers y datos en un solo values().get."""
     cfg = SHEETS[entity]
     svc = get_sheets_service()
-    header_range = f"{cfg.worksheet}!A{cfg.header_row}:Z{cfg.header_row}"
-    header_resp = svc.spreadsheets().values().get(
+    resp = sheets_execute(svc.spreadsheets().values().get(
         spreadsheetId=cfg.spreadsheet_id,
-        range=header_range,
-    ).execute()
-    headers = header_resp.get("values", [[]])[0]
+        range=_table_range(cfg),
+    ))
+    headers, values = _split_headers(resp.get("values", []))
     if not headers:
         return [], []
-    data_range = f"{cfg.worksheet}!A{cfg.header_row + 1}:Z"
-    data_resp = svc.spreadsheets().values().get(
-        spreadsheetId=cfg.spreadsheet_id,
-        range=data_range,
-    ).execute()
-    values = data_resp.get("values", [])
     rows = _values_to_rows(headers, values)
     return headers, rows
 
 
-def read_table(entity: str) -> Tuple[List[str], List[Dict[str, Any]]]:
+def _batch_fetch_tables(entities: List[str]) -> Dict[str, Tuple[List[str], List[Dict[str, Any]]]]:
+    """
+    Fetch raw de varias hojas del spreadsheet actual en un solo values().batchGet.
+    Retorna {entity: (headers, rows)}.
+    """
+    if not entities:
+        return {}
+    cfgs = [SHEETS[e] for e in entities]
+    svc = get_sheets_service()
+    resp = sheets_execute(svc.spreadsheets().values().batchGet(
+        spreadsheetId=cfgs[0].spreadsheet_id,
+        ranges=[_table_range(cfg) for cfg in cfgs],
+    ))
+    value_ranges = resp.get("valueRanges", [])
+    out: Dict[str, Tuple[List[str], List[Dict[str, Any]]]] = {}
+    for i, entity in enumerate(entities):
+        vr = value_ranges[i] if i < len(value_ranges) else {}
+        headers, values = _split_headers(vr.get("values", []))
+        out[entity] = (headers, _values_to_rows(headers, values)) if headers else ([], [])
+    return out
+
+
+def _fetch_table_tail(
+    entity: str,
+    headers: List[str],
+    rows: List[Dict[str, Any]],
+) -> Optional[Tuple[List[str], List[Dict[str, Any]]]]:
+    """
+    Fetch incremental para tablas append-only: trae desde la última fila cacheada en adelante.
+    La última fila cacheada (y los headers, en el mismo batchGet) funcionan de chequeo barato:
+    si cambiaron (se borraron o insertaron filas en el medio) retorna None para que el cache
+    haga la recarga completa.
+    """
+    if not headers or not rows:
+        return None
+    cfg = SHEETS[entity]
+    svc = get_sheets_service()
+    anchor_row = cfg.header_row + len(rows)
+    resp = sheets_execute(svc.spreadsheets().values().batchGet(
+        spreadsheetId=cfg.spreadsheet_id,
+        ranges=[
+            f"{cfg.worksheet}!A{cfg.header_row}:Z{cfg.header_row}",
+            f"{cfg.worksheet}!A{anchor_row}:Z",
+        ],
+    ))
+    value_ranges = resp.get("valueRanges", [])
+    header_values = value_ranges[0].get("values", []) if value_ranges else []
+    values = value_ranges[1].get("values", []) if len(value_ranges) > 1 else []
+    if (
+        not header_values
+        or header_values[0] != headers
+        or not values
+        or _values_to_rows(headers, values[:1])[0] != rows[-1]
+    ):
+        logger.info(f"incremental_fallback table_name={entity} anchor_row={anchor_row}")
+        return None
+    if len(values) == 1:
+        return headers, rows
+    return headers, rows + _values_to_rows(headers, values[1:])
+
+
+def _probe_ranges(entity: str, n_rows: int) -> List[str]:
+    """Rangos del chequeo barato: fila de headers + última fila cacheada y la siguiente."""
+    cfg = SHEETS[entity]
+    last_row = cfg.header_row + n_rows
+    return [
+        f"{cfg.worksheet}!A{cfg.header_row}:Z{cfg.header_row}",
+        f"{cfg.worksheet}!A{last_row}:Z{last_row + 1}",
+    ]
+
+
+def _probe_unchanged(
+    headers: List[str],
+    rows: List[Dict[str, Any]],
+    value_ranges: List[Dict[str, Any]],
+) -> bool:
+    """
+    True si la hoja coincide con lo cacheado según el chequeo de _probe_ranges: mismos headers,
+    misma última fila y nada después. No ve ediciones en filas del medio (eso lo cubre
+    la recarga completa cada SHEETS_FULL_RELOAD_SEC).
+    """
+    header_values = value_ranges[0].get("values", []) if value_ranges else []
+    values = value_ranges[1].get("values", []) if len(value_ranges) > 1 else []
+    if not header_values or header_values[0] != headers or len(values) != 1:
+        return False
+    if not rows:
+        return values[0] == headers  # tabla vacía: el rango arranca en la fila de headers
+    return _values_to_rows(headers, values)[0] == rows[-1]
+
+
+def _probe_table(
+    entity: str,
+    headers: List[str],
+    rows: List[Dict[str, Any]],
+) -> Optional[Tuple[List[str], List[Dict[str, Any]]]]:
+    """refresh_fn de tablas no incrementales: las mismas filas si no cambió, None para recargar."""
+    if not headers:
+        return None
+    cfg = SHEETS[entity]
+    resp = sheets_execute(get_sheets_service().spreadsheets().values().batchGet(
+        spreadsheetId=cfg.spreadsheet_id,
+        ranges=_probe_ranges(entity, len(rows)),
+    ))
+    if _probe_unchanged(headers, rows, resp.get("valueRanges", [])):
+        return headers, rows
+    return None
+
+
+def _probe_tables(entities: List[str]) -> List[str]:
+    """
+    Chequeo barato de varias hojas en un solo batchGet: a las que no cambiaron les renueva
+    el TTL en cache. Retorna las que hay que recargar completas (cambiaron, no estaban
+    en cache o pasaron SHEETS_FULL_RELOAD_SEC desde la última carga completa).
+    """
     sid = get_current_spreadsheet_id()
+    now = time.time()
+    snapshots: Dict[str, TableSnapshot] = {}
+    stale: List[str] = []
+    for entity in entities:
+        snapshot = cache_peek(sid, entity)
+        if snapshot is None or not snapshot.headers or now - snapshot.full_ts > settings.SHEETS_FULL_RELOAD_SEC:
+            stale.append(entity)
+        else:
+            snapshots[entity] = snapshot
+    if not snapshots:
+        return stale
+
+    ranges: List[str] = []
+    for entity, snapshot in snapshots.items():
+        ranges.extend(_probe_ranges(entity, len(snapshot.rows)))
+    with time_sheets_block():
+        resp = sheets_execute(get_sheets_service().spreadsheets().values().batchGet(
+            spreadsheetId=SHEETS[entities[0]].spreadsheet_id,
+            ranges=ranges,
+        ))
+    value_ranges = resp.get("valueRanges", [])
+    for i, (entity, snapshot) in enumerate(snapshots.items()):
+        pair = value_ranges[2 * i:2 * i + 2]
+        if not (_probe_unchanged(snapshot.headers, snapshot.rows, pair) and cache_touch(sid, entity, snapshot)):
+            stale.append(entity)
+    return stale
+
+
+def _table_fetchers(entity: str):
+    """
+    Arma (fetch_fn, refresh_fn) para el cache: las tablas incrementales traen solo las filas
+    nuevas; el resto hace el chequeo barato y solo se recarga si cambió.
+    """
 
     def _fetch() -> Tuple[List[str], List[Dict[str, Any]]]:
         with time_sheets_block():
             return _fetch_table_from_sheets(entity)
 
-    return cache_get_table(sid, entity, _fetch)
+    def _refresh(headers: List[str], rows: List[Dict[str, Any]]):
+        with time_sheets_block():
+            return _fetch_table_tail(entity, headers, rows)
+
+    def _probe(headers: List[str], rows: List[Dict[str, Any]]):
+        with time_sheets_block():
+            return _probe_table(entity, headers, rows)
+
+    if entity in settings.SHEETS_INCREMENTAL_TABLES:
+        return _fetch, _refresh
+    return _fetch, _probe
+
+
+def read_table(entity: str) -> Tuple[List[str], List[Dict[str, Any]]]:
+    sid = get_current_spreadsheet_id()
+    fetch_fn, refresh_fn = _table_fetchers(entity)
+    return cache_get_table(sid, entity, fetch_fn, refresh_fn)
+
+
+def read_snapshot(entity: str) -> TableSnapshot:
+    """Como read_table, pero devuelve el snapshot (con sus índices derivados)."""
+    sid = get_current_spreadsheet_id()
+    fetch_fn, refresh_fn = _table_fetchers(entity)
+    return cache_get_snapshot(sid, entity, fetch_fn, refresh_fn)
+
+
+def _build_row_index(column: str):
+    def _build(snapshot: TableSnapshot) -> Dict[str, int]:
+        index: Dict[str, int] = {}
+        for i, r in enumerate(snapshot.rows):
+            # Primera aparición gana (mismo resultado que el recorrido lineal)
+            index.setdefault(str(r.get(column, "")).strip(), i)
+        return index
+    return _build
+
+
+def row_index(snapshot: TableSnapshot, column: str) -> Dict[str, int]:
+    """Índice valor (str strip) -> posición en snapshot.rows; se arma una vez por snapshot."""
+    return snapshot.derived(("row_index", column), _build_row_index(column))
+
+
+def find_row(entity: str, column: str, value: Any) -> Optional[Dict[str, Any]]:
+    """Fila cacheada cuyo column == value (ej. Id, Timestamp), en O(1)."""
+    snapshot = read_snapshot(entity)
+    idx = row_index(snapshot, column).get(str(value).strip())
+    return snapshot.rows[idx] if idx is not None else None
+
+
+def _batch_fetch_timed(entities: List[str]) -> Dict[str, Tuple[List[str], List[Dict[str, Any]]]]:
+    with time_sheets_block():
+        return _batch_fetch_tables(entities)
+
+
+def read_tables(entities: List[str]) -> Dict[str, Tuple[List[str], List[Dict[str, Any]]]]:
+    """Como read_table para varias hojas: las que no están en cache se traen en un solo batchGet."""
+    sid = get_current_spreadsheet_id()
+    return cache_get_tables(sid, entities, _batch_fetch_timed)
+
+
+def refresh_table(entity: str) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """Refresca la tabla aunque no haya expirado (refresco en background): incremental, chequeo barato o completa."""
+    sid = get_current_spreadsheet_id()
+    fetch_fn, refresh_fn = _table_fetchers(entity)
+    return cache_refresh_table(sid, entity, fetch_fn, refresh_fn)
+
+
+def refresh_tables(entities: List[str]) -> None:
+    """
+    Refresca varias hojas del spreadsheet actual: las incrementales de a una (solo filas nuevas),
+    el resto pasa primero por el chequeo barato (un batchGet para todas) y las que cambiaron
+    se recargan juntas en un solo batchGet. Sin cache (TTL <= 0) no hay nada que refrescar.
+    """
+    if settings.SHEETS_CACHE_TTL_SEC <= 0:
+        return
+    sid = get_current_spreadsheet_id()
+    incremental = [e for e in entities if e in settings.SHEETS_INCREMENTAL_TABLES]
+    full = [e for e in entities if e not in settings.SHEETS_INCREMENTAL_TABLES]
+    for entity in incremental:
+        refresh_table(entity)
+    changed = _probe_tables(full) if full else []
+    if changed:
+        cache_put_tables(sid, _batch_fetch_timed(changed))
 
 
 def _movimiento_to_item(r: Dict[str, Any]) -> Dict[str, Any]:
@@ -137,101 +445,335 @@ def _movimiento_to_item(r: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
-def list_movimientos(
-    from_date: Optional[date] = None,
-    to_date: Optional[date] = None,
-    tipo: Optional[str] = None,
-    categoria: Optional[str] = None,
-    subcategoria: Optional[str] = None,
-    comercio: Optional[str] = None,
-    moneda: Optional[str] = None,
-    user_id: Optional[str] = None,
-    limit: int = 50,
-    offset: int = 0,
-    sort: str = "fecha_desc",
-    min_amount: Optional[float] = None,
-    max_amount: Optional[float] = None,
-    q: Optional[str] = None,
-    categoria_id: Optional[str] = None,
-) -> List[Dict[str, Any]]:
-    _, rows = read_table("movimientos")
-
-    if categoria_id and not categoria:
-        from app.sheets.catalog_service import list_categorias
-        cats = list_categorias()
-        for c in cats:
-            if str(c.get("id", "")).strip() == str(categoria_id).strip():
-                categoria = c.get("nombre", "")
-                break
-
-    filtered: List[Dict[str, Any]] = []
+class MovimientosColumns:
+    """
+    Columnas ya parseadas de un snapshot de movimientos (una lista por columna, mismo orden
+    que snapshot.rows). Se arman una vez por snapshot: filtros, orden y agregados trabajan
+    sobre fechas/montos tipados en vez de re-parsear strings en cada request.
+    """
 
-    for r in rows:
-        r_fecha = _parse_fecha_ddmmyyyy(r.get("Fecha"))
+    __slots__ = (
+        "fecha", "monto", "tipo", "moneda", "timestamp",
+        "categoria", "categoria_lower", "subcategoria", "subcategoria_lower",
+        "comercio", "comercio_lower", "descripcion", "descripcion_lower",
+    )
 
-        if from_date and r_fecha and r_fecha < from_date:
-            continue
-        if to_date and r_fecha and r_fecha > to_date:
+    def __init__(self, rows: List[Dict[str, Any]]) -> None:
+        pool: Dict[str, str] = {}
+        intern = pool.setdefault
+
+        def text(col: str) -> List[str]:
+            return [intern(v, v) for v in (str(r.get(col, "")).strip() for r in rows)]
+
+        def lower(values: List[str]) -> List[str]:
+            return [intern(v, v) for v in (v.lower() for v in values)]
+
+        fechas: Dict[Any, Optional[date]] = {}
+        self.fecha: List[Optional[date]] = []
+        for r in rows:
+            raw = r.get("Fecha")
+            if raw not in fechas:
+                fechas[raw] = _parse_fecha_ddmmyyyy(raw)
+            self.fecha.append(fechas[raw])
+        self.monto: List[float] = [_parse_monto(r.get("Monto")) for r in rows]
+        self.tipo = lower(text("Tipo de Movimiento"))
+        self.moneda = [intern(v, v) for v in (v.upper() for v in text("Moneda"))]
+        self.timestamp = text("Timestamp")
+        self.categoria = text("Nombre_Categoria")
+        self.categoria_lower = lower(self.categoria)
+        self.subcategoria = text("Nombre_SubCategoria")
+        self.subcategoria_lower = lower(self.subcategoria)
+        self.comercio = text("Comercio")
+        self.comercio_lower = lower(self.comercio)
+        self.descripcion = text("Descripcion")
+        self.descripcion_lower = lower(self.descripcion)
+
+
+def movimientos_columns(snapshot: TableSnapshot) -> MovimientosColumns:
+    return snapshot.derived("movimientos_columns", lambda snap: MovimientosColumns(snap.rows))
+
+
+# Órdenes soportados; cualquier otro valor ordena por fecha_desc
+_MOVIMIENTOS_SORTS = ("fecha_asc", "fecha_desc", "monto_asc", "monto_desc", "timestamp_asc", "timestamp_desc")
+
+
+def _movimientos_order(snapshot: TableSnapshot, sort: str) -> List[int]:
+    """Posiciones de toda la tabla en el orden `sort` (sort estable, como ordenar las filas filtradas)."""
+
+    def _build(snap: TableSnapshot) -> List[int]:
+        cols = movimientos_columns(snap)
+        field, _, direction = sort.partition("_")
+        if field == "fecha":
+            values: List[Any] = [f or date.min for f in cols.fecha]
+        elif field == "monto":
+            values = cols.monto
+        else:
+            values = cols.timestamp
+        return sorted(range(len(values)), key=values.__getitem__, reverse=direction == "desc")
+
+    return snapshot.derived(("movimientos_order", sort), _build)
+
+
+def _movimientos_rank(snapshot: TableSnapshot, sort: str) -> List[int]:
+    """rank[i] = posición de la fila i en _movimientos_order: ordenar un subconjunto por rank da el mismo orden."""
+
+    def _build(snap: TableSnapshot) -> List[int]:
+        order = _movimientos_order(snap, sort)
+        rank = [0] * len(order)
+        for pos, i in enumerate(order):
+            rank[i] = pos
+        return rank
+
+    return snapshot.derived(("movimientos_rank", sort), _build)
+
+
+def _movimientos_tipo_moneda_counts(snapshot: TableSnapshot) -> Dict[Tuple[str, str], int]:
+    def _build(snap: TableSnapshot) -> Dict[Tuple[str, str], int]:
+        cols = movimientos_columns(snap)
+        counts: Dict[Tuple[str, str], int] = {}
+        for key in zip(cols.tipo, cols.moneda):
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    return snapshot.derived("movimientos_tipo_moneda_counts", _build)
+
+
+def _movimientos_fecha_index(snapshot: TableSnapshot) -> Tuple[List[date], List[int], List[int]]:
+    """(fechas ordenadas, posiciones de esas filas, posiciones de filas sin fecha) para bisect."""
+
+    def _build(snap: TableSnapshot):
+        fechas = movimientos_columns(snap).fecha
+        dated = sorted((i for i, f in enumerate(fechas) if f is not None), key=fechas.__getitem__)
+        undated = [i for i, f in enumerate(fechas) if f is None]
+        return [fechas[i] for i in dated], dated, undated
+
+    return snapshot.derived("movimientos_fecha_index", _build)
+
+
+def _filter_movimientos(
+    snapshot: TableSnapshot,
+    from_date: Optional[date],
+    to_date: Optional[date],
+    tipo: Optional[str],
+    categoria: Optional[str],
+    subcategoria: Optional[str],
+    comercio: Optional[str],
+    moneda: Optional[str],
+    min_amount: Optional[float],
+    max_amount: Optional[float],
+    q: Optional[str],
+) -> List[int]:
+    """Posiciones (en snapshot.rows) que pasan los filtros, sin orden definido."""
+    cols = movimientos_columns(snapshot)
+
+    if from_date or to_date:
+        # Solo el rango de fechas del período (bisect); las filas sin fecha no se filtran por fecha
+        fechas, dated, undated = _movimientos_fecha_index(snapshot)
+        lo = bisect_left(fechas, from_date) if from_date else 0
+        hi = bisect_right(fechas, to_date) if to_date else len(fechas)
+        candidates: Any = dated[lo:hi] + undated
+    else:
+        candidates = range(len(snapshot.rows))
+
+    tipo_l = tipo.strip().lower() if tipo else None
+    categoria_l = categoria.strip().lower() if categoria else None
+    subcategoria_l = subcategoria.strip().lower() if subcategoria else None
+    comercio_l = comercio.strip().lower() if comercio else None
+    moneda_u = moneda.strip().upper() if moneda else None
+    q_l = q.strip().lower() if q else None
+
+    filtered: List[int] = []
+    for i in candidates:
+        if tipo_l is not None and cols.tipo[i] != tipo_l:
             continue
 
-        if tipo:
-            val = str(r.get("Tipo de Movimiento", "")).strip().lower()
-            if val != tipo.strip().lower():
-                continue
-
-        if categoria and str(r.get("Nombre_Categoria", "")).strip().lower() != categoria.strip().lower():
+        if categoria_l is not None and cols.categoria_lower[i] != categoria_l:
             continue
-        if subcategoria and str(r.get("Nombre_SubCategoria", "")).strip().lower() != subcategoria.strip().lower():
+        if subcategoria_l is not None and cols.subcategoria_lower[i] != subcategoria_l:
             continue
 
-        if comercio and comercio.strip().lower() not in str(r.get("Comercio", "")).strip().lower():
+        if comercio_l and comercio_l not in cols.comercio_lower[i]:
             continue
 
-        if moneda and str(r.get("Moneda", "")).strip().upper() != moneda.strip().upper():
+        if moneda_u is not None and cols.moneda[i] != moneda_u:
             continue
 
         # Cada usuario tiene su propio spreadsheet (ID_Sheets). El spreadsheet es el límite
         # por usuario; no filtrar por Id_usuario (evita excluir filas con columna vacía).
-        monto = _parse_monto(r.get("Monto"))
+        monto = cols.monto[i]
         if min_amount is not None and monto < min_amount:
             continue
         if max_amount is not None and monto > max_amount:
             continue
 
-        if q:
-            q_lower = q.strip().lower()
-            comercio_s = str(r.get("Comercio", "")).strip().lower()
-            desc_s = str(r.get("Descripcion", "")).strip().lower()
-            if q_lower not in comercio_s and q_lower not in desc_s:
-                continue
+        if q_l is not None and q_l not in cols.comercio_lower[i] and q_l not in cols.descripcion_lower[i]:
+            continue
+
+        filtered.append(i)
+    return filtered
+
 
-        filtered.append(r)
-
-    def key_fecha_parsed(x: Dict[str, Any]) -> date:
-        return _parse_fecha_ddmmyyyy(x.get("Fecha")) or date.min
-
-    def key_monto(x: Dict[str, Any]) -> float:
-        return _parse_monto(x.get("Monto"))
-
-    def key_timestamp(x: Dict[str, Any]) -> str:
-        return str(x.get("Timestamp", "")).strip()
-
-    if sort == "fecha_asc":
-        filtered.sort(key=key_fecha_parsed)
-    elif sort == "fecha_desc":
-        filtered.sort(key=key_fecha_parsed, reverse=True)
-    elif sort == "monto_asc":
-        filtered.sort(key=key_monto)
-    elif sort == "monto_desc":
-        filtered.sort(key=key_monto, reverse=True)
-    elif sort == "timestamp_desc":
-        filtered.sort(key=key_timestamp, reverse=True)
-    elif sort == "timestamp_asc":
-        filtered.sort(key=key_timestamp)
+# LRU de resultados filtrados: (spreadsheet, tabla, versión del snapshot, filtros, sort) ->
+# (posiciones, ordenadas?). La versión cambia con cada refresco/write-through, así que
+# las entradas viejas nunca se vuelven a pedir y salen solas por LRU.
+_query_cache: "OrderedDict[tuple, Tuple[List[int], bool]]" = OrderedDict()
+_query_cache_lock = threading.Lock()
+
+
+def _query_cache_get(key: tuple) -> Optional[Tuple[List[int], bool]]:
+    with _query_cache_lock:
+        entry = _query_cache.get(key)
+        if entry is not None:
+            _query_cache.move_to_end(key)
+        return entry
+
+
+def _query_cache_put(key: tuple, entry: Tuple[List[int], bool]) -> None:
+    size = settings.SHEETS_QUERY_CACHE_SIZE
+    if size <= 0:
+        return
+    with _query_cache_lock:
+        _query_cache[key] = entry
+        _query_cache.move_to_end(key)
+        while len(_query_cache) > size:
+            _query_cache.popitem(last=False)
+
+
+def _page_positions(positions: List[int], rank: List[int], offset: int, limit: int) -> List[int]:
+    """Página [offset, offset+limit) de positions ordenadas por rank; top-k si la página es chica."""
+    k = offset + limit
+    if k * 4 < len(positions):
+        return heapq.nsmallest(k, positions, key=rank.__getitem__)[offset:]
+    return sorted(positions, key=rank.__getitem__)[offset:k]
+
+
+def _page_filtered(
+    key: tuple,
+    compute: Any,
+    rank: List[int],
+    offset: int,
+    limit: int,
+) -> Tuple[List[int], int]:
+    """
+    Página de un resultado filtrado, memoizado en _query_cache.
+    La primera página sale con top-k sobre las posiciones filtradas (sin ordenar todo);
+    al pedir otra página se ordenan una vez y las siguientes son un slice.
+    """
+    entry = _query_cache_get(key)
+    if entry is None:
+        positions, is_sorted = compute(), False
     else:
-        filtered.sort(key=key_fecha_parsed, reverse=True)
+        positions, is_sorted = entry
+    if is_sorted:
+        return positions[offset: offset + limit], len(positions)
+    if offset == 0:
+        if entry is None:
+            _query_cache_put(key, (positions, False))
+        return _page_positions(positions, rank, offset, limit), len(positions)
+    positions = sorted(positions, key=rank.__getitem__)
+    _query_cache_put(key, (positions, True))
+    return positions[offset: offset + limit], len(positions)
+
+
+def _select_movimientos(
+    from_date: Optional[date],
+    to_date: Optional[date],
+    tipo: Optional[str],
+    categoria: Optional[str],
+    subcategoria: Optional[str],
+    comercio: Optional[str],
+    moneda: Optional[str],
+    min_amount: Optional[float],
+    max_amount: Optional[float],
+    q: Optional[str],
+    categoria_id: Optional[str],
+    sort: str,
+    offset: int,
+    limit: int,
+) -> Tuple[List[Dict[str, Any]], int]:
+    """Filtra y pagina movimientos de Sheets. Retorna (filas de la página, total filtrado)."""
+    snapshot = read_snapshot("movimientos")
+
+    if categoria_id and not categoria:
+        from app.sheets.catalog_service import list_categorias
+        cats = list_categorias()
+        for c in cats:
+            if str(c.get("id", "")).strip() == str(categoria_id).strip():
+                categoria = c.get("nombre", "")
+                break
+
+    if sort not in _MOVIMIENTOS_SORTS:
+        sort = "fecha_desc"
+    offset, limit = max(offset, 0), max(limit, 0)
+    rows = snapshot.rows
+
+    if not (from_date or to_date or categoria or subcategoria or comercio or q
+            or min_amount is not None or max_amount is not None):
+        # Solo tipo/moneda (listado por defecto): total desde conteos precalculados y la página
+        # recorriendo el orden ya armado hasta juntar offset+limit filas.
+        tipo_l = tipo.strip().lower() if tipo else None
+        moneda_u = moneda.strip().upper() if moneda else None
+        total = sum(
+            n for (t, m), n in _movimientos_tipo_moneda_counts(snapshot).items()
+            if (tipo_l is None or t == tipo_l) and (moneda_u is None or m == moneda_u)
+        )
+        cols = movimientos_columns(snapshot)
+        page: List[int] = []
+        skip = offset
+        for i in _movimientos_order(snapshot, sort):
+            if len(page) >= limit:
+                break
+            if (tipo_l is not None and cols.tipo[i] != tipo_l) or (moneda_u is not None and cols.moneda[i] != moneda_u):
+                continue
+            if skip:
+                skip -= 1
+                continue
+            page.append(i)
+        return [rows[i] for i in page], total
+
+    def _norm(value: Optional[str]) -> Optional[str]:
+        return value.strip().lower() if value else None
+
+    key = (
+        get_current_spreadsheet_id(), "movimientos", snapshot.version, sort,
+        from_date, to_date, _norm(tipo), _norm(categoria), _norm(subcategoria),
+        _norm(comercio) or None, _norm(moneda), min_amount, max_amount, _norm(q),
+    )
+    page, total = _page_filtered(
+        key,
+        lambda: _filter_movimientos(
+            snapshot, from_date, to_date, tipo, categoria, subcategoria, comercio, moneda,
+            min_amount, max_amount, q,
+        ),
+        _movimientos_rank(snapshot, sort),
+        offset,
+        limit,
+    )
+    return [rows[i] for i in page], total
+
 
-    return filtered[offset: offset + limit]
+def list_movimientos(
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    tipo: Optional[str] = None,
+    categoria: Optional[str] = None,
+    subcategoria: Optional[str] = None,
+    comercio: Optional[str] = None,
+    moneda: Optional[str] = None,
+    user_id: Optional[str] = None,
+    limit: int = 50,
+    offset: int = 0,
+    sort: str = "fecha_desc",
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    q: Optional[str] = None,
+    categoria_id: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    rows, _ = _select_movimientos(
+        from_date, to_date, tipo, categoria, subcategoria, comercio, moneda,
+        min_amount, max_amount, q, categoria_id, sort, offset, limit,
+    )
+    return rows
 
 
 def list_movimientos_paginated(
@@ -270,36 +812,73 @@ def list_movimientos_paginated(
         tipo_norm = "gasto"
 
     offset = (page - 1) * limit if page > 0 else 0
-    all_rows = list_movimientos(
-        from_date=from_date,
-        to_date=to_date,
-        tipo=tipo_norm,
-        categoria=categoria,
-        subcategoria=subcategoria,
-        comercio=comercio,
-        moneda=moneda,
-        user_id=user_id,
-        limit=999999,
-        offset=0,
-        sort=sort,
-        min_amount=min_amount,
-        max_amount=max_amount,
-        q=q,
-        categoria_id=categoria_id,
+    rows, total = _select_movimientos(
+        from_date, to_date, tipo_norm, categoria, subcategoria, comercio, moneda,
+        min_amount, max_amount, q, categoria_id, sort, offset, limit,
     )
-    total = len(all_rows)
-    rows = all_rows[offset: offset + limit]
     items = [_movimiento_to_item(r) for r in rows]
     return items, total
 
 
 def get_movimiento_by_id(mov_id: str) -> Optional[Dict[str, Any]]:
-    cfg = SHEETS["movimientos"]
-    _, rows = read_table("movimientos")
-    for r in rows:
-        if str(r.get(cfg.id_column, "")).strip() == str(mov_id).strip():
-            return r
-    return None
+    r = find_row("movimientos", SHEETS["movimientos"].id_column, mov_id)
+    return dict(r) if r is not None else None
+
+
+# =========================
+# Write-through: mantener el cache al día después de escribir
+# =========================
+
+def _cache_append_row(entity: str, row_number: int, row: Dict[str, Any]) -> None:
+    """
+    Agrega al cache la fila recién insertada (row_number = número de fila en Sheets).
+    Solo aplica si queda justo después de las filas cacheadas; si no, invalida.
+    """
+    cfg = SHEETS[entity]
+    idx = row_number - cfg.header_row - 1
+
+    def _append(headers: List[str], rows: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        if idx != len(rows):
+            return None
+        return rows + [row]
+
+    cache_update_table(get_current_spreadsheet_id(), entity, _append)
+
+
+def _cache_patch_row(entity: str, idx: int, row_id: str, changes: Dict[str, Any]) -> None:
+    """
+    Actualiza en el cache las celdas cambiadas de la fila idx (0-based en datos).
+    Verifica que la fila cacheada en idx siga siendo row_id; si no, invalida.
+    """
+    cfg = SHEETS[entity]
+
+    def _patch(headers: List[str], rows: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        if idx >= len(rows) or str(rows[idx].get(cfg.id_column, "")).strip() != str(row_id).strip():
+            return None
+        out = list(rows)
+        out[idx] = rows[idx].replace(changes)
+        return out
+
+    cache_update_table(get_current_spreadsheet_id(), entity, _patch)
+
+
+def _updated_values_from_response(
+    columns: List[str],
+    sent: List[Any],
+    resp: Dict[str, Any],
+) -> Dict[str, Any]:
+    """
+    Valores finales por columna de un batchUpdate con includeValuesInResponse
+    (ya formateados por Sheets, igual que en una lectura). Fallback: lo enviado.
+    """
+    responses = resp.get("responses", [])
+    if len(responses) != len(columns):
+        return {c: v for c, v in zip(columns, sent)}
+    out: Dict[str, Any] = {}
+    for col_name, r in zip(columns, responses):
+        values = r.get("updatedData", {}).get("values", [])
+        out[col_name] = values[0][0] if values and values[0] else ""
+    return out
 
 
 # =========================
@@ -311,22 +890,11 @@ def _get_headers_and_values_raw(entity: str) -> Tuple[List[str], List[List[Any]]
     with time_sheets_block():
         cfg = SHEETS[entity]
         svc = get_sheets_service()
-
-        header_range = f"{cfg.worksheet}!A{cfg.header_row}:Z{cfg.header_row}"
-        header_resp = svc.spreadsheets().values().get(
+        resp = sheets_execute(svc.spreadsheets().values().get(
             spreadsheetId=cfg.spreadsheet_id,
-            range=header_range,
-        ).execute()
-        headers = header_resp.get("values", [[]])[0]
-        if not headers:
-            return [], []
-
-        data_range = f"{cfg.worksheet}!A{cfg.header_row + 1}:Z"
-        data_resp = svc.spreadsheets().values().get(
-            spreadsheetId=cfg.spreadsheet_id,
-            range=data_range,
-        ).execute()
-        values = data_resp.get("values", [])
+            range=_table_range(cfg),
+        ))
+        headers, values = _split_headers(resp.get("values", []))
 
     return headers, values
 
@@ -351,17 +919,107 @@ def _find_row_index_by_column_value(
     return None
 
 
+def _locate_row(entity: str, column: str, needle: str) -> Tuple[List[str], Optional[int]]:
+    """
+    Ubica la fila a escribir: posición desde el índice del snapshot cacheado, verificada con
+    un batchGet de solo headers + esa fila. Si el cache quedó desfasado (filas borradas,
+    columnas movidas) cae a la lectura completa de la hoja.
+    Retorna (headers, índice 0-based en datos o None).
+    """
+    cfg = SHEETS[entity]
+    needle_s = str(needle).strip()
+    snapshot = read_snapshot(entity)
+    idx = row_index(snapshot, column).get(needle_s)
+    if idx is not None and column in snapshot.headers:
+        row_number = cfg.header_row + 1 + idx
+        with time_sheets_block():
+            resp = sheets_execute(get_sheets_service().spreadsheets().values().batchGet(
+                spreadsheetId=cfg.spreadsheet_id,
+                ranges=[
+                    f"{cfg.worksheet}!A{cfg.header_row}:Z{cfg.header_row}",
+                    f"{cfg.worksheet}!A{row_number}:Z{row_number}",
+                ],
+            ))
+        value_ranges = resp.get("valueRanges", [])
+        header_values = value_ranges[0].get("values", []) if value_ranges else []
+        values = value_ranges[1].get("values", []) if len(value_ranges) > 1 else []
+        if header_values and header_values[0] == snapshot.headers and values:
+            if _find_row_index_by_column_value(snapshot.headers, values, column, needle_s) == 0:
+                return snapshot.headers, idx
+        logger.info(f"locate_row_fallback table_name={entity} row_number={row_number}")
+
+    headers, values = _get_headers_and_values_raw(entity)
+    return headers, _find_row_index_by_column_value(headers, values, column, needle_s)
+
+
+def _get_headers(entity: str) -> List[str]:
+    """Solo la fila de headers (una lectura chica, no toda la hoja)."""
+    cfg = SHEETS[entity]
+    with time_sheets_block():
+        resp = sheets_execute(get_sheets_service().spreadsheets().values().get(
+            spreadsheetId=cfg.spreadsheet_id,
+            range=f"{cfg.worksheet}!A{cfg.header_row}:Z{cfg.header_row}",
+        ))
+    values = resp.get("values", [])
+    return values[0] if values else []
+
+
+# Fila inicial de updates.updatedRange, ej. "'Hoja'!A120:L120" -> 120
+_UPDATED_RANGE_RE = re.compile(r"!\$?[A-Z]+\$?(\d+)")
+
+
+def _append_row(entity: str, headers: List[str], row_out: List[Any], ts: str) -> SheetRow:
+    """
+    Agrega row_out al final de la hoja y relee solo esa fila: el número sale de
+    updates.updatedRange de la respuesta del append (Sheets ya calculó el Id al responder).
+    Si la fila releída no es la nuestra (Timestamp distinto) busca por Timestamp en la hoja completa.
+    Actualiza el cache (write-through) y retorna la fila.
+    """
+    cfg = SHEETS[entity]
+    svc = get_sheets_service()
+    with time_sheets_block():
+        resp = sheets_execute(svc.spreadsheets().values().append(
+            spreadsheetId=cfg.spreadsheet_id,
+            range=f"{cfg.worksheet}!A{cfg.header_row + 1}:Z",
+            valueInputOption="USER_ENTERED",
+            insertDataOption="INSERT_ROWS",
+            body={"values": [row_out]},
+        ))
+
+    m = _UPDATED_RANGE_RE.search(resp.get("updates", {}).get("updatedRange", ""))
+    if m:
+        row_number = int(m.group(1))
+        with time_sheets_block():
+            got = sheets_execute(svc.spreadsheets().values().get(
+                spreadsheetId=cfg.spreadsheet_id,
+                range=f"{cfg.worksheet}!A{row_number}:Z{row_number}",
+            ))
+        values = got.get("values", [])
+        if values and _find_row_index_by_column_value(headers, values, "Timestamp", ts) == 0:
+            row = _values_to_rows(headers, values)[0]
+            _cache_append_row(entity, row_number, row)
+            return row
+        logger.info(f"append_readback_fallback table_name={entity} updated_range={m.group(0)}")
+
+    headers2, values2 = _get_headers_and_values_raw(entity)
+    idx = _find_row_index_by_column_value(headers2, values2, "Timestamp", ts)
+    if idx is None:
+        raise RuntimeError("Insert OK pero no pude re-encontrar la fila por Timestamp")
+    row = _values_to_rows(headers2, [values2[idx]])[0]
+    _cache_append_row(entity, cfg.header_row + 1 + idx, row)
+    return row
+
+
 def create_movimiento(payload: Dict[str, Any]) -> Dict[str, Any]:
     """
     Crea una fila en Movimientos.
     - No recibe Id (porque lo genera el Sheet).
     - Setea Timestamp ISO único.
-    - Hace lookup por Timestamp para recuperar el Id generado y devolver el registro completo.
+    - Relee solo la fila agregada para devolver el registro completo con el Id generado.
     """
     cfg = SHEETS["movimientos"]
-    svc = get_sheets_service()
 
-    headers, _ = _get_headers_and_values_raw("movimientos")
+    headers = _get_headers("movimientos")
     if not headers:
         raise RuntimeError("No se pudieron leer headers de Movimientos")
 
@@ -379,35 +1037,8 @@ def create_movimiento(payload: Dict[str, Any]) -> Dict[str, Any]:
         else:
             row_out.append(payload.get(h, ""))
 
-    # Append
-    append_range = f"{cfg.worksheet}!A{cfg.header_row + 1}:Z"
-    with time_sheets_block():
-        svc.spreadsheets().values().append(
-            spreadsheetId=cfg.spreadsheet_id,
-            range=append_range,
-            valueInputOption="USER_ENTERED",
-            insertDataOption="INSERT_ROWS",
-            body={"values": [row_out]},
-        ).execute()
-
-    # Pequeña espera para que se calculen fórmulas/Id si aplica
-    time.sleep(0.2)
-
-    # Lookup por Timestamp para recuperar fila real (con Id ya calculado)
-    headers2, values2 = _get_headers_and_values_raw("movimientos")
-    idx = _find_row_index_by_column_value(headers2, values2, "Timestamp", ts)
-    if idx is None:
-        # fallback: reintento corto
-        time.sleep(0.3)
-        headers2, values2 = _get_headers_and_values_raw("movimientos")
-        idx = _find_row_index_by_column_value(headers2, values2, "Timestamp", ts)
-
-    if idx is None:
-        raise RuntimeError("Insert OK pero no pude re-encontrar la fila por Timestamp")
-
-    row_dict = _values_to_rows(headers2, [values2[idx]])[0]
-    invalidate(get_current_spreadsheet_id(), "movimientos")
-    return row_dict
+    row_dict = _append_row("movimientos", headers, row_out, ts)
+    return dict(row_dict)
 
 
 # =========================
@@ -421,11 +1052,9 @@ def patch_movimiento_by_id(mov_id: str, patch: Dict[str, Any]) -> Dict[str, Any]
     cfg = SHEETS["movimientos"]
     svc = get_sheets_service()
 
-    headers, values = _get_headers_and_values_raw("movimientos")
+    headers, idx = _locate_row("movimientos", cfg.id_column, mov_id)
     if not headers:
         raise RuntimeError("No se pudieron leer headers de Movimientos")
-
-    idx = _find_row_index_by_column_value(headers, values, cfg.id_column, mov_id)
     if idx is None:
         raise KeyError("Movimiento no encontrado")
 
@@ -435,6 +1064,7 @@ def patch_movimiento_by_id(mov_id: str, patch: Dict[str, Any]) -> Dict[str, Any]
 
     # Armamos actualizaciones por celdas (una por columna). Simple y claro.
     updates = []
+    columns: List[str] = []
     for col_name, new_value in patch.items():
         if col_name not in headers:
             continue
@@ -443,17 +1073,198 @@ def patch_movimiento_by_id(mov_id: str, patch: Dict[str, Any]) -> Dict[str, Any]
         col_letter = _col_to_a1(headers.index(col_name) + 1)
         a1 = f"{cfg.worksheet}!{col_letter}{row_number}"
         updates.append({"range": a1, "values": [[new_value]]})
+        columns.append(col_name)
 
     if updates:
         with time_sheets_block():
-            svc.spreadsheets().values().batchUpdate(
+            resp = sheets_execute(svc.spreadsheets().values().batchUpdate(
                 spreadsheetId=cfg.spreadsheet_id,
-                body={"valueInputOption": "USER_ENTERED", "data": updates},
-            ).execute()
-        invalidate(get_current_spreadsheet_id(), "movimientos")
+                body={
+                    "valueInputOption": "USER_ENTERED",
+                    "data": updates,
+                    "includeValuesInResponse": True,
+                    "responseValueRenderOption": "FORMATTED_VALUE",
+                },
+            ))
+        changes = _updated_values_from_response(
+            columns, [u["values"][0][0] for u in updates], resp
+        )
+        _cache_patch_row("movimientos", idx, mov_id, changes)
 
     # Devolvemos el registro actualizado (re-lectura por Id)
     updated = get_movimiento_by_id(mov_id)
     if not updated:
         raise RuntimeError("Actualicé pero luego no pude leer el movimiento")
     return updated
+
+
+# =========================
+# Escritura en bloque: varias filas en pocos batchUpdate
+# =========================
+
+# Rangos por values().batchUpdate (cada rango es un tramo de columnas contiguas de una fila)
+BATCH_UPDATE_CHUNK = 500
+
+
+def patch_rows_bulk(
+    entity: str,
+    headers: List[str],
+    patches: List[Tuple[int, str, Dict[str, Any]]],
+) -> int:
+    """
+    Actualiza muchas filas ya ubicadas: patches = [(idx 0-based en datos, id, {columna: valor})].
+    Las columnas contiguas de una fila van en un solo rango; los rangos se envían en
+    values().batchUpdate de a BATCH_UPDATE_CHUNK y se aplica write-through al cache.
+    Retorna la cantidad de celdas escritas.
+    """
+    cfg = SHEETS[entity]
+    data: List[Dict[str, Any]] = []
+    cells = 0
+    for idx, _row_id, changes in patches:
+        row_number = cfg.header_row + 1 + idx
+        by_col = sorted(
+            (headers.index(col_name) + 1, new_value)
+            for col_name, new_value in changes.items()
+            if col_name in headers and col_name != cfg.id_column
+        )
+        cells += len(by_col)
+        # Tramos de columnas consecutivas: [(primera columna, [valores])]
+        runs: List[Tuple[int, List[Any]]] = []
+        for col, new_value in by_col:
+            if runs and runs[-1][0] + len(runs[-1][1]) == col:
+                runs[-1][1].append(new_value)
+            else:
+                runs.append((col, [new_value]))
+        for first, values in runs:
+            a1 = f"{_col_to_a1(first)}{row_number}"
+            if len(values) > 1:
+                a1 += f":{_col_to_a1(first + len(values) - 1)}{row_number}"
+            data.append({"range": f"{cfg.worksheet}!{a1}", "values": [values]})
+    if not data:
+        return 0
+
+    svc = get_sheets_service()
+    for i in range(0, len(data), BATCH_UPDATE_CHUNK):
+        with time_sheets_block():
+            sheets_execute(svc.spreadsheets().values().batchUpdate(
+                spreadsheetId=cfg.spreadsheet_id,
+                body={"valueInputOption": "USER_ENTERED", "data": data[i: i + BATCH_UPDATE_CHUNK]},
+            ))
+
+    by_idx = {idx: (row_id, changes) for idx, row_id, changes in patches}
+
+    def _patch(cached_headers: List[str], rows: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        out = list(rows)
+        for idx, (row_id, changes) in by_idx.items():
+            if idx >= len(out) or str(out[idx].get(cfg.id_column, "")).strip() != str(row_id).strip():
+                return None
+            out[idx] = out[idx].replace(changes)
+        return out
+
+    cache_update_table(get_current_spreadsheet_id(), entity, _patch)
+    return cells
+
+
+# =========================
+# Metadata del spreadsheet (sheetId por hoja) y borrado de filas
+# =========================
+
+# spreadsheet_id -> {título de hoja: {"sheetId", "rowCount", "columnCount"}}
+_metadata: Dict[str, Dict[str, Dict[str, int]]] = {}
+_metadata_lock = threading.Lock()
+
+# Solo lo necesario: sin esto spreadsheets().get trae toda la metadata (formatos, rangos con nombre...)
+_METADATA_FIELDS = "sheets.properties(sheetId,title,gridProperties(rowCount,columnCount))"
+
+
+def _fetch_metadata(spreadsheet_id: str) -> Dict[str, Dict[str, int]]:
+    with time_sheets_block():
+        resp = sheets_execute(get_sheets_service().spreadsheets().get(
+            spreadsheetId=spreadsheet_id,
+            fields=_METADATA_FIELDS,
+        ))
+    out: Dict[str, Dict[str, int]] = {}
+    for sheet in resp.get("sheets", []):
+        props = sheet.get("properties", {})
+        grid = props.get("gridProperties", {})
+        out[props.get("title", "")] = {
+            "sheetId": props.get("sheetId"),
+            "rowCount": grid.get("rowCount", 0),
+            "columnCount": grid.get("columnCount", 0),
+        }
+    with _metadata_lock:
+        _metadata[spreadsheet_id] = out
+    return out
+
+
+def get_sheet_properties(entity: str, refresh: bool = False) -> Optional[Dict[str, int]]:
+    """
+    sheetId y tamaño de grilla de la hoja de entity, cacheados por spreadsheet.
+    Si la hoja no está en cache (nueva o renombrada) vuelve a pedir la metadata una vez.
+    """
+    cfg = SHEETS[entity]
+    with _metadata_lock:
+        sheets = _metadata.get(cfg.spreadsheet_id)
+    if refresh or sheets is None or cfg.worksheet not in sheets:
+        sheets = _fetch_metadata(cfg.spreadsheet_id)
+    return sheets.get(cfg.worksheet)
+
+
+def _cache_delete_row(entity: str, idx: int, row_id: str) -> None:
+    """Quita del cache la fila borrada (las siguientes suben una posición, igual que en Sheets)."""
+    cfg = SHEETS[entity]
+
+    def _delete(headers: List[str], rows: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        if idx >= len(rows) or str(rows[idx].get(cfg.id_column, "")).strip() != str(row_id).strip():
+            return None
+        return rows[:idx] + rows[idx + 1:]
+
+    cache_update_table(get_current_spreadsheet_id(), entity, _delete)
+
+
+def delete_row_by_id(entity: str, row_id: str) -> bool:
+    """
+    Borra la fila cuyo id_column == row_id. Retorna False si no existe.
+    Con la metadata cacheada son dos llamadas: el batchGet de _locate_row (headers + la fila) y
+    el batchUpdate con deleteDimension. La lectura es a propósito: deleteDimension borra por
+    posición y batchUpdate no admite condiciones, así que sin verificar el id un índice
+    desfasado (otro worker u otra persona movió filas dentro del TTL) borraría otra fila.
+    """
+    cfg = SHEETS[entity]
+    headers, idx = _locate_row(entity, cfg.id_column, row_id)
+    if not headers:
+        raise RuntimeError(f"No se pudieron leer headers de {cfg.worksheet}")
+    if idx is None:
+        return False
+
+    row_number = cfg.header_row + 1 + idx
+    props = get_sheet_properties(entity)
+    for attempt in range(2):
+        if props is None:
+            raise RuntimeError(f"No se encontró la hoja {cfg.worksheet}")
+        body = {
+            "requests": [{
+                "deleteDimension": {
+                    "range": {
+                        "sheetId": props["sheetId"],
+                        "dimension": "ROWS",
+                        "startIndex": row_number - 1,
+                        "endIndex": row_number,
+                    }
+                }
+            }]
+        }
+        try:
+            with time_sheets_block():
+                sheets_execute(get_sheets_service().spreadsheets().batchUpdate(
+                    spreadsheetId=cfg.spreadsheet_id,
+                    body=body,
+                ))
+            break
+        except HttpError as e:
+            # sheetId cacheado viejo (hoja recreada): refrescar metadata y reintentar una vez
+            if attempt or e.resp is None or e.resp.status != 400:
+                raise
+            props = get_sheet_properties(entity, refresh=True)
+    _cache_delete_row(entity, idx, row_id)
+    return True
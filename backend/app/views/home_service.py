@@ -7,11 +7,9 @@ from __future__ import annotations
 from typing import Any, Dict, Optional
 
 from app.core.config import settings
-from app.sheets.service import read_table
+from app.sheets.service import movimientos_columns, read_snapshot
 from app.utils.parse_utils import (
-    parse_date_ddmmyyyy,
     parse_date_flex,
-    parse_money,
     parse_period,
     normalize_mes_anio,
 )
@@ -58,27 +56,27 @@ def _get_movimientos_for_period(
         except (ValueError, TypeError, Exception):
             pass
 
-    _, mov_rows = read_table("movimientos")
+    snapshot = read_snapshot("movimientos")
+    cols = movimientos_columns(snapshot)
     out = []
-    for r in mov_rows:
-        tipo = str(r.get("Tipo de Movimiento", "")).strip().lower()
-        if tipo != "gasto":
+    for i, r in enumerate(snapshot.rows):
+        if cols.tipo[i] != "gasto":
             continue
-        r_moneda = str(r.get("Moneda", "")).strip().upper()
+        r_moneda = cols.moneda[i]
         if r_moneda and r_moneda != moneda_upper:
             continue
-        r_fecha = parse_date_ddmmyyyy(r.get("Fecha"))
+        r_fecha = cols.fecha[i]
         if not r_fecha or r_fecha < date_from or r_fecha > date_to:
             continue
         out.append({
             "row": r,
-            "monto": parse_money(r.get("Monto")),
-            "categoria": str(r.get("Nombre_Categoria", "")).strip() or "Sin categoría",
-            "subcategoria": str(r.get("Nombre_SubCategoria", "")).strip(),
+            "monto": cols.monto[i],
+            "categoria": cols.categoria[i] or "Sin categoría",
+            "subcategoria": cols.subcategoria[i],
             "fecha": r_fecha,
-            "timestamp": str(r.get("Timestamp", "")).strip(),
-            "comercio": str(r.get("Comercio", "")).strip(),
-            "descripcion": str(r.get("Descripcion", "")).strip(),
+            "timestamp": cols.timestamp[i],
+            "comercio": cols.comercio[i],
+            "descripcion": cols.descripcion[i],
         })
     return out
 
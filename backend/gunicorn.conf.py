@@ -3,12 +3,15 @@ Configuración Gunicorn para producción.
 Usar: gunicorn app.main:app -c gunicorn.conf.py
 """
 import multiprocessing
+import os
 
 # Worker class para ASGI (FastAPI)
 worker_class = "uvicorn.workers.UvicornWorker"
 
-# Workers: 2 para 1 vCPU, ajustar según CPU disponibles
-workers = min(2, multiprocessing.cpu_count() * 2 + 1)
+# Workers: 2 para 1 vCPU, ajustar según CPU disponibles (o WEB_CONCURRENCY).
+# Se exporta a los workers: la cuota de Sheets (app/sheets/quota.py) se reparte entre ellos.
+workers = int(os.environ.get("WEB_CONCURRENCY") or min(2, multiprocessing.cpu_count() * 2 + 1))
+os.environ["WEB_CONCURRENCY"] = str(workers)
 threads = 2
 
 # Timeout para requests largos (Sheets puede tardar)
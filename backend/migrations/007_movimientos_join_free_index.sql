@@ -0,0 +1,22 @@
+-- ============================================================
+-- Índice angosto para listados de movimientos sin JOIN a catálogo
+-- (MOVIMIENTOS_JOIN_FREE_READS): la página (ORDER BY Fecha DESC, Id DESC
+-- + OFFSET/FETCH) se resuelve sobre este índice con los filtros habituales
+-- cubiertos, y solo las filas de la página se leen de la tabla.
+-- Los nombres de categoría/subcategoría salen del catálogo en memoria.
+-- ============================================================
+
+IF NOT EXISTS (
+  SELECT 1 FROM sys.indexes
+  WHERE name = 'IX_movimientos_User_Fecha_Id' AND object_id = OBJECT_ID('dbo.movimientos')
+)
+CREATE INDEX IX_movimientos_User_Fecha_Id
+ON dbo.movimientos (Id_usuario, Fecha DESC, Id DESC)
+INCLUDE (TipoMovimiento, Moneda, Monto, MedioCarga, Id_Categoria, Id_SubCategoria);
+
+-- Mismas columnas líderes que el índice nuevo: queda redundante
+IF EXISTS (
+  SELECT 1 FROM sys.indexes
+  WHERE name = 'IX_movimientos_Fecha' AND object_id = OBJECT_ID('dbo.movimientos')
+)
+DROP INDEX IX_movimientos_Fecha ON dbo.movimientos;
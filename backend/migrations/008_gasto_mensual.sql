@@ -0,0 +1,47 @@
+-- ============================================================
+-- Rollup dbo.GastoMensual: gasto por (usuario, mes, moneda, categoría,
+-- subcategoría). Se mantiene en cada escritura de app/db/movimientos.py
+-- (OUTPUT INTO + MERGE en la misma transacción, GASTO_MENSUAL_ROLLUP)
+-- y lo leen /presupuestos/consumo y /presupuestos/alertas.
+-- Crear la tabla y correr el backfill antes de activar el flag (default
+-- apagado). Volver a correr el backfill antes de reactivarlo si estuvo
+-- apagado: mientras tanto las escrituras no mantienen el rollup.
+-- ============================================================
+
+IF OBJECT_ID('dbo.GastoMensual') IS NULL
+CREATE TABLE dbo.GastoMensual (
+    Id INT IDENTITY(1,1) NOT NULL,
+    Id_usuario INT NOT NULL,
+    PeriodoMes DATE NOT NULL,
+    Moneda NVARCHAR(10) NOT NULL,
+    Id_Categoria INT NULL,
+    Id_SubCategoria INT NULL,
+    Monto DECIMAL(18,2) NOT NULL DEFAULT 0,
+    Cantidad INT NOT NULL DEFAULT 0,
+    CONSTRAINT PK_GastoMensual PRIMARY KEY NONCLUSTERED (Id),
+    CONSTRAINT FK_GastoMensual_Usuario FOREIGN KEY (Id_usuario) REFERENCES dbo.MaestroUsuarios(id)
+);
+
+IF NOT EXISTS (
+  SELECT 1 FROM sys.indexes
+  WHERE name = 'UX_GastoMensual_Clave' AND object_id = OBJECT_ID('dbo.GastoMensual')
+)
+CREATE UNIQUE CLUSTERED INDEX UX_GastoMensual_Clave
+ON dbo.GastoMensual (Id_usuario, PeriodoMes, Moneda, Id_Categoria, Id_SubCategoria);
+
+-- Backfill desde movimientos (idempotente: recalcula todo)
+BEGIN TRANSACTION;
+DELETE FROM dbo.GastoMensual WITH (TABLOCKX);
+INSERT INTO dbo.GastoMensual (Id_usuario, PeriodoMes, Moneda, Id_Categoria, Id_SubCategoria, Monto, Cantidad)
+SELECT
+  Id_usuario,
+  DATEFROMPARTS(YEAR(Fecha), MONTH(Fecha), 1),
+  Moneda,
+  Id_Categoria,
+  Id_SubCategoria,
+  SUM(Monto),
+  COUNT(*)
+FROM dbo.movimientos WITH (HOLDLOCK)
+WHERE TipoMovimiento = 'Gasto'
+GROUP BY Id_usuario, DATEFROMPARTS(YEAR(Fecha), MONTH(Fecha), 1), Moneda, Id_Categoria, Id_SubCategoria;
+COMMIT TRANSACTION;
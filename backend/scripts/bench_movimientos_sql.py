@@ -0,0 +1,73 @@
+"""
+Benchmark de lecturas SQL de movimientos: con JOIN a Categoria/SubCategoria vs sin JOIN
+(nombres desde el catálogo en memoria, MOVIMIENTOS_JOIN_FREE_READS).
+Necesita SQL configurado (.env) y un usuario con movimientos.
+Ejecutar: python -m scripts.bench_movimientos_sql --id-usuario 1 [--repeat 10] [--limit 50]
+
+Verifica además que ambos caminos devuelvan exactamente los mismos items.
+"""
+import argparse
+import logging
+import statistics
+import time
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List
+
+from app.core.config import settings
+
+
+def _median_ms(fn: Callable[[], Any], repeat: int) -> float:
+    times: List[float] = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--id-usuario", type=int, required=True)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    from app.db.catalog import get_catalog
+    from app.db.movimientos import get_movimiento, list_movimientos
+
+    uid = args.id_usuario
+    _, total = list_movimientos(uid, limit=1)
+    if not total:
+        raise SystemExit(f"id_usuario={uid} no tiene movimientos")
+    get_catalog(uid)  # el camino sin JOIN asume catálogo caliente (warm-up de login)
+    first, _ = list_movimientos(uid, limit=1)
+    mov_id = int(first[0]["Id"])
+    last_page = max(0, (total - 1) // args.limit) * args.limit
+
+    cases: Dict[str, Callable[[], Any]] = {
+        "página 1": lambda: list_movimientos(uid, limit=args.limit),
+        "página media": lambda: list_movimientos(uid, limit=args.limit, offset=last_page // 2),
+        "última página": lambda: list_movimientos(uid, limit=args.limit, offset=last_page),
+        "últimos 90 días": lambda: list_movimientos(
+            uid, from_date=date.today() - timedelta(days=90), limit=args.limit
+        ),
+        "tipo+moneda": lambda: list_movimientos(uid, tipo="Gasto", moneda="ARS", limit=args.limit),
+        "get_movimiento": lambda: get_movimiento(uid, mov_id),
+    }
+
+    print(f"id_usuario={uid} movimientos={total} limit={args.limit} repeat={args.repeat}")
+    print(f"{'caso':<20} {'JOIN':>10} {'sin JOIN':>10}")
+    for label, fn in cases.items():
+        results = {}
+        timings = {}
+        for join_free in (False, True):
+            settings.MOVIMIENTOS_JOIN_FREE_READS = join_free
+            results[join_free] = fn()
+            timings[join_free] = _median_ms(fn, args.repeat)
+        same = "" if results[False] == results[True] else "  <- DIFERENTE"
+        print(f"{label:<20} {timings[False]:>8.1f}ms {timings[True]:>8.1f}ms{same}")
+
+
+if __name__ == "__main__":
+    main()
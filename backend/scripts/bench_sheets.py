@@ -0,0 +1,130 @@
+"""
+Benchmark del modo Sheets contra el emulador in-memory (no toca Google ni SQL).
+Ejecutar: python -m scripts.bench_sheets [--movimientos 20000] [--latency 0.15] [--quota-errors 0.0]
+
+Mide lecturas (cache frío/caliente, por Id, paginado), escrituras y la propagación de una regla,
+junto con la cantidad de llamadas a la API que hizo cada paso.
+"""
+import argparse
+import logging
+import json
+import statistics
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from app.core.config import settings
+
+SPREADSHEET_ID = "bench-spreadsheet"
+
+
+def _timed(label: str, fn: Callable[[], Any], repeat: int = 1) -> Any:
+    from app.sheets.emulator import backend
+
+    backend().reset_calls()
+    times: List[float] = []
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+    calls = sum(backend().calls.values())
+    ms = statistics.median(times) * 1000
+    print(f"{label:<40} {ms:>10.2f} ms  (x{repeat}, api_calls={calls})")
+    return result
+
+
+def _memory_per_row(spreadsheet_id: str) -> None:
+    """Bytes por fila cacheada: dict por fila (formato anterior) vs SheetRow compacta."""
+    from app.sheets.emulator import backend
+    from app.sheets.registry import SHEETS
+    from app.sheets.service import _values_to_rows
+
+    grid = backend().dump(spreadsheet_id, SHEETS["movimientos"].worksheet)
+    raw = json.dumps(grid[1:])  # cada medición parsea su propia copia, como una respuesta de la API
+    headers = grid[0]
+
+    def as_dicts(values):
+        return [{h: (row[i] if i < len(row) else "") for i, h in enumerate(headers)} for row in values]
+
+    for label, build in (("dict por fila", as_dicts), ("SheetRow", lambda v: _values_to_rows(headers, v))):
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+        values = json.loads(raw)
+        rows = build(values)
+        del values
+        used = tracemalloc.get_traced_memory()[0] - base
+        tracemalloc.stop()
+        print(f"memoria {label:<34} {used / len(rows):>10.0f} B/fila  ({used / 2**20:.1f} MiB)")
+        del rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--movimientos", type=int, default=20000)
+    parser.add_argument("--latency", type=float, default=0.15, help="latencia por llamada (segundos)")
+    parser.add_argument("--quota-errors", type=float, default=0.0, help="probabilidad de 429 por llamada")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    settings.SHEETS_BACKEND = "emulator"
+    settings.SPREADSHEET_ID = SPREADSHEET_ID
+    settings.SHEETS_QUOTA_PER_MIN_PROJECT = 0
+    settings.SHEETS_QUOTA_PER_MIN_SPREADSHEET = 0
+    settings.SHEETS_BACKOFF_BASE_SEC = 0.05
+
+    from app.cache.sheets_cache import invalidate_all
+    from app.sheets import catalog_service, service
+    from app.sheets.emulator import backend, seed_demo
+    from app.sheets.registry import set_current_spreadsheet_id
+
+    seed_demo(SPREADSHEET_ID, movimientos=args.movimientos)
+    emu = backend()
+    emu.latency_sec = args.latency
+    emu.quota_error_rate = args.quota_errors
+    set_current_spreadsheet_id(SPREADSHEET_ID)
+
+    print(
+        f"movimientos={args.movimientos} latency={args.latency * 1000:.0f}ms "
+        f"quota_errors={args.quota_errors:.0%} cache_ttl={settings.SHEETS_CACHE_TTL_SEC}s"
+    )
+    invalidate_all()
+    _timed("read_table movimientos (frío)", lambda: service.read_table("movimientos"))
+    _timed("read_table movimientos (caliente)", lambda: service.read_table("movimientos"), args.repeat)
+    invalidate_all()
+    _timed("read_tables hot (frío, batchGet)", lambda: service.read_tables(
+        ["reglas", "categorias", "subcategorias", "presupuestos"]
+    ))
+    _timed("refresh_tables hot (sin cambios)", lambda: service.refresh_tables(
+        ["reglas", "categorias", "subcategorias", "movimientos"]
+    ))
+    mid = str(args.movimientos // 2)
+    _timed("get_movimiento_by_id", lambda: service.get_movimiento_by_id(mid), args.repeat)
+    _timed("list_movimientos_paginated p1", lambda: service.list_movimientos_paginated(page=1, limit=50), args.repeat)
+    _timed("list_movimientos_paginated p10", lambda: service.list_movimientos_paginated(page=10, limit=50), args.repeat)
+    _timed("list_movimientos_paginated filtro", lambda: service.list_movimientos_paginated(
+        comercio="Comercio 1", sort="monto_desc", page=1, limit=50
+    ), args.repeat)
+
+    payload: Dict[str, Any] = {
+        "Fecha": "1/01/2026", "Tipo de Movimiento": "Gasto", "Moneda": "ARS", "Monto": "1,500",
+        "Comercio": "Comercio 1", "Nombre_Categoria": "Categoria 1", "Nombre_SubCategoria": "Sub 1.1",
+    }
+    created = _timed("create_movimiento", lambda: service.create_movimiento(payload))
+    _timed("patch_movimiento_by_id", lambda: service.patch_movimiento_by_id(
+        str(created.get("Id", mid)), {"Descripcion": "bench"}
+    ))
+
+    reglas = catalog_service.list_reglas()
+    if reglas:
+        r = reglas[0]
+        _timed("propagar regla a movimientos", lambda: catalog_service._propagar_regla_a_movimientos(
+            r["comercio"], "Categoria bench", "Sub bench"
+        ))
+    print("llamadas por tipo:", dict(sorted(emu.calls.items())))
+    _memory_per_row(SPREADSHEET_ID)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-import { useState } from "react";
+import { useState, useEffect } from "react";
 import { useData } from "../context/DataContext";
 import { useMonth } from "../context/MonthContext";
 import { MonthSelector } from "./MonthSelector";
@@ -92,13 +92,18 @@ function BudgetCard({
 }
 
 export function Budgets() {
-  const { budgets, categories, transactions } = useData();
+  const { budgets, categories, transactions, loadBudgetsMonth } = useData();
   const { selectedMonth } = useMonth();
   const [isCreateOpen, setIsCreateOpen] = useState(false);
   const [editingBudget, setEditingBudget] = useState<Budget | null>(null);
   const [expandedCategories, setExpandedCategories] = useState<Set<string>>(new Set());
 
   const period = `${selectedMonth.year}-${String(selectedMonth.month + 1).padStart(2, "0")}`;
+
+  // /bootstrap trae solo la ventana por defecto: los meses fuera de ella se piden aparte
+  useEffect(() => {
+    loadBudgetsMonth(period);
+  }, [period, loadBudgetsMonth]);
   const budgetsForMonth = budgets.filter((b) => {
     if (!b.mes_anio) return false;
     return normalizeMesAnio(b.mes_anio) === period;
@@ -1,4 +1,4 @@
-import { createContext, useContext, useState, useEffect, useCallback, ReactNode } from "react";
+import { createContext, useContext, useState, useEffect, useCallback, useRef, ReactNode } from "react";
 import { useAuth } from "./AuthContext";
 import {
   api,
@@ -6,6 +6,7 @@ import {
   mapCatalogToCategories,
   mapReglasToMerchantRules,
   mapPresupuestosToBudgets,
+  normalizeMesAnio,
   transactionToPatchPayload,
   type MovimientosPaginatedResponse,
   Category,
@@ -30,6 +31,7 @@ interface DataContextType {
   addBudget: (budget: Omit<Budget, "id">) => Promise<void>;
   updateBudget: (id: string, budget: Partial<Budget>) => Promise<void>;
   deleteBudget: (id: string) => Promise<void>;
+  loadBudgetsMonth: (mesAnio: string) => Promise<void>;
   merchants: Merchant[];
   addMerchant: (merchant: Omit<Merchant, "id">) => Promise<void>;
   updateMerchant: (id: string, merchant: Partial<Merchant>) => Promise<void>;
@@ -45,6 +47,14 @@ interface DataContextType {
 
 const DataContext = createContext<DataContextType | undefined>(undefined);
 
+/** Reemplaza los presupuestos del mes (YYYY-MM) por los traídos de /presupuestos */
+function mergeBudgetsMonth(base: Budget[], mesAnio: string, monthBudgets: Budget[]): Budget[] {
+  return [
+    ...base.filter((b) => normalizeMesAnio(b.mes_anio || "") !== mesAnio),
+    ...monthBudgets,
+  ];
+}
+
 export function DataProvider({ children }: { children: ReactNode }) {
   const { token } = useAuth();
   const [categories, setCategories] = useState<Category[]>([]);
@@ -54,6 +64,8 @@ export function DataProvider({ children }: { children: ReactNode }) {
   const [transactions, setTransactions] = useState<Transaction[]>([]);
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
+  // Mes que pidió la vista de presupuestos: /bootstrap solo trae la ventana por defecto
+  const budgetsMonthRef = useRef<string | null>(null);
 
   const fetchData = useCallback(async () => {
     if (!token) {
@@ -63,7 +75,8 @@ export function DataProvider({ children }: { children: ReactNode }) {
     setIsLoading(true);
     setError(null);
     try {
-      const [boot, movs] = await Promise.all([
+      const budgetsMonth = budgetsMonthRef.current;
+      const [boot, movs, monthRaw] = await Promise.all([
         api.bootstrap(token).catch(() => ({
           categorias: [],
           subcategorias: [],
@@ -72,6 +85,9 @@ export function DataProvider({ children }: { children: ReactNode }) {
           comercios: [],
         })),
         api.movimientos.list({ limit: "5000" }, token).catch((): MovimientosPaginatedResponse => ({ items: [], page: 1, limit: 50, total: 0 })),
+        budgetsMonth
+          ? api.budgets.list({ mes_anio: budgetsMonth }, token).catch(() => null)
+          : Promise.resolve(null),
       ]);
       const categoriasRaw = boot.categorias || [];
       const subcategoriasRaw = boot.subcategorias || [];
@@ -83,7 +99,10 @@ export function DataProvider({ children }: { children: ReactNode }) {
         categoriasRaw || [],
         subcategoriasRaw || []
       );
-      const buds = mapPresupuestosToBudgets(presupuestosRaw || []);
+      let buds = mapPresupuestosToBudgets(presupuestosRaw || []);
+      if (budgetsMonth && monthRaw) {
+        buds = mergeBudgetsMonth(buds, budgetsMonth, mapPresupuestosToBudgets(monthRaw));
+      }
 
       const mersList = mers || [];
       const comerciosFromReglas = [
@@ -137,6 +156,21 @@ export function DataProvider({ children }: { children: ReactNode }) {
     fetchData();
   }, [fetchData]);
 
+  const loadBudgetsMonth = useCallback(
+    async (mesAnio: string) => {
+      budgetsMonthRef.current = mesAnio;
+      if (!token) return;
+      try {
+        const raw = await api.budgets.list({ mes_anio: mesAnio }, token);
+        if (budgetsMonthRef.current !== mesAnio) return;
+        setBudgets((prev) => mergeBudgetsMonth(prev, mesAnio, mapPresupuestosToBudgets(raw)));
+      } catch {
+        // Sin el mes puntual quedan los de /bootstrap (ventana por defecto)
+      }
+    },
+    [token]
+  );
+
   const addCategory = async (category: Omit<Category, "id">) => {
     if (!token) return;
     await api.categories.create(category, token);
@@ -255,6 +289,7 @@ export function DataProvider({ children }: { children: ReactNode }) {
         addBudget,
         updateBudget,
         deleteBudget,
+        loadBudgetsMonth,
         merchants,
         addMerchant,
         updateMerchant,
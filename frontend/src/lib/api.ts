@@ -226,13 +226,12 @@ export const api = {
 
   budgets: {
     list: (params?: { mes_anio?: string; categoria_id?: string; subcategoria_id?: string }, token?: string) => {
-      const q = params?.mes_anio || params?.categoria_id || params?.subcategoria_id
-        ? "?" + new URLSearchParams(
-            Object.fromEntries(
-              Object.entries(params || {}).filter(([, v]) => v != null && v !== "")
-            )
-          ).toString()
-        : "";
+      // El backend recibe el mes como "mesAño"
+      const query: Record<string, string> = {};
+      if (params?.mes_anio) query["mesAño"] = params.mes_anio;
+      if (params?.categoria_id) query.categoria_id = params.categoria_id;
+      if (params?.subcategoria_id) query.subcategoria_id = params.subcategoria_id;
+      const q = Object.keys(query).length ? "?" + new URLSearchParams(query).toString() : "";
       return apiFetch<PresupuestoRaw[]>(`/presupuestos${q}`, { token });
     },
     create: (data: Omit<Budget, "id">, token?: string) =>